@@ -1,40 +1,300 @@
-import pandas as pd
+import argparse
+import os
+
 import matplotlib.pyplot as plt
-from utils import SetEnv
+import pandas as pd
+from utils import log_store, path_templates, pipeline
+
+# Keys of the grouped pass; every breakdown is a sum of its groups
+BREAKDOWN_KEYS = ['Window', 'Route', 'IP Address']
+
+# Counts kept per group: all requests, client errors and server errors
+COUNT_COLUMNS = ['Requests', '4xx', '5xx']
+
+# Width of the buckets in which error bursts are looked for
+BURST_WINDOW = '1min'
+
+# Robust standard deviations above the typical errors per minute at which a minute is part of a burst
+BURST_THRESHOLD = 3.0
+
+# Fewest errors in a minute for it to be part of a burst
+BURST_MIN_ERRORS = 10
+
+# Rows of every table printed by error_analysis
+TOP_N = 10
+
+# Rows of partial counts first buffered per table before they are summed into one
+COMPACT_ROWS = 1_000_000
+
+def _plain_index(counts):
+    # Chunks carry their own categories, so accumulated tables are keyed by plain values
+    if isinstance(counts.index, pd.MultiIndex):
+        index = counts.index.remove_unused_levels()
+        counts.index = index.set_levels([level.astype(level.categories.dtype)
+                                         if isinstance(level, pd.CategoricalIndex) else level for level in index.levels])
+    elif isinstance(counts.index, pd.CategoricalIndex):
+        counts.index = counts.index.astype(counts.index.categories.dtype)
+    return counts
+
+def _combine(partials):
+    # Sum partial counts keyed by the same index levels; aligning a running total on every chunk is far slower
+    if len(partials) == 1:
+        return partials[0]
+    combined = pd.concat(partials)
+    return combined.groupby(level=list(range(combined.index.nlevels)), dropna=False, sort=False).sum()
+
+class _Partials:
+    """
+    Partial counts of one table, summed into one table whenever they exceed
+    a row limit. The limit grows to twice the rows left after every sum, so a
+    table with many distinct keys is not re-grouped in full on every chunk.
+    """
+
+    def __init__(self, limit=COMPACT_ROWS):
+        self.tables = []
+        self.rows = 0
+        self.limit = limit
+
+    def add(self, counts):
+        counts = _plain_index(counts)
+        self.tables.append(counts)
+        self.rows += len(counts)
+        if self.rows > self.limit:
+            self.tables = [_combine(self.tables)]
+            self.rows = len(self.tables[0])
+            self.limit = max(self.limit, 2 * self.rows)
+
+    def total(self, keys, columns=None):
+        """
+        Returns:
+            pd.DataFrame | pd.Series: The summed counts, or an empty table indexed by keys
+            (a Series if columns is None) if nothing was added.
+        """
+        if self.tables:
+            return _combine(self.tables)
+        index = (pd.MultiIndex.from_arrays([[]] * len(keys), names=keys) if len(keys) > 1
+                 else pd.Index([], name=keys[0]))
+        if columns is None:
+            return pd.Series([], index=index, dtype='int64')
+        return pd.DataFrame({column: pd.Series([], dtype='int64') for column in columns}, index=index)
+
+def _with_rates(counts):
+    # Errors and error rate of every row of a table of COUNT_COLUMNS, most errors first, ties by key
+    table = counts.astype('int64').sort_index().reset_index()
+    table['Errors'] = table['4xx'] + table['5xx']
+    table['Error Rate'] = table['Errors'] / table['Requests']
+    return table.sort_values(['Errors', 'Requests'], ascending=False, kind='mergesort', ignore_index=True)
+
+def find_bursts(per_minute, threshold=BURST_THRESHOLD, min_errors=BURST_MIN_ERRORS):
+    """
+    Find runs of minutes with far more errors than usual.
+
+    The typical number of errors per minute and its spread are the median
+    and the scaled median absolute deviation over all minutes, including
+    those without errors, so a few bursts do not raise the bar for the rest.
 
-def error_analysis(file_dir):
-    # Set Working path
-    _env = SetEnv.set_path()
-    # Read the data from the CSV file
-    df = pd.read_csv(f'{_env}/{file_dir}')
+    Args:
+        per_minute (pd.DataFrame): 'Requests' and 'Errors' per minute, indexed by minute.
+        threshold (float): Robust standard deviations above the median at which a minute is hot.
+        min_errors (int): Fewest errors of a hot minute.
 
-    # Count occurrences of each status code
-    status_code_counts = df['Status Code'].value_counts()
+    Returns:
+        pd.DataFrame: One row per run of consecutive hot minutes, with 'Start', 'End',
+        'Minutes', 'Requests', 'Errors', 'Peak Errors' and 'Error Rate', most errors first.
+    """
+    columns = ['Start', 'End', 'Minutes', 'Requests', 'Errors', 'Peak Errors', 'Error Rate']
+    if per_minute is None or per_minute.empty:
+        return pd.DataFrame(columns=columns)
+    per_minute = per_minute.sort_index().asfreq(BURST_WINDOW, fill_value=0)
+    errors = per_minute['Errors']
+    median = errors.median()
+    spread = 1.4826 * (errors - median).abs().median()
+    hot = errors >= max(min_errors, median + threshold * max(spread, 1.0))
+    if not hot.any():
+        return pd.DataFrame(columns=columns)
 
+    runs = (hot != hot.shift()).cumsum()[hot]
+    minutes = per_minute[hot].assign(Minute=per_minute.index[hot])
+    bursts = minutes.groupby(runs.to_numpy()).agg(
+        Start=('Minute', 'min'), End=('Minute', 'max'), Minutes=('Errors', 'size'),
+        Requests=('Requests', 'sum'), Errors=('Errors', 'sum'), **{'Peak Errors': ('Errors', 'max')})
+    bursts['End'] += pd.Timedelta(BURST_WINDOW)
+    bursts['Error Rate'] = bursts['Errors'] / bursts['Requests']
+    return bursts.sort_values('Errors', ascending=False, kind='mergesort', ignore_index=True)[columns]
+
+class ErrorAnalysis(pipeline.Analysis):
+    """
+    Distribution of status codes, and error rates per time window, route
+    and client, broken links with their referrers, and error bursts.
+
+    Every chunk is grouped once by time window, route and client address,
+    counting requests, 4xx and 5xx responses; the per-window, per-route and
+    per-client tables are sums of these groups, and the groups with errors
+    make up the full breakdown. Memory depends on the number of distinct
+    windows, routes and clients, not on the number of records.
+    """
+
+    name = 'errors'
+    columns = ['Timestamp', 'Status Code', 'Request Path', 'IP Address']
+    optional_columns = ['Referrer']
+
+    def __init__(self, window='1H', normalizer=None):
+        """
+        Args:
+            window (str): Length of the time windows, as a pandas offset alias.
+            normalizer (path_templates.PathNormalizer, optional): Maps paths to routes;
+                defaults to path_templates.default_normalizer.
+        """
+        self.window = window
+        self.normalizer = normalizer
+        self.status_code_counts = None
+        # Partial counts of every table, summed by finish
+        self.partials = {table: _Partials() for table in BREAKDOWN_KEYS + ['breakdown', 'broken_links', 'per_minute']}
+        self.result = None
+
+    def update(self, chunk):
+        if chunk.empty:
+            return
+        self.status_code_counts = pipeline.add_counts(self.status_code_counts, chunk['Status Code'])
+
+        status = chunk['Status Code'].to_numpy()
+        client_errors = (status >= 400) & (status < 500)
+        server_errors = status >= 500
+        frame = pd.DataFrame({
+            'Window': chunk['Timestamp'].dt.floor(self.window),
+            'Route': path_templates.route_templates(chunk['Request Path'], self.normalizer),
+            'IP Address': chunk['IP Address'],
+            'Requests': 1,
+            '4xx': client_errors,
+            '5xx': server_errors,
+        })
+        # Sorted groups of categorical keys are much faster to build than groups in order of appearance
+        groups = frame.groupby(BREAKDOWN_KEYS, observed=True)[COUNT_COLUMNS].sum()
+        for key in BREAKDOWN_KEYS:
+            self.partials[key].add(groups.groupby(level=key, observed=True).sum())
+        # Groups are filtered to those with errors once summed, so their rates do not depend on the chunking
+        self.partials['breakdown'].add(groups)
+
+        not_found = status == 404
+        if not_found.any():
+            links = chunk.loc[not_found, [column for column in ['Request Path', 'Referrer'] if column in chunk]]
+            counts = links.groupby(list(links.columns), observed=True, dropna=False).size()
+            self.partials['broken_links'].add(counts[counts > 0])
+
+        minutes = pd.DataFrame({'Minute': chunk['Timestamp'].dt.floor(BURST_WINDOW), 'Requests': 1,
+                                'Errors': client_errors | server_errors})
+        self.partials['per_minute'].add(minutes.groupby('Minute', sort=False).sum())
+
+    def finish(self):
+        if self.status_code_counts is None:
+            self.status_code_counts = pd.Series([], index=pd.Index([], dtype='int16'), dtype='int64')
+        status_code_counts = self.status_code_counts.sort_index().sort_values(ascending=False, kind='mergesort')
+        server_errors = status_code_counts[(status_code_counts.index >= 500) & (status_code_counts.index < 600)]
+
+        tables = {key: self.partials[key].total([key], COUNT_COLUMNS) for key in BREAKDOWN_KEYS}
+        breakdown = self.partials['breakdown'].total(BREAKDOWN_KEYS, COUNT_COLUMNS)
+        tables['breakdown'] = breakdown[(breakdown['4xx'] > 0) | (breakdown['5xx'] > 0)]
+        tables['per_minute'] = self.partials['per_minute'].total(['Minute'], ['Requests', 'Errors'])
+        link_keys = ['Request Path', 'Referrer']
+        broken_links = self.partials['broken_links'].total(link_keys).rename('Count').astype('int64')
+        broken_links = (broken_links.sort_index().reset_index()
+                        .sort_values('Count', ascending=False, kind='mergesort', ignore_index=True))
+        self.partials = {table: _Partials() for table in self.partials}
+        by_window = _with_rates(tables['Window']).sort_values('Window', ignore_index=True)
+
+        self.result = {
+            'status_code_counts': status_code_counts,
+            'not_found': int(status_code_counts.get(404, 0)),
+            'server_errors': int(server_errors.sum()),
+            'by_window': by_window,
+            'by_route': _with_rates(tables['Route']),
+            'by_client': _with_rates(tables['IP Address']),
+            'breakdown': _with_rates(tables['breakdown']),
+            'broken_links': broken_links,
+            'bursts': find_bursts(tables['per_minute']),
+        }
+        summary = {key: self.result[key] for key in ['not_found', 'server_errors']}
+        requests = by_window['Requests'].sum()
+        summary['error_rate'] = round(float(by_window['Errors'].sum() / requests), 4) if requests else 0.0
+        summary['bursts'] = len(self.result['bursts'])
+        if len(broken_links):
+            summary['top_broken_link'] = broken_links['Request Path'].iloc[0]
+        return summary
+
+    def write(self, output_dir):
+        figure_path = os.path.join(output_dir, 'errors_status_codes.png')
+        fig = plot_status_codes(self.result['status_code_counts'])
+        fig.savefig(figure_path)
+        plt.close(fig)
+
+        counts_path = os.path.join(output_dir, 'errors_status_codes.csv')
+        self.result['status_code_counts'].rename_axis('Status Code').to_frame('Count').to_csv(counts_path)
+        paths = [figure_path, counts_path]
+        for table in ['by_window', 'by_route', 'by_client', 'breakdown', 'broken_links', 'bursts']:
+            table_path = os.path.join(output_dir, f'errors_{table}.csv')
+            self.result[table].to_csv(table_path, index=False)
+            paths.append(table_path)
+        return paths
+
+def plot_status_codes(status_code_counts):
     # Plot the distribution of status codes
-    plt.figure(figsize=(10, 6))
-    status_code_counts.plot(kind='bar', color='skyblue')
+    fig = plt.figure(figsize=(10, 6))
+    if len(status_code_counts):
+        status_code_counts.plot(kind='bar', color='skyblue')
     plt.title('Distribution of Status Codes')
     plt.xlabel('Status Code')
     plt.ylabel('Frequency')
     plt.xticks(rotation=45, ha='right')
     plt.grid(axis='y')
     plt.tight_layout()
-    plt.show()
+    return fig
+
+def error_analysis(file_dir, window='1H', chunk_size=pipeline.DEFAULT_CHUNK_SIZE):
+    """
+    Stream a log dataset through ErrorAnalysis and print its main tables.
+
+    Args:
+        file_dir (str): Dataset directory, Parquet file or CSV file.
+        window (str): Length of the time windows, as a pandas offset alias.
+        chunk_size (int): Rows per chunk of the scan.
+
+    Returns:
+        dict: The tables of ErrorAnalysis: 'status_code_counts', 'by_window', 'by_route',
+        'by_client', 'breakdown', 'broken_links' and 'bursts', with the 'not_found'
+        and 'server_errors' totals.
+    """
+    analysis = ErrorAnalysis(window)
+    pipeline.run_pipeline(file_dir, [analysis], chunk_size)
+    result = analysis.result
 
     # Investigate occurrences of status code 404 (Not Found)
-    if 404 in status_code_counts:
-        print("Occurrences of status code 404 (Not Found):", status_code_counts[404])
-        # Additional analysis or logging can be performed here for 404 errors
+    if result['not_found']:
+        print("Occurrences of status code 404 (Not Found):", result['not_found'])
+        print(result['broken_links'].head(TOP_N).to_string(index=False))
 
     # Look for patterns in other error status codes (e.g., 5xx server errors)
-    server_error_codes = [code for code in status_code_counts.index if str(code).startswith('5')]
-    if server_error_codes:
-        print("Occurrences of server error status codes (5xx):", sum(status_code_counts[code] for code in server_error_codes))
-        # Additional analysis or logging can be performed here for server errors
+    if result['server_errors']:
+        print("Occurrences of server error status codes (5xx):", result['server_errors'])
+
+    for title, table in [('Routes', 'by_route'), ('Clients', 'by_client'), ('Error bursts', 'bursts')]:
+        errors = result[table][result[table]['Errors'] > 0]
+        if len(errors):
+            print(f"{title} with the most errors:")
+            print(errors.head(TOP_N).to_string(index=False))
+    return result
 
-def main():
-    error_analysis('data/csv/server_logs.csv')
+def main() -> None:
+    """
+    Main entry point of the script.
+    """
+    parser = argparse.ArgumentParser(description='Report error rates per time window, route and client, '
+                                                 'broken links and error bursts.')
+    parser.add_argument('--input', default=log_store.DEFAULT_DATASET, help='Log dataset to analyze')
+    parser.add_argument('--window', default='1H', help='Time window as a pandas offset alias (default: 1H)')
+    parser.add_argument('--chunk-size', type=int, default=pipeline.DEFAULT_CHUNK_SIZE,
+                        help='Rows per chunk of the scan')
+    args = parser.parse_args()
+    error_analysis(args.input, args.window, args.chunk_size)
 
 if __name__ == "__main__":
     main()
@@ -1,37 +1,53 @@
-import pandas as pd
-import folium
-from geopy.geocoders import Nominatim
-from utils import SetEnv
+import argparse
+import math
+import time
 
-def geolocation_analysis(file_dir):
-    # Set Working path
-    _env = SetEnv.set_path()
-    # Read the data from the CSV file
-    df = pd.read_csv(f'{_env}/{file_dir}')
+import folium
+from utils import geoip, log_loader, log_store
 
-    # Extract IP addresses
-    ip_addresses = df['IP Address']
+def geolocation_analysis(file_dir, database_path=geoip.DEFAULT_DATABASE, map_file="geolocation_analysis_map.html"):
+    # Read only the IP addresses from the log dataset
+    df = log_loader.load_logs(file_dir, columns=['IP Address'])
 
-    # Initialize a geolocator
-    geolocator = Nominatim(user_agent="geolocation_analysis")
+    # Resolve every distinct IP address against the local range database, without any network access
+    start = time.perf_counter()
+    index = geoip.load_index(database_path)
+    locations = geoip.count_locations(df['IP Address'], index)
+    elapsed = time.perf_counter() - start
+    resolved = int(locations['Requests'].sum())
+    print(f"Geolocated {resolved} of {len(df)} requests to {len(locations)} locations in {elapsed:.2f}s")
 
     # Create a map centered at a specific location (e.g., world map)
     m = folium.Map(location=[0, 0], zoom_start=2)
 
-    # Iterate over IP addresses to obtain coordinates and plot markers
-    for ip in ip_addresses:
-        try:
-            location = geolocator.geocode(ip)
-            if location:
-                folium.Marker(location=[location.latitude, location.longitude], popup=ip).add_to(m)
-        except Exception as e:
-            print(f"Error geocoding IP {ip}: {e}")
+    # One marker per location, sized by its number of requests
+    for _, location in locations.iterrows():
+        place = ", ".join(str(name) for name in (location['City'], location['Country']) if isinstance(name, str))
+        folium.CircleMarker(
+            location=[location['Latitude'], location['Longitude']],
+            radius=3 + 2 * math.log10(location['Requests']),
+            popup=f"{place or 'Unknown'}: {location['Requests']} requests from {location['Unique IPs']} IPs",
+            fill=True,
+        ).add_to(m)
 
     # Save the map to an HTML file
-    m.save("geolocation_analysis_map.html")
+    m.save(map_file)
+    return locations
 
 def main():
-    geolocation_analysis('data/csv/server_logs.csv')
+    parser = argparse.ArgumentParser(description='Map requests to locations using a local IP-range database.')
+    parser.add_argument('--input', default=log_store.DEFAULT_DATASET, help='Log dataset to analyze')
+    parser.add_argument('--database', default=geoip.DEFAULT_DATABASE,
+                        help='IP-range CSV with start/end or network columns and location columns')
+    parser.add_argument('--output', default="geolocation_analysis_map.html", help='HTML map file to write')
+    args = parser.parse_args()
+
+    try:
+        locations = geolocation_analysis(args.input, args.database, args.output)
+    except FileNotFoundError as error:
+        print(f"Error: {error}")
+        return
+    print(locations.head(20).to_string())
 
 if __name__ == "__main__":
     main()
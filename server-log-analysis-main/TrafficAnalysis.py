@@ -1,34 +1,73 @@
-import pandas as pd
+import os
+
 import matplotlib.pyplot as plt
-from utils import SetEnv
+import pandas as pd
+from utils import log_loader, log_store, pipeline, timeseries
+
+class TrafficAnalysis(pipeline.Analysis):
+    """
+    Number of requests per second, minute, hour and day, overall, per status
+    class and per method.
+    """
+
+    name = 'traffic'
+    columns = ['Timestamp']
+    optional_columns = ['Status Code', 'Request Method']
 
-def plot_time_series(df):
-    # Convert the Timestamp column to datetime
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'], format='%d/%b/%Y:%H:%M:%S %z')
+    def __init__(self):
+        self.tables = []
+        self.counts = None
+        self.hourly_counts = None
 
-    # Set Timestamp as the index
-    df.set_index('Timestamp', inplace=True)
+    def update(self, chunk):
+        if not chunk.empty:
+            self.tables.append(timeseries.count_series(chunk))
 
-    # Resample the data to get the count of requests per hour
-    hourly_counts = df.resample('H').size()
+    def finish(self):
+        self.counts = timeseries.sum_series(self.tables)
+        self.tables = []
+        hourly = self.counts[(self.counts['resolution'] == 'hour') & (self.counts['series'] == timeseries.ALL_REQUESTS)]
+        # Include the hours without any request, as resample does
+        self.hourly_counts = (hourly.set_index(pd.to_datetime(hourly['bucket'], unit='s'))['request_count']
+                              .sort_index().asfreq('H', fill_value=0))
+        if self.hourly_counts.empty:
+            # No requests, so there is no peak hour
+            return {'hours': 0, 'peak_hour': None, 'peak_requests': 0}
+        return {'hours': len(self.hourly_counts), 'peak_hour': self.hourly_counts.idxmax(),
+                'peak_requests': int(self.hourly_counts.max())}
 
-    # Plotting the time-series
-    plt.figure(figsize=(12, 6))
-    hourly_counts.plot(color='blue', marker='o')
-    plt.title('Hourly Request Count Time-Series')
+    def write(self, output_dir):
+        figure_path = os.path.join(output_dir, 'traffic.png')
+        fig = plot_time_series(self.counts)
+        fig.savefig(figure_path)
+        plt.close(fig)
+
+        counts_path = os.path.join(output_dir, 'traffic_hourly.csv')
+        self.hourly_counts.rename_axis('Timestamp').to_frame('Number of Requests').to_csv(counts_path)
+
+        # All resolutions and series, with repeated labels stored once
+        series_path = os.path.join(output_dir, 'traffic_series.parquet')
+        self.counts.astype({'resolution': 'category', 'series': 'category'}).to_parquet(series_path, index=False)
+        return [figure_path, counts_path, series_path]
+
+def plot_time_series(counts, max_points=timeseries.DEFAULT_MAX_POINTS):
+    # Plot all requests at the finest resolution that fits in max_points, downsampled if needed
+    points, resolution = timeseries.series_points(counts, max_points=max_points)
+    fig = plt.figure(figsize=(12, 6))
+    plt.plot(points['Timestamp'], points['Number of Requests'], color='blue', marker='o' if len(points) <= 100 else None)
+    plt.title(f'Request Count Time-Series (per {resolution})' if resolution else 'Request Count Time-Series')
     plt.xlabel('Time')
     plt.ylabel('Number of Requests')
     plt.grid(True)
-    plt.show()
+    return fig
 
 def main():
-    # Set Working path
-    _env = SetEnv.set_path()
-    # Read the data from the CSV file
-    df = pd.read_csv(f'{_env}/data/csv/server_logs.csv')
+    # Read only the columns of the time series from the log dataset
+    df = log_loader.load_logs(log_store.DEFAULT_DATASET, columns=['Timestamp', 'Status Code', 'Request Method'])
 
     # Plot time-series
-    plot_time_series(df)
+    plot_time_series(timeseries.count_series(df))
+    plt.show()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,59 @@
+import argparse
+import os
+
+import pandas as pd
+from utils import anomaly, log_store, pipeline
+
+class AnomalyAnalysis(pipeline.Analysis):
+    """
+    Minutes with spikes in the request rate, 5xx or 404 responses, or the
+    requests of a single IP address.
+    """
+
+    name = 'anomalies'
+    columns = ['Timestamp', 'IP Address', 'Status Code']
+
+    def __init__(self, threshold=anomaly.DEFAULT_THRESHOLD):
+        self.detector = anomaly.StreamingAnomalyDetector(threshold=threshold)
+        self.alerts = []
+
+    def update(self, chunk):
+        if not chunk.empty:
+            self.alerts.append(self.detector.update(chunk))
+
+    def finish(self):
+        self.alerts.append(self.detector.flush())
+        self.alerts = pd.concat(self.alerts, ignore_index=True)
+        summary = {'alerts': len(self.alerts)}
+        for signal, count in self.alerts['Signal'].value_counts().sort_index().items():
+            summary[signal] = int(count)
+        return summary
+
+    def write(self, output_dir):
+        alerts_path = os.path.join(output_dir, 'anomalies.csv')
+        self.alerts.to_csv(alerts_path, index=False)
+        return [alerts_path]
+
+def anomaly_detection(file_dir, threshold=anomaly.DEFAULT_THRESHOLD):
+    # Replay the log dataset through the online detector, in time order
+    analysis = AnomalyAnalysis(threshold)
+    pipeline.run_pipeline(file_dir, [analysis])
+
+    if analysis.alerts.empty:
+        print("No anomalies found")
+    else:
+        print(analysis.alerts.to_string(index=False))
+
+def main() -> None:
+    """
+    Main entry point of the script.
+    """
+    parser = argparse.ArgumentParser(description='Find minutes with request, error or single-IP spikes.')
+    parser.add_argument('--input', default=log_store.DEFAULT_DATASET, help='Log dataset to analyze')
+    parser.add_argument('--threshold', type=float, default=anomaly.DEFAULT_THRESHOLD,
+                        help='Standard deviations above the expected rate that are reported')
+    args = parser.parse_args()
+    anomaly_detection(args.input, args.threshold)
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,25 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, Response, abort, g, render_template, request, redirect, url_for, flash, session
 from flask_login import UserMixin, login_user, LoginManager, login_required, logout_user, current_user
 import plotly.io as pio
 import plotly.graph_objects as go
 import plotly.express as px
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import numpy as np
 import pandas as pd
+import cProfile
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime
 from config import Config
 from werkzeug.security import generate_password_hash, check_password_hash
 from urllib.parse import urlparse
-from ua_parser import user_agent_parser  
-from utils import SetEnv  
+from utils import log_index, log_loader, log_store, metrics, rollups, timeseries, ua_cache
+from utils.figure_cache import FigureCache
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -44,40 +54,83 @@ class LogEntry(db.Model):
     user_agent = db.Column(db.String(255))
     referrer = db.Column(db.String(2083))
 
+    # Created after bulk loads by populate_db, so existing databases get them too
+    __table_args__ = (
+        db.Index('ix_log_entry_timestamp', 'timestamp'),
+        db.Index('ix_log_entry_ip_address', 'ip_address'),
+        db.Index('ix_log_entry_response_code', 'response_code'),
+        db.Index('ix_log_entry_request_path', 'request_path'),
+    )
+
+# Records which version of the log dataset has been loaded into LogEntry
+class IngestState(db.Model):
+    source = db.Column(db.String(1024), primary_key=True)
+    digest = db.Column(db.String(40), nullable=False)
+    row_count = db.Column(db.Integer, nullable=False)
+    loaded_at = db.Column(db.DateTime, nullable=False)
+
+# Read positions of a directory followed by tail_logs.py (see log_tail.LogTailer.state), committed together
+# with the rows read up to them, and the dataset files of the last append committed with them
+class TailState(db.Model):
+    raw_dir = db.Column(db.String(1024), primary_key=True)
+    positions = db.Column(db.Text, nullable=False)
+    last_append = db.Column(db.String(64), nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+# Rollup tables maintained at ingest time; the dashboard reads only from these
+# Request counts per time bucket; buckets are the epoch seconds of the local wall time of the logs
+class TimeSeriesRollup(db.Model):
+    resolution = db.Column(db.String(10), primary_key=True)
+    series = db.Column(db.String(40), primary_key=True)
+    bucket = db.Column(db.Integer, primary_key=True)
+    request_count = db.Column(db.Integer, nullable=False)
+
+class StatusRollup(db.Model):
+    response_code = db.Column(db.Integer, primary_key=True)
+    request_count = db.Column(db.Integer, nullable=False)
+
+class IpRollup(db.Model):
+    ip_address = db.Column(db.String(45), primary_key=True)
+    request_count = db.Column(db.Integer, nullable=False, index=True)
+
+# Request counts per route template of the request paths (see path_templates) and status code
+class RouteRollup(db.Model):
+    route = db.Column(db.String(2083), primary_key=True)
+    response_code = db.Column(db.Integer, primary_key=True)
+    request_count = db.Column(db.Integer, nullable=False)
+
+class UserAgentRollup(db.Model):
+    device = db.Column(db.String(255), primary_key=True)
+    browser = db.Column(db.String(255), primary_key=True)
+    request_count = db.Column(db.Integer, nullable=False)
+
+ROLLUP_MODELS = {
+    'time_series': TimeSeriesRollup,
+    'status': StatusRollup,
+    'ip': IpRollup,
+    'route': RouteRollup,
+    'user_agent': UserAgentRollup,
+}
+
+# Most routes shown in the successful requests chart
+MAX_ROUTES = 50
+
+# Maximum number of points plotted in the "Requests Over Time" chart; longer
+# windows are read at a coarser resolution or downsampled
+MAX_TIME_SERIES_POINTS = 2000
+
 # User loader function for Flask-Login
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
 
-# Helper function for parsing user agents
-def parse_user_agent(ua_string):
-    return user_agent_parser.Parse(ua_string)
-
 # User agent analysis function
 def user_agent_analysis():
-    _env = SetEnv.set_path()
-    file_path = f'{_env}/data/csv/server_logs.csv'
-
-    # Read the data from the CSV file
-    df = pd.read_csv(file_path)
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'], format='%d/%b/%Y:%H:%M:%S %z')
-
-    # Extract User Agents
-    user_agents = df['User Agent']
-
-    # Parse each user agent string and extract device and browser information
-    parsed_user_agents = [parse_user_agent(ua) for ua in user_agents if pd.notnull(ua)]
-    devices = [ua.get('device', {}).get('family') for ua in parsed_user_agents]
-    browsers = [ua.get('user_agent', {}).get('family') for ua in parsed_user_agents]
+    # Read only the user agents; the loader keeps them cached between requests
+    df = log_loader.load_logs(log_store.DEFAULT_DATASET, columns=['User Agent'])
 
-    # Count the occurrences of each device and browser
-    device_counts = pd.Series(devices).value_counts().reset_index(name='Count')
-    device_counts.columns = ['Device', 'Count']
-
-    browser_counts = pd.Series(browsers).value_counts().reset_index(name='Count')
-    browser_counts.columns = ['Browser', 'Count']
-
-    return device_counts, browser_counts
+    # Parse each distinct user agent once; results stay cached between requests
+    return ua_cache.count_families(df['User Agent'])
 
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -95,82 +148,317 @@ def login():
 
     return render_template('login.html')
 
-# Load data from CSV and populate the database (run this once to populate the database)
-def populate_db():
-    df = pd.read_csv('data/csv/server_logs.csv')
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'], format='%d/%b/%Y:%H:%M:%S %z')
-
-    print("CSV loaded. Number of rows:", len(df))
-
-    for index, row in df.iterrows():
-        print(f"Processing row {index + 1}/{len(df)}")
-        log_entry = LogEntry(
-            timestamp=row['Timestamp'],
-            ip_address=row['IP Address'],
-            request_method=row['Request Method'],
-            request_path=row['Request Path'],
-            response_code=row['Status Code'],
-            user_agent=row.get('User Agent'),
-            referrer=row.get('Referrer')
-        )
-        db.session.add(log_entry)
+# Upsert of a rollup table taking plain tuples of its key columns and count; counts of existing keys are summed
+def _rollup_upsert(table):
+    keys = [column.name for column in table.primary_key]
+    columns = keys + ['request_count']
+    return (f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET request_count = request_count + excluded.request_count")
+
+# Add the counts of a chunk of log records to the rollup tables
+def update_rollups(df):
+    with metrics.timer('compute_rollups'):
+        tables = rollups.compute_rollups(df)
+    for name, counts in tables.items():
+        if counts.empty:
+            continue
+        table = ROLLUP_MODELS[name].__table__
+        columns = [column.name for column in table.primary_key] + ['request_count']
+        values = [counts[column].astype(object).where(counts[column].notna(), None).tolist() for column in columns]
+        db.session.connection().exec_driver_sql(_rollup_upsert(table), list(zip(*values)))
+
+# Recompute all rollup tables from the LogEntry table, e.g. for a database populated before rollups existed
+def rebuild_rollups(chunk_size=100_000):
+    for model in ROLLUP_MODELS.values():
+        db.session.query(model).delete()
+    columns = ['Timestamp', 'IP Address', 'Request Method', 'Request Path', 'Status Code', 'User Agent']
+    result = db.session.execute(db.select(
+        LogEntry.timestamp, LogEntry.ip_address, LogEntry.request_method, LogEntry.request_path,
+        LogEntry.response_code, LogEntry.user_agent
+    ).execution_options(yield_per=chunk_size))
+    for rows in result.partitions(chunk_size):
+        chunk = pd.DataFrame(rows, columns=columns)
+        chunk['Timestamp'] = pd.to_datetime(chunk['Timestamp'])
+        update_rollups(log_store.to_typed_frame(chunk))
+    db.session.commit()
+    figure_cache.invalidate()
+
+# Columns of the log dataset loaded into LogEntry, mapped to their database columns
+LOG_ENTRY_COLUMNS = {
+    'Timestamp': 'timestamp',
+    'IP Address': 'ip_address',
+    'Request Method': 'request_method',
+    'Request Path': 'request_path',
+    'Status Code': 'response_code',
+    'User Agent': 'user_agent',
+}
+
+# Store the local wall time of the logs, as LogEntry does
+def _wall_time(chunk):
+    timestamps = chunk['Timestamp']
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_localize(None)
+    return chunk.assign(Timestamp=timestamps)
+
+# Bulk insert of LogEntry rows as plain tuples, skipping per-row dicts and ORM type processing
+LOG_ENTRY_INSERT = (f"INSERT INTO {LogEntry.__tablename__} ({', '.join(LOG_ENTRY_COLUMNS.values())}) "
+                    f"VALUES ({', '.join('?' * len(LOG_ENTRY_COLUMNS))})")
+
+# Format SQLAlchemy stores SQLite DateTime values in; stored timestamps are compared as strings
+SQLITE_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+# Insert a chunk of typed log records into LogEntry and add it to the rollups
+def insert_logs(chunk):
+    values = []
+    for column in LOG_ENTRY_COLUMNS:
+        series = chunk[column]
+        if column == 'Timestamp':
+            series = series.dt.strftime(SQLITE_DATETIME_FORMAT)
+        values.append(series.astype(object).where(series.notna(), None).tolist())
+    with metrics.timer('insert_logs'):
+        db.session.connection().exec_driver_sql(LOG_ENTRY_INSERT, list(zip(*values)))
+    metrics.count('rows_inserted', len(chunk))
+    update_rollups(chunk)
+
+# Drop requests already stored in LogEntry from a chunk.
+# Logs are append-only, so everything after the latest stored timestamp is new;
+# at that timestamp itself the first `skip` rows are the ones already stored.
+def _new_rows(chunk, watermark, skip):
+    chunk = _wall_time(chunk)
+    timestamps = chunk['Timestamp']
+    if watermark is None:
+        return chunk, skip
+    keep = (timestamps > watermark).to_numpy()
+    at_watermark = np.flatnonzero((timestamps == watermark).to_numpy())
+    keep[at_watermark[skip:]] = True
+    return chunk[keep], max(0, skip - len(at_watermark))
+
+# Load new parsed logs into the database in bulk. Only rows newer than those
+# already stored are inserted, so this is cheap to run on every start.
+def populate_db(file_dir=log_store.DEFAULT_DATASET, chunk_size=100_000):
+    source = log_loader.resolve_path(file_dir)
+    watermark = db.session.query(db.func.max(LogEntry.timestamp)).scalar()
+    if watermark is not None and (TimeSeriesRollup.query.first() is None or RouteRollup.query.first() is None):
+        # Database populated before rollups, or the time series and route rollups, existed
+        rebuild_rollups()
+
+    digest = log_loader.dataset_digest(source)
+    state = db.session.get(IngestState, source)
+    if state is not None and state.digest == digest:
+        print("Logs unchanged since the last load; nothing to populate.")
+        return 0
+
+    skip = 0
+    if watermark is not None:
+        skip = LogEntry.query.filter(LogEntry.timestamp == watermark).count()
+
+    # Trade durability for speed while loading; the load is a single transaction
+    connection = db.session.connection()
+    synchronous = connection.exec_driver_sql('PRAGMA synchronous').scalar()
+    connection.exec_driver_sql('PRAGMA synchronous = OFF')
+    connection.exec_driver_sql('PRAGMA temp_store = MEMORY')
+
+    start = time.perf_counter()
+    rows = 0
+    for chunk in log_loader.iter_logs(source, columns=list(LOG_ENTRY_COLUMNS), chunk_size=chunk_size):
+        chunk, skip = _new_rows(chunk, watermark, skip)
+        if chunk.empty:
+            continue
+        insert_logs(chunk)
+        rows += len(chunk)
+
+    for index in LogEntry.__table__.indexes:
+        index.create(connection, checkfirst=True)
+    db.session.merge(IngestState(source=source, digest=digest, row_count=rows, loaded_at=datetime.now()))
+    db.session.commit()
+    db.session.connection().exec_driver_sql(f'PRAGMA synchronous = {int(synchronous)}')
+    figure_cache.invalidate()
+
+    seconds = time.perf_counter() - start
+    metrics.observe('populate_db', seconds)
+    print(f"Database populated: {rows} new rows in {seconds:.2f}s ({rows / seconds if seconds else 0:,.0f} rows/s).")
+    return rows
+
+# Add newly parsed log records, e.g. from tail_logs.py, to the dataset, LogEntry and the rollups in one step.
+# The load state is moved to the new version of the dataset, so populate_db does not scan it again. With a
+# tailer, its read positions are committed in the same transaction as the rows, so after a crash the
+# uncommitted lines are read again exactly once (see restore_tail).
+def append_logs(chunk, file_dir=log_store.DEFAULT_DATASET, tailer=None):
+    source = log_loader.resolve_path(file_dir)
+    typed = log_store.to_typed_frame(chunk)
+    file_name = log_store.append_file_name()
+    log_store.append_dataset(typed, source, file_name)
+    insert_logs(_wall_time(typed))
+
+    db.session.merge(IngestState(source=source, digest=log_loader.dataset_digest(source), row_count=len(typed),
+                                 loaded_at=datetime.now()))
+    if tailer is not None:
+        db.session.merge(TailState(raw_dir=tailer.raw_dir, positions=tailer.state(), last_append=file_name,
+                                   updated_at=datetime.now()))
     db.session.commit()
-    print("Database populated.")
 
-@app.route('/')
-@login_required
-def index():
-    ip_counts = db.session.query(
-        LogEntry.ip_address, db.func.count(LogEntry.ip_address).label('Count')
-    ).group_by(LogEntry.ip_address).order_by(db.func.count(LogEntry.ip_address).desc()).limit(10).all()
-
-    ip_counts_df = pd.DataFrame(ip_counts, columns=['IP Address', 'Count'])
-    fig1 = px.bar(ip_counts_df, x='IP Address', y='Count', title='Top 10 Most Frequent IP Addresses')
-    plot1_html = pio.to_html(fig1, full_html=False)
-
-    requests_over_time = db.session.query(LogEntry.timestamp.label('Timestamp')).all()
-    requests_df = pd.DataFrame(requests_over_time, columns=['Timestamp'])
-    requests_over_time_grouped = requests_df.groupby('Timestamp').size().reset_index(name='Number of Requests')
-    fig2 = px.line(requests_over_time_grouped, x='Timestamp', y='Number of Requests', title='Requests Over Time')
-    plot2_html = pio.to_html(fig2, full_html=False)
-
-    request_counts = db.session.query(
-        LogEntry.request_path, db.func.count(LogEntry.request_path).label('Count')
-    ).filter(LogEntry.response_code == 200).group_by(LogEntry.request_path).all()
-
-    request_counts_df = pd.DataFrame(request_counts, columns=['Request Path', 'Count'])
-    fig3 = go.Figure(
+    # Only committed appends are merged, so discard_appends never has to look inside merged files
+    if log_store.compact_dataset(source):
+        db.session.merge(IngestState(source=source, digest=log_loader.dataset_digest(source),
+                                     row_count=len(typed), loaded_at=datetime.now()))
+        db.session.commit()
+    figure_cache.invalidate()
+    return len(typed)
+
+# Continue a tailer from the read positions committed by append_logs. The tailer's state file is saved only
+# after all batches of a poll are committed, so it is used if it is newer, as it may also cover lines that gave
+# no rows. Dataset files appended after the last commit hold lines the tailer reads again, so they are removed;
+# returns the number of files removed.
+def restore_tail(tailer, file_dir=log_store.DEFAULT_DATASET):
+    state = db.session.get(TailState, tailer.raw_dir)
+    if state is None:
+        return 0
+    state_file = tailer.state_file
+    if not (state_file and os.path.exists(state_file)
+            and datetime.fromtimestamp(os.path.getmtime(state_file)) > state.updated_at):
+        tailer.restore(state.positions)
+    return log_store.discard_appends(log_loader.resolve_path(file_dir), state.last_append)
+
+# Columns the dashboard reads from the log dataset when it is filtered
+FILTER_COLUMNS = ['Timestamp', 'IP Address', 'Request Method', 'Request Path', 'Status Code', 'User Agent']
+
+# Dashboard filters given in the query string: start, end (times) and ip
+def parse_filters(args):
+    filters = {key: args[key].strip() for key in ['start', 'end', 'ip'] if args.get(key, '').strip()}
+    for key in ['start', 'end']:
+        if key in filters:
+            try:
+                pd.Timestamp(filters[key])
+            except ValueError:
+                abort(400, f"Invalid {key} time: {filters[key]}")
+    return filters
+
+# Epoch seconds of the wall time of a dashboard time filter, as time series buckets are stored
+def _wall_seconds(value):
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_localize(None)
+    return timestamp.value // 10**9
+
+# Points of a time series (see timeseries.count_series) in the window of the dashboard filters, with at most
+# MAX_TIME_SERIES_POINTS points. Time windows are read from the stored rollups at the resolution that suits
+# them; an IP filter needs the matching requests
+def time_series_points(series, filters):
+    if 'ip' in filters:
+        points, _ = timeseries.series_points(filtered_rollups(filters)['time_series'], series, MAX_TIME_SERIES_POINTS)
+        return points
+
+    # The window is the time covered by all requests, counted per second, within the filters
+    first, last = db.session.query(db.func.min(TimeSeriesRollup.bucket), db.func.max(TimeSeriesRollup.bucket)).filter(
+        TimeSeriesRollup.resolution == list(timeseries.RESOLUTIONS)[0],
+        TimeSeriesRollup.series == timeseries.ALL_REQUESTS,
+    ).one()
+    if first is None:
+        return timeseries.empty_points()
+    if 'start' in filters:
+        first = max(first, _wall_seconds(filters['start']))
+    if 'end' in filters:
+        # End times are exclusive
+        last = min(last, _wall_seconds(filters['end']) - 1)
+    if first > last:
+        return timeseries.empty_points()
+
+    resolution = timeseries.pick_resolution(first, last, series, MAX_TIME_SERIES_POINTS)
+    width = timeseries.RESOLUTIONS[resolution]
+    counts = db.session.query(TimeSeriesRollup.bucket, TimeSeriesRollup.request_count).filter(
+        TimeSeriesRollup.resolution == resolution,
+        TimeSeriesRollup.series == series,
+        TimeSeriesRollup.bucket.between(first // width * width, last),
+    ).all()
+    buckets, request_counts = zip(*counts) if counts else ((), ())
+    return timeseries.to_points(buckets, request_counts, first, last, resolution, MAX_TIME_SERIES_POINTS)
+
+# Rollup tables of the requests matching the filters, computed from the row-group index of the
+# dataset instead of the stored rollups; shared by all charts of a filtered page
+def filtered_rollups(filters):
+    key = ('rollups', tuple(sorted(filters.items())), data_version())
+
+    def build():
+        df = log_index.query_logs(log_store.DEFAULT_DATASET, start=filters.get('start'), end=filters.get('end'),
+                                  ip=filters.get('ip'), columns=FILTER_COLUMNS)
+        return rollups.compute_rollups(df)
+
+    return figure_cache.get_or_build(key, build)
+
+# Chart builders for the dashboard; each returns a Plotly figure built from the rollup tables,
+# or from the matching requests when the dashboard is filtered
+def build_top_ips_figure(filters=None):
+    if filters:
+        ip_counts = filtered_rollups(filters)['ip'].nlargest(10, 'request_count', keep='first')
+        ip_counts_df = pd.DataFrame({'IP Address': ip_counts['ip_address'], 'Count': ip_counts['request_count']})
+    else:
+        ip_counts = db.session.query(
+            IpRollup.ip_address, IpRollup.request_count
+        ).order_by(IpRollup.request_count.desc()).limit(10).all()
+        ip_counts_df = pd.DataFrame(ip_counts, columns=['IP Address', 'Count'])
+    return px.bar(ip_counts_df, x='IP Address', y='Count', title='Top 10 Most Frequent IP Addresses')
+
+def build_requests_over_time_figure(filters=None):
+    points = time_series_points(timeseries.ALL_REQUESTS, filters or {})
+    return px.line(points, x='Timestamp', y='Number of Requests', title='Requests Over Time')
+
+def build_successful_paths_figure(filters=None):
+    if filters:
+        request_counts = filtered_rollups(filters)['route']
+        request_counts = request_counts[request_counts['response_code'] == 200]
+        request_counts = request_counts.nlargest(MAX_ROUTES, 'request_count', keep='first')
+        request_counts_df = pd.DataFrame({
+            'Route': request_counts['route'].astype(str), 'Count': request_counts['request_count']})
+    else:
+        request_counts = db.session.query(RouteRollup.route, RouteRollup.request_count).filter(
+            RouteRollup.response_code == 200
+        ).order_by(RouteRollup.request_count.desc()).limit(MAX_ROUTES).all()
+        request_counts_df = pd.DataFrame(request_counts, columns=['Route', 'Count'])
+    return go.Figure(
         data=[go.Bar(
-            x=request_counts_df['Request Path'].apply(lambda x: x.split('/')[-2]),
+            x=request_counts_df['Route'],
             y=request_counts_df['Count'],
             marker=dict(color=request_counts_df['Count']),
-            hovertext=request_counts_df['Request Path'],
-            hoverinfo="text+y"
+            hoverinfo="x+y"
         )],
         layout=go.Layout(
             title="Number of Successful Requests for Different Paths/Resources",
-            xaxis=dict(title='Request Path'),
+            xaxis=dict(title='Route'),
             yaxis=dict(title='Count')
         )
     )
-    plot3_html = pio.to_html(fig3, full_html=False)
-
-    # Perform user agent analysis and create visualizations
-    device_counts, browser_counts = user_agent_analysis()
-
-    fig4 = px.bar(device_counts, x='Device', y='Count', title='Distribution of Devices')
-    plot4_html = pio.to_html(fig4, full_html=False)
 
-    # Query the status code counts from the database
-    status_code_counts = db.session.query(
-        LogEntry.response_code, db.func.count(LogEntry.response_code).label('Count')
-    ).group_by(LogEntry.response_code).order_by(db.func.count(LogEntry.response_code).desc()).all()
-
-    # Convert query results to a DataFrame
-    status_code_df = pd.DataFrame(status_code_counts, columns=['Status Code', 'Count'])
+def build_devices_figure(filters=None):
+    if filters:
+        user_agents = filtered_rollups(filters)['user_agent']
+        device_counts = user_agents.groupby('device', observed=True)['request_count'].sum()
+        device_counts = device_counts[device_counts > 0].sort_values(ascending=False)
+        device_counts = pd.DataFrame({'Device': device_counts.index.astype(str), 'Count': device_counts.to_numpy()})
+    else:
+        # Read the device counts from the user agent rollup
+        device_counts = db.session.query(
+            UserAgentRollup.device, db.func.sum(UserAgentRollup.request_count).label('Count')
+        ).group_by(UserAgentRollup.device).order_by(db.desc('Count')).all()
+        device_counts = pd.DataFrame(device_counts, columns=['Device', 'Count'])
+
+    return px.bar(device_counts, x='Device', y='Count', title='Distribution of Devices')
+
+def build_status_codes_figure(filters=None):
+    if filters:
+        status_code_counts = filtered_rollups(filters)['status'].sort_values('request_count', ascending=False)
+        status_code_df = pd.DataFrame({
+            'Status Code': status_code_counts['response_code'], 'Count': status_code_counts['request_count']})
+    else:
+        # Query the status code counts from the rollup table
+        status_code_counts = db.session.query(
+            StatusRollup.response_code, StatusRollup.request_count
+        ).order_by(StatusRollup.request_count.desc()).all()
+
+        # Convert query results to a DataFrame
+        status_code_df = pd.DataFrame(status_code_counts, columns=['Status Code', 'Count'])
 
     # Create a Plotly bar chart similar to the IP addresses example
-    fig5 = px.bar(
+    return px.bar(
         status_code_df, 
         x='Status Code', 
         y='Count', 
@@ -179,27 +467,186 @@ def index():
         color='Status Code',
         category_orders={'Status Code': status_code_df['Status Code'].unique()}
     )
-    # Convert Plotly figure to HTML
-    plot5_html = pio.to_html(fig5, full_html=False)
 
+# Dashboard charts in display order: name -> (heading, builder)
+CHARTS = {
+    'top_ips': ('Top 10 Most Frequent IP Addresses', build_top_ips_figure),
+    'requests_over_time': ('Requests Over Time', build_requests_over_time_figure),
+    'successful_paths': ('Number of Successful Requests for Different Paths/Resources', build_successful_paths_figure),
+    'devices': ('Distribution of Devices', build_devices_figure),
+    'status_codes': ('Distribution of Status Codes', build_status_codes_figure),
+}
+
+# Rendered figures, shared by all requests of this process
+figure_cache = FigureCache(maxsize=app.config['FIGURE_CACHE_SIZE'], ttl=app.config['FIGURE_CACHE_TTL'])
+
+# Let dashboard reads go on while logs are being loaded: SQLite in write-ahead log mode
+@event.listens_for(Engine, 'connect')
+def enable_write_ahead_log(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.execute('PRAGMA journal_mode=WAL')
+
+# Time every SQL statement by kind; start times are kept per connection
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'NONE'
+    metrics.observe('db_query', time.perf_counter() - conn.info['query_start'].pop(), statement=kind)
+
+@event.listens_for(Engine, 'handle_error')
+def drop_query_timer(context):
+    starts = context.connection.info.get('query_start') if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+# Time every request. With PROFILE_REQUESTS enabled, a request with ?profile=1 also runs under
+# cProfile; the stats are written to PROFILE_DIR and named in the X-Profile response header.
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    if app.config['PROFILE_REQUESTS'] and request.args.get('profile'):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # Another request of this process is being profiled
+            return
+        g.profiler = profiler
+
+@app.after_request
+def stop_request_timer(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        profile_dir = log_loader.resolve_path(app.config['PROFILE_DIR'])
+        os.makedirs(profile_dir, exist_ok=True)
+        file_name = f'{request.endpoint}-{time.time_ns()}.prof'
+        profiler.dump_stats(os.path.join(profile_dir, file_name))
+        response.headers['X-Profile'] = file_name
+    metrics.observe('http_request', time.perf_counter() - g.request_start, endpoint=request.endpoint or 'none')
+    metrics.count('http_responses', endpoint=request.endpoint or 'none', status=response.status_code)
+    return response
+
+# Identifies the loaded data; changes whenever populate_db loads new rows
+def data_version():
+    loaded_at = db.session.query(db.func.max(IngestState.loaded_at)).scalar()
+    return loaded_at.isoformat() if loaded_at else None
+
+# Threads that render charts. Bounds the CPU spent on figures however many requests wait for them;
+# every render runs in its own app context, so with its own pooled database session.
+chart_pool = ThreadPoolExecutor(max_workers=app.config['CHART_WORKERS'], thread_name_prefix='chart')
+
+# Start rendering a chart as an HTML fragment or as Plotly JSON in the chart pool. Cached renders are
+# reused, and requests for a chart that is being rendered wait for that render instead of starting
+# another. plotly.js itself is loaded once by the page, so it is never embedded here.
+def render_chart_async(name, output_format='html', filters=None):
+    _, builder = CHARTS[name]
+    filters = filters or {}
+    key = (name, output_format, tuple(sorted(filters.items())), data_version())
+
+    def build():
+        with app.app_context():
+            with metrics.timer('build_figure', chart=name):
+                fig = builder(filters)
+            with metrics.timer('serialize_figure', chart=name, format=output_format):
+                if output_format == 'json':
+                    return fig.to_json()
+                return pio.to_html(fig, full_html=False, include_plotlyjs=False)
+
+    return figure_cache.get_or_submit(key, build, chart_pool)
+
+# Wait for chart renders until CHART_TIMEOUT seconds from now; returns the renders that finished in time
+def collect_charts(futures):
+    # Give the request's database connection back to the pool while waiting, so the renders get one
+    db.session.close()
+    deadline = time.monotonic() + app.config['CHART_TIMEOUT']
+    finished = {}
+    for name, future in futures.items():
+        try:
+            finished[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            # The render goes on in the pool and is cached for the retry
+            metrics.count('chart_timeouts', chart=name)
+    return finished
+
+@app.route('/api/charts/<name>')
+@login_required
+def chart_data(name):
+    if name not in CHARTS:
+        abort(404)
+    figure = collect_charts({name: render_chart_async(name, 'json', parse_filters(request.args))}).get(name)
+    if figure is None:
+        return ({'error': f"Chart {name} is still rendering; retry shortly"}, 504,
+                {'Retry-After': str(app.config['CHART_RETRY_AFTER'])})
+    return Response(figure, mimetype='application/json')
+
+# Requests matching the dashboard filters, read through the row-group index of the dataset
+@app.route('/api/logs')
+@login_required
+def log_query():
+    filters = parse_filters(request.args)
+    limit = request.args.get('limit', '1000').strip()
+    if not limit.isdigit():
+        abort(400, f"Invalid limit: {limit}")
+    limit = int(limit)
+    stats = {}
+    # Reading stops once the first rows are known, so unfiltered queries do not scan the whole dataset
+    rows = log_index.query_logs(log_store.DEFAULT_DATASET, start=filters.get('start'), end=filters.get('end'),
+                                ip=filters.get('ip'), stats=stats, limit=limit)
+    # Keep the wall time and offset of the logs rather than converting to UTC
+    rows = rows.assign(Timestamp=rows['Timestamp'].map(pd.Timestamp.isoformat))
+    return {'filters': filters, 'stats': stats, 'rows': json.loads(rows.to_json(orient='records'))}
+
+# One request count series, e.g. all, status:5xx or method:POST, in the window of the dashboard filters
+@app.route('/api/timeseries/<series>')
+@login_required
+def time_series_data(series):
+    points = time_series_points(series, parse_filters(request.args))
+    return {
+        'series': series,
+        'timestamps': [timestamp.isoformat() for timestamp in points['Timestamp']],
+        'counts': points['Number of Requests'].tolist(),
+    }
 
-    return render_template('index.html', plot1=plot1_html, plot2=plot2_html, plot3=plot3_html, plot4=plot4_html, plot5=plot5_html)
+@app.route('/')
+@login_required
+def index():
+    charts = [(name, heading) for name, (heading, _) in CHARTS.items()]
+    filters = parse_filters(request.args)
+    # Lazy pages fetch every chart from /api/charts in parallel; otherwise embed the cached renders
+    if app.config['DASHBOARD_LAZY_CHARTS']:
+        with metrics.timer('render_page', lazy=True):
+            return render_template('index.html', charts=charts, filters=filters, plots={}, pending=list(CHARTS),
+                                   refresh=app.config['DASHBOARD_REFRESH_INTERVAL'])
+    # Render all charts concurrently; those not ready in time are fetched by the page afterwards
+    plots = collect_charts({name: render_chart_async(name, filters=filters) for name in CHARTS})
+    pending = [name for name in CHARTS if name not in plots]
+    with metrics.timer('render_page', lazy=False):
+        return render_template('index.html', charts=charts, filters=filters, plots=plots, pending=pending,
+                               refresh=0)
+
+# Timers and counters of this process in the Prometheus text format. Left open to scrapers:
+# it exposes processing times and counts only, no log data.
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.REGISTRY.to_prometheus(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
 
-    populate_db()
-
-    if User.query.filter_by(username='admin').first() is None:
-            admin_user = User(username='admin')
-            admin_user.set_password('password123')  # Change the password for production use
-            db.session.add(admin_user)
-            db.session.commit()
+        # Handle any exceptions during the load
+        try:
+            populate_db()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error occurred while populating the database: {e}")
+
+        if User.query.filter_by(username='admin').first() is None:
+                admin_user = User(username='admin')
+                admin_user.set_password('password123')  # Change the password for production use
+                db.session.add(admin_user)
+                db.session.commit()
     app.run(debug=True)
-# Handle any exceptions during commit
-try:
-    db.session.commit()
-except Exception as e:
-    db.session.rollback()
-    print(f"Error occurred during commit: {e}")
@@ -0,0 +1,270 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+from main import ANALYSES, DEFAULT_ANALYSES
+from user_agent import UserAgentAnalysis
+from utils import data_extractor, log_generator, metrics, pipeline, ua_cache
+
+# Numbers of log lines benchmarked by default
+DEFAULT_ROWS = [10_000, 1_000_000, 10_000_000]
+
+# Stages run for every number of lines, in order; later stages read what earlier ones wrote
+STAGES = ['extract', 'populate_db', 'analyses', 'dashboard']
+
+# Directory of the generated logs, datasets and databases
+DEFAULT_WORK_DIR = 'data/bench'
+
+# Directory the results are written to, one JSON file per run
+DEFAULT_RESULTS_DIR = 'reports/benchmarks'
+
+# Slowdown from which a stage is reported as a regression by --compare
+REGRESSION_TOLERANCE = 0.2
+
+
+def _peak_rss_mb():
+    """
+    Peak resident memory of this process and of its finished child processes, in MB.
+    """
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    unit = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    peaks = [resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    return max(peaks) / unit
+
+
+def generate(log_file, rows, ips, log_format, seed):
+    stats = log_generator.write_logs(log_file, rows, ips=ips, log_format=log_format, seed=seed)
+    return {'bytes': stats['bytes']}
+
+
+def extract(log_file, dataset, workers, log_format):
+    if workers > 1:
+        stats = data_extractor.parallel_extract([log_file], dataset, workers, log_format=log_format)
+    else:
+        stats = data_extractor.extract(log_file, dataset, log_format=log_format)
+    return {'lines': stats['lines'], 'bytes': stats['bytes']}
+
+
+def populate_db(dataset, database):
+    # The app reads its database from the environment when it is imported
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.abspath(database)}'
+    import app as dashboard
+    with dashboard.app.app_context():
+        dashboard.db.create_all()
+        return {'rows_loaded': dashboard.populate_db(dataset)}
+
+
+def analysis(name, dataset, output_dir):
+    # A cold user agent cache, as on a first run
+    selected = UserAgentAnalysis(ua_cache.UserAgentCache()) if name == UserAgentAnalysis.name else ANALYSES[name]()
+    pipeline.run_pipeline(dataset, [selected])
+    start = time.perf_counter()
+    pipeline.write_results([selected], output_dir)
+    return {'write_seconds': time.perf_counter() - start}
+
+
+def dashboard(database):
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.abspath(database)}'
+    import app as dashboard_app
+    flask_app = dashboard_app.app
+    flask_app.config.update(LOGIN_DISABLED=True)
+    client = flask_app.test_client()
+
+    timings = {}
+    # Page with every chart rendered, first with an empty figure cache, then cached; then the lazy page
+    for label, lazy in [('cold_seconds', False), ('warm_seconds', False), ('lazy_seconds', True)]:
+        flask_app.config['DASHBOARD_LAZY_CHARTS'] = lazy
+        start = time.perf_counter()
+        response = client.get('/')
+        timings[label] = time.perf_counter() - start
+        if response.status_code != 200:
+            raise RuntimeError(f"Dashboard returned status {response.status_code}")
+    return timings
+
+
+def _measure(stage, options):
+    """
+    Run a stage function in this process and measure it.
+
+    Returns:
+        dict: 'seconds', 'peak_rss_mb', 'rss_increase_mb' (peak over the memory in use
+        before the stage), 'arrow_peak_mb' and 'metrics' (the timers and counters of the
+        stage's steps), with the values returned by the stage.
+    """
+    import pyarrow as pa
+
+    before = _peak_rss_mb()
+    start = time.perf_counter()
+    extra = globals()[stage](**options)
+    seconds = time.perf_counter() - start
+    peak = _peak_rss_mb()
+    return dict({
+        'seconds': seconds,
+        'peak_rss_mb': peak,
+        'rss_increase_mb': peak - before,
+        'arrow_peak_mb': pa.default_memory_pool().max_memory() / 1e6,
+        'metrics': metrics.REGISTRY.snapshot(),
+    }, **extra)
+
+
+def run_stage(stage, **options):
+    """
+    Run a stage in a fresh process, so its memory and caches do not depend on the stages before it.
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(_measure, stage, options).result()
+
+
+def _git_version():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def run_benchmarks(rows_list, work_dir=DEFAULT_WORK_DIR, stages=STAGES, analyses=DEFAULT_ANALYSES, ips=None,
+                   log_format=data_extractor.DEFAULT_LOG_FORMAT, workers=1, seed=0):
+    """
+    Time and memory-profile every stage on synthetic logs of several sizes.
+
+    Generated logs are kept in work_dir and reused by later runs with the
+    same arguments; datasets and databases are rebuilt on every run.
+
+    Args:
+        rows_list (list[int]): Numbers of log lines to benchmark.
+        work_dir (str): Directory of the generated files.
+        stages (list[str]): Stages to run, among STAGES.
+        analyses (list[str]): Analyses run by the 'analyses' stage, among main.ANALYSES.
+        ips (int, optional): Distinct client IP addresses; defaults to one per 100 lines.
+        log_format (str): Format of the generated logs.
+        workers (int): Worker processes of the extraction.
+        seed (int): Seed of the log generator.
+
+    Returns:
+        list[dict]: One result per size and stage, with 'rows', 'stage', 'rows_per_second' and
+        the measurements of _measure.
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    results = []
+
+    def record(rows, label, result):
+        result = dict({'rows': rows, 'stage': label,
+                       'rows_per_second': rows / result['seconds'] if result['seconds'] else 0.0}, **result)
+        results.append(result)
+        print(f"{rows:>11,} {label:<28} {result['seconds']:9.2f}s {result['rows_per_second']:>12,.0f} rows/s "
+              f"{result['peak_rss_mb']:9.0f} MB peak")
+
+    for rows in rows_list:
+        size_ips = ips or max(10, rows // 100)
+        log_file = os.path.join(work_dir, f'synthetic-{rows}-{size_ips}ips-{log_format}-{seed}.log')
+        dataset = os.path.join(work_dir, f'dataset-{rows}')
+        database = os.path.join(work_dir, f'bench-{rows}.db')
+        if not os.path.exists(log_file):
+            record(rows, 'generate', run_stage('generate', log_file=log_file, rows=rows, ips=size_ips,
+                                               log_format=log_format, seed=seed))
+
+        if 'extract' in stages:
+            record(rows, 'extract', run_stage('extract', log_file=log_file, dataset=dataset, workers=workers,
+                                              log_format=log_format))
+        if 'populate_db' in stages:
+            if os.path.exists(database):
+                os.remove(database)
+            record(rows, 'populate_db', run_stage('populate_db', dataset=dataset, database=database))
+        if 'analyses' in stages:
+            output_dir = os.path.join(work_dir, f'reports-{rows}')
+            shutil.rmtree(output_dir, ignore_errors=True)
+            for name in analyses:
+                record(rows, f'analysis:{name}', run_stage('analysis', name=name, dataset=dataset,
+                                                           output_dir=output_dir))
+        if 'dashboard' in stages:
+            record(rows, 'dashboard', run_stage('dashboard', database=database))
+    return results
+
+
+def compare_results(previous, current, tolerance=REGRESSION_TOLERANCE):
+    """
+    Compare the results of two runs stage by stage.
+
+    Args:
+        previous (list[dict]): Results of the earlier run.
+        current (list[dict]): Results of the later run.
+        tolerance (float): Relative slowdown or memory growth reported as a regression.
+
+    Returns:
+        pd.DataFrame: Seconds and peak memory of both runs per size and stage, their ratios
+        and a 'regression' flag, for the stages present in both runs.
+    """
+    columns = ['rows', 'stage', 'seconds', 'peak_rss_mb']
+    merged = pd.merge(pd.DataFrame(previous)[columns], pd.DataFrame(current)[columns], on=['rows', 'stage'],
+                      suffixes=(' before', ' after'))
+    merged['time ratio'] = merged['seconds after'] / merged['seconds before']
+    merged['memory ratio'] = merged['peak_rss_mb after'] / merged['peak_rss_mb before']
+    merged['regression'] = (merged['time ratio'] > 1 + tolerance) | (merged['memory ratio'] > 1 + tolerance)
+    return merged
+
+
+def main() -> None:
+    """
+    Main entry point of the script.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark extraction, loading, analyses and the dashboard '
+                                                 'on synthetic logs.')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS, help='Numbers of log lines')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES, help='Stages to run')
+    parser.add_argument('--analyses', nargs='+', choices=list(ANALYSES), default=DEFAULT_ANALYSES,
+                        help='Analyses timed by the analyses stage')
+    parser.add_argument('--ips', type=int, help='Distinct client IP addresses (default: one per 100 lines)')
+    parser.add_argument('--log-format', choices=list(data_extractor.LOG_PATTERNS),
+                        default=data_extractor.DEFAULT_LOG_FORMAT, help='Format of the generated logs')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes of the extraction')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the log generator')
+    parser.add_argument('--work-dir', default=DEFAULT_WORK_DIR, help='Directory of the generated files')
+    parser.add_argument('--output', help='JSON file the results are written to '
+                                         f'(default: a new file in {DEFAULT_RESULTS_DIR})')
+    parser.add_argument('--compare', help='Results of an earlier run to compare with')
+    args = parser.parse_args()
+
+    started = datetime.now()
+    results = run_benchmarks(args.rows, args.work_dir, args.stages, args.analyses, args.ips, args.log_format,
+                             args.workers, args.seed)
+
+    import pyarrow as pa
+    report = {
+        'version': _git_version(),
+        'started': started.isoformat(timespec='seconds'),
+        'environment': {'python': platform.python_version(), 'pandas': pd.__version__, 'pyarrow': pa.__version__,
+                        'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'options': {'ips': args.ips, 'log_format': args.log_format, 'workers': args.workers, 'seed': args.seed},
+        'results': results,
+    }
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"benchmark-{started:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    print(f"Wrote {len(results)} results to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            previous = json.load(file)
+        comparison = compare_results(previous['results'], results)
+        print(f"Compared with {previous.get('version')} ({previous.get('started')}):")
+        print(comparison.to_string(index=False, float_format=lambda value: f'{value:.2f}'))
+        if comparison['regression'].any():
+            print(f"{int(comparison['regression'].sum())} stages regressed by more than {REGRESSION_TOLERANCE:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
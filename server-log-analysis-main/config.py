@@ -3,5 +3,25 @@ import os
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 class Config:
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, 'app.db')  # Use SQLite for simplicity
+    # Use SQLite for simplicity; DATABASE_URL points the app at another database, e.g. for benchmarks
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///' + os.path.join(basedir, 'app.db'))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Database connections kept open and extra ones opened under load; one per concurrent request and chart render
+    SQLALCHEMY_ENGINE_OPTIONS = {'pool_size': 10, 'max_overflow': 30}
+    # Rendered dashboard figures: number kept and lifetime in seconds
+    FIGURE_CACHE_SIZE = 128
+    FIGURE_CACHE_TTL = 300
+    # Fetch dashboard charts from /api/charts in the browser instead of embedding them in the page
+    DASHBOARD_LAZY_CHARTS = True
+    # Seconds between refreshes of the lazily loaded charts, so newly tailed logs show up; 0 disables
+    DASHBOARD_REFRESH_INTERVAL = 5
+    # Threads rendering dashboard charts, shared by all requests
+    CHART_WORKERS = 4
+    # Seconds a request waits for a chart; slower charts are fetched again by the page
+    CHART_TIMEOUT = 10
+    # Seconds the page waits before fetching a chart that timed out again
+    CHART_RETRY_AFTER = 1
+    # Profile requests that ask for it with ?profile=1 under cProfile; off by default as it slows them down
+    PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS', '') == '1'
+    # Directory the request profiles are written to, one .prof file per request
+    PROFILE_DIR = 'data/cache/profiles'
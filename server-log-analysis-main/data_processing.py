@@ -1,9 +1,9 @@
-import pandas as pd
+from utils import log_loader
 
 def performance_monitoring(file_path):
-    df = pd.read_csv(file_path)
+    df = log_loader.load_logs(file_path, columns=['Request Path'])
     
     # Example processing; adjust according to your needs
-    summary = df.groupby('Request Path').size().reset_index(name='Number of Requests')
+    summary = df.groupby('Request Path', observed=True).size().reset_index(name='Number of Requests')
     
     return summary
@@ -1,5 +1,67 @@
-from utils import SummaryAnalysis as sa
+import argparse
+import time
+
+from anomaly_detection import AnomalyAnalysis
+from Error_Analysis import ErrorAnalysis
+from path_analytics import PathAnalysis
+from performance_monitoring import PerformanceAnalysis
+from sessionization_and_behavior_analysis import SessionAnalysis
+from TrafficAnalysis import TrafficAnalysis
+from user_agent import UserAgentAnalysis
+from utils import log_loader, log_store, metrics, pipeline, ua_cache
+from utils.SummaryAnalysis import SketchSummary, Summary
+
+# Analyses that can share one scan of the logs, in report order
+ANALYSES = {analysis.name: analysis for analysis in [
+    Summary, ErrorAnalysis, TrafficAnalysis, PathAnalysis, PerformanceAnalysis, UserAgentAnalysis, SessionAnalysis,
+    AnomalyAnalysis, SketchSummary,
+]}
+
+# Analyses run when none are selected; the sketch summary is an opt-in bounded-memory alternative
+DEFAULT_ANALYSES = [name for name in ANALYSES if name != SketchSummary.name]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run several log analyses over a single scan of the logs.')
+    parser.add_argument('--input', default=log_store.DEFAULT_DATASET, help='Log dataset to analyze')
+    parser.add_argument('--analyses', nargs='+', choices=list(ANALYSES), default=DEFAULT_ANALYSES,
+                        help='Analyses to run (default: all but sketch_summary)')
+    parser.add_argument('--output-dir', default='reports', help='Directory the results are written to')
+    parser.add_argument('--chunk-size', type=int, default=pipeline.DEFAULT_CHUNK_SIZE,
+                        help='Rows per chunk of the scan')
+    parser.add_argument('--metrics', action='store_true', help='Print the time spent in every stage and the counters')
+    args = parser.parse_args()
+
+    # Keep parsed user agents across runs
+    cache = ua_cache.UserAgentCache(cache_file=log_loader.resolve_path(ua_cache.DEFAULT_CACHE_FILE))
+    analyses = [UserAgentAnalysis(cache) if name == UserAgentAnalysis.name else ANALYSES[name]()
+                for name in args.analyses]
+
+    start = time.perf_counter()
+    results = pipeline.run_pipeline(args.input, analyses, args.chunk_size)
+    paths = pipeline.write_results(analyses, args.output_dir)
+    cache.save()
+
+    for name, result in results.items():
+        print(f"[{name}]")
+        for key, value in result.items():
+            if not hasattr(value, 'to_string'):
+                print(f"  {key}: {value}")
+    print(f"Wrote {len(paths)} files to {args.output_dir} in {time.perf_counter() - start:.2f}s")
+    if args.metrics:
+        print_metrics(metrics.REGISTRY.snapshot())
+
+
+def print_metrics(snapshot):
+    def describe(name, labels):
+        return name + (f" ({', '.join(f'{key}={value}' for key, value in labels.items())})" if labels else '')
+
+    print("[metrics]")
+    for timer in sorted(snapshot['timers'], key=lambda timer: -timer['seconds']):
+        print(f"  {describe(timer['stage'], timer['labels'])}: {timer['seconds']:.3f}s in {timer['count']} runs")
+    for counter in snapshot['counters']:
+        print(f"  {describe(counter['name'], counter['labels'])}: {counter['value']:,}")
+
 
 if __name__ == '__main__':
-    file_path = 'data/csv/server_logs.csv'
-    sa.summary(file_path)
+    main()
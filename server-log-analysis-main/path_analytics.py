@@ -1,5 +1,63 @@
+import os
+
 import pandas as pd
 import plotly.express as px
+from utils import log_loader, log_store, path_templates, pipeline
+
+class PathAnalysis(pipeline.Analysis):
+    """
+    Number of requests per route, the template of the request paths
+    (e.g. /product/{id}), so counts do not scatter over ids and query strings.
+    """
+
+    name = 'paths'
+    columns = ['Request Path']
+
+    def __init__(self, normalizer=None):
+        """
+        Args:
+            normalizer (path_templates.PathNormalizer, optional): Maps paths to routes;
+                defaults to path_templates.default_normalizer.
+        """
+        self.normalizer = normalizer
+        # Empty counts, so a run over no rows still finishes
+        self.path_counts = pd.Series([], index=pd.Index([], dtype=object), dtype='int64')
+
+    def update(self, chunk):
+        if not chunk.empty:
+            routes = path_templates.route_templates(chunk['Request Path'], self.normalizer)
+            self.path_counts = pipeline.add_counts(self.path_counts, routes)
+
+    def finish(self):
+        self.path_counts = self.path_counts.sort_index().sort_values(ascending=False, kind='mergesort')
+        top_route = self.path_counts.index[0] if len(self.path_counts) else None
+        return {'routes': len(self.path_counts), 'top_route': top_route}
+
+    def write(self, output_dir):
+        figure_path = os.path.join(output_dir, 'paths.html')
+        path_figure(self.path_counts).write_html(figure_path, include_plotlyjs='cdn')
+
+        counts_path = os.path.join(output_dir, 'paths.csv')
+        self.path_counts.rename_axis('Route').to_frame('Count').to_csv(counts_path)
+        return [figure_path, counts_path]
+
+def path_figure(path_counts: pd.Series):
+    """
+    Build a bar chart of request counts per route.
+
+    Args:
+        path_counts (pd.Series): Number of requests, indexed by route.
+
+    Returns:
+        plotly.graph_objects.Figure: The bar chart.
+    """
+    # Create a DataFrame for routes and their counts
+    path_df = pd.DataFrame({'Route': path_counts.index, 'Count': path_counts.values})
+
+    # Plot the distribution of request paths using Plotly
+    fig = px.bar(path_df, x='Route', y='Count', title='Distribution of Request Paths')
+    fig.update_layout(xaxis_title='Route', yaxis_title='Number of Requests')
+    return fig
 
 def path_analysis(file_dir: str) -> None:
     """
@@ -9,8 +67,8 @@ def path_analysis(file_dir: str) -> None:
         file_dir (str): The directory of the server log file.
     """
     try:
-        # Read the data from the CSV file
-        df = pd.read_csv(file_dir)
+        # Read only the request paths from the log dataset
+        df = log_loader.load_logs(file_dir, columns=['Request Path'])
         print("File read successfully")
     except FileNotFoundError:
         print(f"Error: File not found at {file_dir}")
@@ -22,25 +80,19 @@ def path_analysis(file_dir: str) -> None:
         print(f"Error: Unable to parse file at {file_dir}: {e}")
         return
     except Exception as e:
-        print(f"Error reading CSV file: {e}")
+        print(f"Error reading log data: {e}")
         return
 
     try:
-        # Extract request paths
-        request_paths = df['Request Path']
-
-        # Count the occurrences of each request path
-        path_counts = request_paths.value_counts()
-
-        # Create a DataFrame for paths and their counts
-        path_df = pd.DataFrame({'Path': path_counts.index, 'Count': path_counts.values})
+        # Collapse the request paths into routes
+        routes = path_templates.route_templates(df['Request Path'])
 
-        # Plot the distribution of request paths using Plotly
-        fig = px.bar(path_df, x='Path', y='Count', title='Distribution of Request Paths')
-        fig.update_layout(xaxis_title='Path Reference Number', yaxis_title='Number of Requests')
+        # Count the occurrences of each route
+        path_counts = routes.value_counts()
+        path_counts = path_counts[path_counts > 0]
 
         # Show the plot
-        fig.show()
+        path_figure(path_counts).show()
     except Exception as e:
         print(f"Error generating plot: {e}")
 
@@ -48,7 +100,7 @@ def main() -> None:
     """
     Main entry point of the script.
     """
-    path_analysis('data/csv/server_logs.csv')
+    path_analysis(log_store.DEFAULT_DATASET)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
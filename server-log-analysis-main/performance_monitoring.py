@@ -1,22 +1,105 @@
+import argparse
+import os
+
 import pandas as pd
 import plotly.express as px
+from utils import log_store, path_templates, pipeline, sketches
+
+# Quantiles reported per path and time window
+QUANTILES = [0.5, 0.95, 0.99]
+
+class PerformanceAnalysis(pipeline.Analysis):
+    """
+    Per-route latency and bytes quantiles over time windows.
 
-def performance_monitoring(file_dir: str) -> None:
+    Paths are grouped by route template (see path_templates), so ids and
+    query strings do not split them into millions of groups. Every
+    (window, route) group keeps a t-digest, so p50/p95/p99 are computed in
+    one pass over chunks of any size without holding the raw values.
+    Latency is only available for log formats with $request_time.
     """
-    Analyze server logs and display a bar chart of successful requests by path.
+
+    name = 'performance'
+    columns = ['Timestamp', 'Request Path', 'Status Code']
+    optional_columns = ['Bytes', 'Request Time']
+
+    def __init__(self, window='1H'):
+        """
+        Args:
+            window (str): Length of the time windows, as a pandas offset alias.
+        """
+        self.window = window
+        # Empty counts, so a run over no rows still finishes
+        self.successful_counts = pd.Series([], index=pd.Index([], dtype=object), dtype='int64')
+        self.latency = sketches.GroupedTDigest(['Window', 'Route'])
+        self.bytes_sent = sketches.GroupedTDigest(['Window', 'Route'])
+        self.stats = None
+
+    def update(self, chunk):
+        if chunk.empty:
+            return
+        routes = path_templates.route_templates(chunk['Request Path'])
+        successful = routes[chunk['Status Code'] == 200]
+        self.successful_counts = pipeline.add_counts(self.successful_counts, successful)
+
+        frame = chunk.drop(columns=['Timestamp', 'Request Path', 'Status Code'])
+        frame.insert(0, 'Window', chunk['Timestamp'].dt.floor(self.window))
+        frame.insert(1, 'Route', routes)
+        if 'Request Time' in frame:
+            self.latency.add(frame, 'Request Time')
+        if 'Bytes' in frame:
+            self.bytes_sent.add(frame, 'Bytes')
+
+    def finish(self):
+        keys = ['Window', 'Route']
+        stats = []
+        requests = None
+        for label, digest in [('Bytes', self.bytes_sent), ('Latency', self.latency)]:
+            quantiles = digest.quantiles(QUANTILES)
+            if len(quantiles):
+                stats.append(quantiles.drop(columns='count').set_index(keys).add_prefix(f'{label} '))
+                if requests is None:
+                    requests = quantiles.set_index(keys)['count'].rename('Requests')
+        if stats:
+            self.stats = pd.concat([requests] + stats, axis=1).reset_index()
+        else:
+            self.stats = pd.DataFrame(columns=keys + ['Requests'])
+        return {'windows': self.stats['Window'].nunique(), 'routes': self.stats['Route'].nunique()}
+
+    def write(self, output_dir):
+        stats_path = os.path.join(output_dir, 'performance.csv')
+        self.stats.to_csv(stats_path, index=False)
+
+        figure_path = os.path.join(output_dir, 'performance_successful_paths.html')
+        successful_requests_figure(self.successful_counts).write_html(figure_path, include_plotlyjs='cdn')
+        return [stats_path, figure_path]
+
+def successful_requests_figure(successful_counts):
+    request_counts = successful_counts.rename_axis('Route').reset_index(name='Count')
+    return px.bar(request_counts, x='Route', y='Count',
+                  title='Number of Successful Requests for Different Paths/Resources')
+
+def performance_monitoring(file_dir: str, window: str = '1H', chunk_size: int = pipeline.DEFAULT_CHUNK_SIZE):
+    """
+    Analyze server logs: display a bar chart of successful requests by route
+    and report per-route p50/p95/p99 latency and bytes per time window.
 
     Args:
         file_dir (str): The directory of the server log file.
+        window (str): Length of the time windows, as a pandas offset alias.
+        chunk_size (int): Rows per chunk of the scan.
+
+    Returns:
+        pd.DataFrame | None: One row per window and route with the request count and
+        the bytes and latency quantiles, or None if the logs could not be read.
     """
     try:
-        df = pd.read_csv(file_dir)
-        df['Timestamp'] = pd.to_datetime(df['Timestamp'], format='%d/%b/%Y:%H:%M:%S %z')
-        relevant_columns = ['Timestamp', 'Request Path', 'Status Code']
-        df = df[relevant_columns]
-        successful_requests = df[df['Status Code'] == 200]
-        request_counts = successful_requests.groupby('Request Path').size().reset_index(name='Count')
-        fig = px.bar(request_counts, x='Request Path', y='Count', title='Number of Successful Requests for Different Paths/Resources')
+        analysis = PerformanceAnalysis(window)
+        pipeline.run_pipeline(file_dir, [analysis], chunk_size)
+        fig = successful_requests_figure(analysis.successful_counts)
         fig.show()
+        print(analysis.stats.sort_values('Requests', ascending=False, kind='mergesort').to_string(max_rows=20))
+        return analysis.stats
     except FileNotFoundError:
         print(f"Error: File not found at {file_dir}")
     except pd.errors.EmptyDataError:
@@ -28,7 +111,11 @@ def main() -> None:
     """
     Main entry point of the script.
     """
-    performance_monitoring('data/csv/server_logs.csv')
+    parser = argparse.ArgumentParser(description='Report per-route latency and bytes quantiles over time windows.')
+    parser.add_argument('--input', default=log_store.DEFAULT_DATASET, help='Log dataset to analyze')
+    parser.add_argument('--window', default='1H', help='Time window as a pandas offset alias (default: 1H)')
+    args = parser.parse_args()
+    performance_monitoring(args.input, args.window)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
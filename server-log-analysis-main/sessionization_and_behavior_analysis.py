@@ -1,27 +1,272 @@
-import pandas as pd
+import argparse
+import os
+import pickle
+import time
 from datetime import timedelta
-from utils import SetEnv
 
-def sessionization_and_behavior_analysis(file_dir, session_duration_minutes=30):
-    # Set Working path
-    _env = SetEnv.set_path()
-    # Read the data from the CSV file
-    df = pd.read_csv(f'{_env}/{file_dir}')
+import numpy as np
+import pandas as pd
+from utils import log_loader, log_store, pipeline
+
+# Columns needed to build sessions
+SESSION_INPUT_COLUMNS = ['IP Address', 'Timestamp', 'Request Path']
+
 
-    # Convert the Timestamp column to datetime
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'], format='%d/%b/%Y:%H:%M:%S %z')
+def sessionize(df, session_duration_minutes=30, page_sequences=False):
+    """
+    Group requests into sessions per IP address in a single vectorized pass.
 
-    # Define the session duration in minutes
+    A new session starts whenever the IP address changes or the gap since the
+    previous request of the same IP exceeds session_duration_minutes.
+
+    Args:
+        df (pd.DataFrame): Requests with 'IP Address', 'Timestamp' and 'Request Path' columns.
+        session_duration_minutes (float): Maximum idle gap within a session.
+        page_sequences (bool): Also return the ordered list of paths of each session.
+
+    Returns:
+        pd.DataFrame: One row per session with 'Session ID', 'IP Address', 'Start', 'End',
+        'Duration', 'Hits', 'Entry Path' and 'Exit Path' (and 'Page Sequence' if requested).
+    """
     session_duration = timedelta(minutes=session_duration_minutes)
+    df = df.sort_values(by=['IP Address', 'Timestamp'], kind='mergesort').reset_index(drop=True)
+
+    ip_addresses = df['IP Address']
+    timestamps = df['Timestamp']
+    new_session = (ip_addresses != ip_addresses.shift()) | (timestamps.diff() > session_duration)
+    new_session.iloc[:1] = True
+
+    # Positions of the first and last request of every session
+    starts = np.flatnonzero(new_session.to_numpy())
+    ends = np.append(starts[1:], len(df)) - 1
+
+    sessions = pd.DataFrame({
+        'Session ID': np.arange(len(starts)),
+        'IP Address': ip_addresses.take(starts).to_numpy(),
+        'Start': timestamps.take(starts).to_numpy(),
+        'End': timestamps.take(ends).to_numpy(),
+        'Hits': ends - starts + 1,
+        'Entry Path': df['Request Path'].take(starts).to_numpy(),
+        'Exit Path': df['Request Path'].take(ends).to_numpy(),
+    })
+    sessions['Duration'] = sessions['End'] - sessions['Start']
+    sessions = sessions[['Session ID', 'IP Address', 'Start', 'End', 'Duration', 'Hits', 'Entry Path', 'Exit Path']]
+
+    if page_sequences:
+        session_ids = new_session.cumsum().to_numpy() - 1
+        sequences = df['Request Path'].astype(object).groupby(session_ids).agg(list)
+        sessions['Page Sequence'] = sequences.to_numpy()
+    return sessions
+
+
+class IncrementalSessionizer:
+    """
+    Stateful sessionizer that consumes log records batch by batch.
+
+    Only sessions that may still receive requests are kept in memory, one per
+    IP address. A session is closed, and emitted from update, once a later
+    request of the same IP arrives after the gap or once no request of that IP
+    has been seen for session_duration_minutes of log time. The state can be
+    checkpointed to disk and restored after a restart.
+
+    Batches are expected in roughly chronological order; records within a
+    batch may be in any order.
+    """
+
+    def __init__(self, session_duration_minutes=30, page_sequences=False):
+        self.session_duration_minutes = session_duration_minutes
+        self.page_sequences = page_sequences
+        # Latest log time seen so far; drives eviction of idle sessions
+        self.watermark = None
+        # Caller-defined resume position (e.g. file offsets), saved with the checkpoint
+        self.position = None
+        self._next_session_id = 0
+        self._open = self._empty_sessions()
+
+    @property
+    def session_duration(self):
+        return timedelta(minutes=self.session_duration_minutes)
+
+    @property
+    def open_sessions(self):
+        """
+        pd.DataFrame: The sessions still open, indexed by IP address.
+        """
+        return self._open
+
+    def _empty_sessions(self):
+        columns = ['Start', 'End', 'Hits', 'Entry Path', 'Exit Path']
+        if self.page_sequences:
+            columns.append('Page Sequence')
+        return pd.DataFrame(columns=columns, index=pd.Index([], name='IP Address'))
+
+    def _emit(self, closed):
+        """
+        Number closed sessions and shape them like the output of sessionize.
+        """
+        closed = closed.reset_index()
+        closed.insert(0, 'Session ID', np.arange(self._next_session_id, self._next_session_id + len(closed)))
+        self._next_session_id += len(closed)
+        closed['Duration'] = closed['End'] - closed['Start']
+        columns = ['Session ID', 'IP Address', 'Start', 'End', 'Duration', 'Hits', 'Entry Path', 'Exit Path']
+        if self.page_sequences:
+            columns.append('Page Sequence')
+        return closed[columns]
+
+    def update(self, df):
+        """
+        Add a batch of requests.
+
+        Args:
+            df (pd.DataFrame): Requests with 'IP Address', 'Timestamp' and 'Request Path' columns.
+
+        Returns:
+            pd.DataFrame: Sessions closed by this batch, in the format of sessionize.
+        """
+        if df.empty:
+            return self._emit(self._empty_sessions())
+
+        batch = sessionize(df, self.session_duration_minutes, self.page_sequences).drop(columns='Session ID')
+        batch['IP Address'] = batch['IP Address'].astype(object)
+        first = ~batch['IP Address'].duplicated()
+        last = ~batch['IP Address'].duplicated(keep='last')
+        closed = []
+        remaining = []
+
+        if len(self._open):
+            # The first batch session of an IP continues its open session if the gap is small enough
+            previous = self._open.reindex(batch['IP Address'])
+            previous.index = batch.index
+            continues = first & (batch['Start'] - previous['End'] <= self.session_duration)
+            # Late records may start before the open session did
+            batch['Start'] = batch['Start'].mask(continues & (previous['Start'] < batch['Start']), previous['Start'])
+            batch.loc[continues, 'Hits'] += previous.loc[continues, 'Hits']
+            batch.loc[continues, 'Entry Path'] = previous.loc[continues, 'Entry Path']
+            if self.page_sequences:
+                batch.loc[continues, 'Page Sequence'] = (
+                    previous.loc[continues, 'Page Sequence'] + batch.loc[continues, 'Page Sequence'])
+
+            # Open sessions of IPs seen in this batch that were not continued are finished
+            in_batch = self._open.index.isin(batch['IP Address'])
+            continued = self._open.index.isin(batch.loc[continues, 'IP Address'])
+            closed.append(self._open[in_batch & ~continued])
+            remaining.append(self._open[~in_batch])
+
+        # All but the last batch session of every IP are finished as well
+        batch = batch.set_index('IP Address')
+        closed.append(batch[~last.to_numpy()])
+        self._open = pd.concat(remaining + [batch[last.to_numpy()]])
+
+        batch_end = df['Timestamp'].max()
+        self.watermark = batch_end if self.watermark is None else max(self.watermark, batch_end)
+        closed.append(self._evict())
+        closed = [frame for frame in closed if len(frame)]
+        if not closed:
+            return self._emit(self._empty_sessions())
+        return self._emit(pd.concat(closed).sort_values('Start', kind='mergesort'))
+
+    def _evict(self):
+        """
+        Remove and return the open sessions idle for longer than the session duration.
+        """
+        idle = self._open['End'] < self.watermark - self.session_duration
+        evicted = self._open[idle]
+        self._open = self._open[~idle]
+        return evicted
+
+    def flush(self):
+        """
+        Close all open sessions, e.g. at the end of a log file.
+
+        Returns:
+            pd.DataFrame: The sessions that were still open.
+        """
+        closed = self._open.sort_values('Start', kind='mergesort')
+        self._open = self._empty_sessions()
+        return self._emit(closed)
 
-    # Sort the DataFrame by IP address and Timestamp
+    def save(self, checkpoint_path):
+        """
+        Atomically write the sessionizer state to disk.
+
+        Args:
+            checkpoint_path (str): Path of the checkpoint file.
+        """
+        temporary_path = f'{checkpoint_path}.tmp'
+        with open(temporary_path, 'wb') as file:
+            pickle.dump(self.__dict__, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, checkpoint_path)
+
+    @classmethod
+    def load(cls, checkpoint_path):
+        """
+        Restore a sessionizer from a checkpoint written by save.
+
+        Args:
+            checkpoint_path (str): Path of the checkpoint file.
+
+        Returns:
+            IncrementalSessionizer: The restored sessionizer.
+        """
+        with open(checkpoint_path, 'rb') as file:
+            state = pickle.load(file)
+        sessionizer = cls.__new__(cls)
+        sessionizer.__dict__.update(state)
+        return sessionizer
+
+
+class SessionAnalysis(pipeline.Analysis):
+    """
+    Sessions per IP address, built incrementally from the chunks of a scan.
+    """
+
+    name = 'sessions'
+    columns = SESSION_INPUT_COLUMNS
+
+    def __init__(self, session_duration_minutes=30):
+        self.sessionizer = IncrementalSessionizer(session_duration_minutes)
+        self.closed = []
+        self.sessions = None
+
+    def update(self, chunk):
+        closed = self.sessionizer.update(chunk)
+        if len(closed):
+            self.closed.append(closed)
+
+    def finish(self):
+        sessions = pd.concat(self.closed + [self.sessionizer.flush()], ignore_index=True)
+        # Number sessions by start time so the result does not depend on the chunk size
+        sessions = sessions.sort_values(['Start', 'IP Address'], kind='mergesort', ignore_index=True)
+        sessions['Session ID'] = np.arange(len(sessions))
+        self.sessions = sessions
+        return {
+            'sessions': len(self.sessions),
+            'average_duration': self.sessions['Duration'].mean(),
+            'average_hits': self.sessions['Hits'].mean(),
+        }
+
+    def write(self, output_dir):
+        path = os.path.join(output_dir, 'sessions.csv')
+        self.sessions.to_csv(path, index=False)
+        return [path]
+
+
+def sessionize_iterrows(df, session_duration_minutes=30):
+    """
+    Reference row-by-row implementation, kept to benchmark sessionize against.
+
+    Args:
+        df (pd.DataFrame): Requests with 'IP Address', 'Timestamp' and 'Request Path' columns.
+        session_duration_minutes (float): Maximum idle gap within a session.
+
+    Returns:
+        list[list[pd.Series]]: The requests of each session.
+    """
+    session_duration = timedelta(minutes=session_duration_minutes)
     df = df.sort_values(by=['IP Address', 'Timestamp'])
 
-    # Initialize variables
     sessions = []
     current_session = []
-
-    # Group requests into sessions based on IP address and time window
     for index, row in df.iterrows():
         if not current_session:
             current_session.append(row)
@@ -32,21 +277,67 @@ def sessionization_and_behavior_analysis(file_dir, session_duration_minutes=30):
             else:
                 sessions.append(current_session)
                 current_session = [row]
+    if current_session:
+        sessions.append(current_session)
+    return sessions
+
+
+def benchmark(file_dir, session_duration_minutes=30, repeat=3):
+    """
+    Time sessionize against the row-by-row reference implementation.
+
+    Args:
+        file_dir (str): The log dataset to sessionize.
+        session_duration_minutes (float): Maximum idle gap within a session.
+        repeat (int): Number of runs; the best time is reported.
+
+    Returns:
+        dict: Best time in seconds for 'vectorized' and 'iterrows', and the number of 'rows'.
+    """
+    df = log_loader.load_logs(file_dir, columns=SESSION_INPUT_COLUMNS)
+    results = {'rows': len(df)}
+    for name, function in [('vectorized', sessionize), ('iterrows', sessionize_iterrows)]:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function(df, session_duration_minutes)
+            timings.append(time.perf_counter() - start)
+        results[name] = min(timings)
+    return results
+
+
+def sessionization_and_behavior_analysis(file_dir, session_duration_minutes=30, page_sequences=False):
+    # Read only the columns needed for sessionization
+    df = log_loader.load_logs(file_dir, columns=SESSION_INPUT_COLUMNS)
+
+    # Group requests into sessions based on IP address and time window
+    sessions = sessionize(df, session_duration_minutes, page_sequences)
+
+    # Summarize user behavior across sessions
+    print(f"Sessions: {len(sessions)}")
+    print(f"Average session duration: {sessions['Duration'].mean()}")
+    print(f"Average requests per session: {sessions['Hits'].mean():.2f}")
+    print(sessions[['Session ID', 'IP Address', 'Start', 'Duration', 'Hits']].to_string(max_rows=20))
+    return sessions
 
-    # Analyze user behavior within each session
-    for session in sessions:
-        print(f"Session for IP {session[0]['IP Address']}:")
-        session_start = session[0]['Timestamp']
-        session_end = session[-1]['Timestamp']
-        session_duration = session_end - session_start
-        print(f"Session duration: {session_duration}")
-        print("Page sequence:")
-        for request in session:
-            print(f"- {request['Request Path']}")
-        print("")
 
 def main():
-    sessionization_and_behavior_analysis('data/csv/server_logs.csv')
+    parser = argparse.ArgumentParser(description='Group requests into sessions and summarize user behavior.')
+    parser.add_argument('--input', default=log_store.DEFAULT_DATASET, help='Log dataset to analyze')
+    parser.add_argument('--gap-minutes', type=float, default=30,
+                        help='Idle time after which a new session starts')
+    parser.add_argument('--page-sequences', action='store_true', help='Collect the page sequence of each session')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Time the vectorized sessionizer against the row-by-row implementation')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        results = benchmark(args.input, args.gap_minutes)
+        print(f"{results['rows']} rows: vectorized {results['vectorized']:.4f}s, "
+              f"iterrows {results['iterrows']:.4f}s ({results['iterrows'] / results['vectorized']:.1f}x)")
+        return
+    sessionization_and_behavior_analysis(args.input, args.gap_minutes, args.page_sequences)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,72 @@
+import argparse
+import time
+
+import app as dashboard
+from utils import anomaly, data_extractor, log_store, log_tail
+
+def tail_logs(raw_dir=log_tail.DEFAULT_RAW_DIR, dataset_dir=log_store.DEFAULT_DATASET,
+              log_format=data_extractor.DEFAULT_LOG_FORMAT, interval=1.0, from_start=False,
+              state_file=log_tail.DEFAULT_STATE_FILE):
+    """
+    Follow the raw log files and load every new batch of lines into the
+    dataset, the database and the dashboard rollups as it is written.
+    Spikes in the request rate, errors or single-IP traffic are printed as
+    soon as the minute they happen in is over.
+
+    Args:
+        raw_dir (str): Directory of the raw log files, including rotated ones.
+        dataset_dir (str): Parquet dataset the new records are appended to.
+        log_format (str): Name of a log format, or a custom pattern.
+        interval (float): Seconds between polls of an idle directory.
+        from_start (bool): On the first run, load the existing files too instead of only new lines.
+        state_file (str): File the read positions are kept in across runs; the positions committed
+            with the last batch (see app.restore_tail) take precedence when they are newer.
+    """
+    tailer = log_tail.LogTailer(raw_dir, log_format, state_file, from_start)
+    detector = anomaly.StreamingAnomalyDetector()
+
+    def load(chunk):
+        start = time.perf_counter()
+        typed = log_store.to_typed_frame(chunk)
+        rows = dashboard.append_logs(typed, dataset_dir, tailer)
+        alerts = detector.update(typed)
+        seconds = time.perf_counter() - start
+        # Time between the newest request of the batch and the moment it is visible to the dashboard
+        lag = time.time() - typed['Timestamp'].max().timestamp()
+        print(f"Loaded {rows} rows in {seconds:.2f}s ({rows / seconds if seconds else 0:,.0f} rows/s), "
+              f"lag {lag:.1f}s")
+        for _, alert in alerts.iterrows():
+            print(f"ALERT {alert['Minute']:%Y-%m-%d %H:%M} {alert['Signal']} ({alert['Key']}): "
+                  f"{alert['Count']} requests, expected {alert['Expected']:.0f}, z={alert['Z-Score']:.1f}")
+
+    with dashboard.app.app_context():
+        dashboard.db.create_all()
+        discarded = dashboard.restore_tail(tailer, dataset_dir)
+        if discarded:
+            print(f"Removed {discarded} dataset files appended after the last commit; their lines are read again")
+        # Catch up with anything extracted in batch before following the files
+        dashboard.populate_db(dataset_dir)
+        print(f"Following {tailer.raw_dir}")
+        log_tail.follow(tailer, load, interval)
+
+def main() -> None:
+    """
+    Main entry point of the script.
+    """
+    parser = argparse.ArgumentParser(description='Load new server log lines into the dashboard as they are written.')
+    parser.add_argument('--input', default=log_tail.DEFAULT_RAW_DIR,
+                        help='Directory of the raw log files, including rotated and compressed ones')
+    parser.add_argument('--output', default=log_store.DEFAULT_DATASET, help='Log dataset to append to')
+    parser.add_argument('--log-format', default=data_extractor.DEFAULT_LOG_FORMAT,
+                        help=f"Log format: {', '.join(data_extractor.LOG_PATTERNS)}, or a regular expression")
+    parser.add_argument('--interval', type=float, default=1.0, help='Seconds between polls when idle')
+    parser.add_argument('--from-start', action='store_true',
+                        help='On the first run, load the existing log lines too instead of only new ones')
+    args = parser.parse_args()
+    try:
+        tail_logs(args.input, args.output, args.log_format, args.interval, args.from_start)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# The scripts and the utils package are imported from the project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+# Sample access log shipped with the project, in time order
+SAMPLE_LOG = os.path.join(PROJECT_ROOT, 'data', 'raw', 'server_logs.txt')
+
+
+@pytest.fixture
+def sample_lines():
+    """
+    Lines of the sample access log.
+    """
+    with open(SAMPLE_LOG, 'r', encoding='utf-8') as file:
+        return file.read().splitlines(keepends=True)
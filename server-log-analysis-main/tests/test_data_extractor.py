@@ -0,0 +1,52 @@
+import gzip
+import os
+
+import pytest
+
+from utils import data_extractor, log_loader
+
+
+def _write(path, lines):
+    path.write_text(''.join(lines), encoding='utf-8')
+    return path
+
+
+def _timestamps(dataset_dir):
+    return log_loader.load_logs(dataset_dir, columns=['Timestamp'], cache=False)['Timestamp']
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_plain_and_compressed_files_are_extracted_in_time_order(tmp_path, sample_lines, workers):
+    # An older plain log and a newer compressed one; compressed files are extracted whole, plain ones in ranges
+    older = tmp_path / 'access.log.1'
+    older.write_text(''.join(sample_lines[:150]), encoding='utf-8')
+    newer = tmp_path / 'access.log.gz'
+    with gzip.open(newer, 'wt', encoding='utf-8') as file:
+        file.writelines(sample_lines[150:])
+    output = str(tmp_path / 'dataset')
+
+    if workers > 1:
+        stats = data_extractor.parallel_extract([str(newer), str(older)], output, workers)
+    else:
+        stats = data_extractor.extract([str(newer), str(older)], output)
+
+    timestamps = _timestamps(output)
+    assert stats['lines'] == len(sample_lines)
+    assert len(timestamps) == stats['rows'] > 0
+    assert timestamps.is_monotonic_increasing
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_input_without_records_keeps_the_existing_dataset(tmp_path, sample_lines, workers):
+    output = str(tmp_path / 'dataset')
+    stats = data_extractor.extract(str(_write(tmp_path / 'server.log', sample_lines)), output)
+    unparseable = str(_write(tmp_path / 'garbage.log', ['not a log line\n'] * 3))
+
+    with pytest.raises(ValueError, match='No log records'):
+        if workers > 1:
+            data_extractor.parallel_extract([unparseable], output, workers)
+        else:
+            data_extractor.extract(unparseable, output)
+
+    assert len(_timestamps(output)) == stats['rows']
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('.')]
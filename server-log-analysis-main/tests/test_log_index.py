@@ -0,0 +1,27 @@
+import pytest
+
+from utils import data_extractor, log_index, log_store
+
+
+@pytest.fixture
+def dataset_dir(tmp_path, sample_lines):
+    path = tmp_path / 'server.log'
+    path.write_text(''.join(sample_lines), encoding='utf-8')
+    dataset_dir = str(tmp_path / 'dataset')
+    log_store.write_dataset(data_extractor.iter_chunks(str(path), 50), dataset_dir)
+    log_index.build_index(dataset_dir)
+    return dataset_dir
+
+
+def test_limit_returns_the_first_matching_requests(dataset_dir):
+    everything = log_index.query_logs(dataset_dir)
+    first = log_index.query_logs(dataset_dir, limit=10)
+    assert first['Timestamp'].tolist() == everything['Timestamp'].head(10).tolist()
+
+
+def test_zero_limit_returns_no_requests_without_reading(dataset_dir):
+    stats = {}
+    rows = log_index.query_logs(dataset_dir, stats=stats, limit=0)
+    assert rows.empty
+    assert 'Timestamp' in rows and rows['Timestamp'].dt.tz is not None
+    assert stats['row_groups_read'] == 0
@@ -0,0 +1,55 @@
+import os
+
+import pandas as pd
+
+from sessionization_and_behavior_analysis import SessionAnalysis
+from utils import data_extractor, log_loader, log_store, pipeline
+
+
+def _parse(tmp_path, lines, batch_size):
+    path = tmp_path / 'part.log'
+    path.write_text(''.join(lines), encoding='utf-8')
+    return list(data_extractor.iter_chunks(str(path), batch_size))
+
+
+def _scanned_timestamps(dataset_dir):
+    return pd.concat([chunk['Timestamp'] for chunk in log_loader.iter_logs(dataset_dir, ['Timestamp'], 50)],
+                     ignore_index=True)
+
+
+def _session_summary(dataset_dir):
+    return pipeline.run_pipeline(dataset_dir, [SessionAnalysis()], 50)['sessions']
+
+
+def test_appended_and_compacted_records_are_scanned_in_write_order(tmp_path, sample_lines):
+    dataset_dir = str(tmp_path / 'dataset')
+    expected_dir = str(tmp_path / 'expected')
+    log_store.write_dataset(_parse(tmp_path, sample_lines, 1000), expected_dir)
+
+    log_store.write_dataset(_parse(tmp_path, sample_lines[:100], 1000), dataset_dir)
+    appends = _parse(tmp_path, sample_lines[100:], 60)
+    for chunk in appends[:-1]:
+        log_store.append_dataset(chunk, dataset_dir)
+    assert log_store.compact_dataset(dataset_dir, min_files=2) == len(appends) - 1
+    log_store.append_dataset(appends[-1], dataset_dir)
+
+    for timestamps in [_scanned_timestamps(dataset_dir),
+                       log_loader.load_logs(dataset_dir, ['Timestamp'], cache=False)['Timestamp'],
+                       log_loader.load_logs(dataset_dir, ['Timestamp'], mmap=True)['Timestamp']]:
+        assert len(timestamps) == len(_scanned_timestamps(expected_dir))
+        assert timestamps.is_monotonic_increasing
+    assert _session_summary(dataset_dir) == _session_summary(expected_dir)
+
+
+def test_discard_appends_keeps_the_given_append_and_everything_before(tmp_path, sample_lines):
+    dataset_dir = str(tmp_path / 'dataset')
+    log_store.write_dataset(_parse(tmp_path, sample_lines[:100], 1000), dataset_dir)
+    names = []
+    for chunk in _parse(tmp_path, sample_lines[100:], 100):
+        names.append(log_store.append_file_name())
+        log_store.append_dataset(chunk, dataset_dir, names[-1])
+
+    assert log_store.discard_appends(dataset_dir, names[0]) == len(names) - 1
+    files = [name for _, _, files in os.walk(dataset_dir) for name in files if not name.startswith(('_', '.'))]
+    assert names[0] in files and not set(names[1:]) & set(files)
+    assert len(_scanned_timestamps(dataset_dir)) == 200
@@ -0,0 +1,10 @@
+import os
+
+from performance_monitoring import PerformanceAnalysis
+
+
+def test_performance_without_requests_writes_empty_reports(tmp_path):
+    analysis = PerformanceAnalysis()
+    assert analysis.finish() == {'windows': 0, 'routes': 0}
+    assert analysis.successful_counts.empty
+    assert all(os.path.exists(path) for path in analysis.write(str(tmp_path)))
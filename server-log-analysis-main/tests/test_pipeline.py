@@ -0,0 +1,25 @@
+import os
+
+import pytest
+
+import main
+from utils import pipeline
+
+# Header of a log CSV without any request
+EMPTY_CSV = 'IP Address,Timestamp,Request Method,Request Path,Status Code,Bytes,Request Time,User Agent\n'
+
+
+@pytest.fixture
+def empty_csv(tmp_path):
+    path = tmp_path / 'empty.csv'
+    path.write_text(EMPTY_CSV, encoding='utf-8')
+    return str(path)
+
+
+def test_every_analysis_finishes_and_writes_without_requests(tmp_path, empty_csv):
+    analyses = [analysis() for analysis in main.ANALYSES.values()]
+    results = pipeline.run_pipeline(empty_csv, analyses, 50)
+    assert set(results) == set(main.ANALYSES)
+
+    paths = pipeline.write_results(analyses, str(tmp_path / 'reports'))
+    assert paths and all(os.path.exists(path) for path in paths)
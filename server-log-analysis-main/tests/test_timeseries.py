@@ -0,0 +1,16 @@
+import os
+
+from TrafficAnalysis import TrafficAnalysis
+from utils import timeseries
+
+
+def test_sum_of_no_tables_is_an_empty_count_table():
+    counts = timeseries.sum_series([])
+    assert counts.empty
+    assert counts.dtypes.to_dict() == timeseries.empty_series().dtypes.to_dict()
+
+
+def test_traffic_without_requests_has_no_peak_hour(tmp_path):
+    analysis = TrafficAnalysis()
+    assert analysis.finish() == {'hours': 0, 'peak_hour': None, 'peak_requests': 0}
+    assert all(os.path.exists(path) for path in analysis.write(str(tmp_path)))
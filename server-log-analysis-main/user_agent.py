@@ -1,36 +1,57 @@
+import os
+
 import pandas as pd
 import plotly.express as px
-from ua_parser import user_agent_parser
-from utils import SetEnv
+from utils import log_loader, log_store, pipeline, ua_cache
+
+
+class UserAgentAnalysis(pipeline.Analysis):
+    """
+    Distribution of devices and browsers.
 
+    Chunks only count raw user agents; each distinct one is classified once in finish.
+    """
 
-def parse(ua_string):
-    return user_agent_parser.Parse(ua_string)
+    name = 'user_agents'
+    columns = ['User Agent']
 
+    def __init__(self, cache=None):
+        self.cache = cache
+        # Empty counts, so a run over no rows still finishes
+        self.user_agent_counts = pd.Series([], index=pd.Index([], dtype=object), dtype='int64')
+        self.device_counts = None
+        self.browser_counts = None
 
-def user_agent_analysis(file_dir):
-    # Set Working path
-    _env = SetEnv.set_path()
-    # Read the data from the CSV file
-    df = pd.read_csv(f'{_env}/{file_dir}')
+    def update(self, chunk):
+        if not chunk.empty:
+            self.user_agent_counts = pipeline.add_counts(self.user_agent_counts, chunk['User Agent'])
 
-    # Convert the Timestamp column to datetime
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'], format='%d/%b/%Y:%H:%M:%S %z')
+    def finish(self):
+        user_agents = pd.Series(self.user_agent_counts.index, dtype=object)
+        self.device_counts, self.browser_counts = ua_cache.count_families(
+            user_agents, self.cache, weights=pd.Series(self.user_agent_counts.to_numpy()))
+        return {'unique_user_agents': len(user_agents),
+                'top_device': self.device_counts['Device'].iloc[0] if len(self.device_counts) else None,
+                'top_browser': self.browser_counts['Browser'].iloc[0] if len(self.browser_counts) else None}
 
-    # Extract User Agents
-    user_agents = df['User Agent']
+    def write(self, output_dir):
+        paths = []
+        for field, counts in [('Device', self.device_counts), ('Browser', self.browser_counts)]:
+            figure_path = os.path.join(output_dir, f'user_agents_{field.lower()}s.html')
+            fig = px.bar(counts, x=field, y='Count', title=f'Distribution of {field}s')
+            fig.write_html(figure_path, include_plotlyjs='cdn')
+            counts_path = os.path.join(output_dir, f'user_agents_{field.lower()}s.csv')
+            counts.to_csv(counts_path, index=False)
+            paths.extend([figure_path, counts_path])
+        return paths
 
-    # Parse each user agent string and extract device and browser information
-    parsed_user_agents = [parse(ua) for ua in user_agents if pd.notnull(ua)]
-    devices = [ua.get('device', {}).get('family') for ua in parsed_user_agents]
-    browsers = [ua.get('user_agent', {}).get('family') for ua in parsed_user_agents]
 
-    # Count the occurrences of each device and browser
-    device_counts = pd.Series(devices).value_counts().reset_index(name='Count')
-    device_counts.columns = ['Device', 'Count']
+def user_agent_analysis(file_dir, cache=None):
+    # Read only the user agents from the log dataset
+    df = log_loader.load_logs(file_dir, columns=['User Agent'])
 
-    browser_counts = pd.Series(browsers).value_counts().reset_index(name='Count')
-    browser_counts.columns = ['Browser', 'Count']
+    # Parse each distinct user agent once and count devices and browsers
+    device_counts, browser_counts = ua_cache.count_families(df['User Agent'], cache)
 
     # Plot the distribution of devices
     fig = px.bar(device_counts, x='Device', y='Count', title='Distribution of Devices')
@@ -42,7 +63,11 @@ def user_agent_analysis(file_dir):
 
 
 def main():
-    user_agent_analysis('data/csv/server_logs.csv')
+    # Keep parsed user agents across runs
+    cache = ua_cache.UserAgentCache(cache_file=log_loader.resolve_path(ua_cache.DEFAULT_CACHE_FILE))
+    user_agent_analysis(log_store.DEFAULT_DATASET, cache)
+    cache.save()
+    print(f"User agent cache: {cache.stats()}")
 
 
 if __name__ == "__main__":
@@ -1,33 +1,149 @@
+import os
+
 import pandas as pd
-from utils import SetEnv
 
+from utils import log_loader, log_store, pipeline, sketches
+
+
+class Summary(pipeline.Analysis):
+    """
+    Request totals, status codes, bytes sent and the average response time.
+
+    Bytes and response times are only reported for log formats that carry them.
+    """
+
+    name = 'summary'
+    columns = ['IP Address', 'Status Code']
+    optional_columns = ['Bytes', 'Request Time']
+
+    def __init__(self):
+        self.total_requests = 0
+        # Empty counts, so a run over no rows still finishes
+        self.ip_counts = pd.Series([], index=pd.Index([], dtype=object), dtype='int64')
+        self.status_code_counts = pd.Series([], index=pd.Index([], dtype='int16'), dtype='int64')
+        self.total_bytes = None
+        self.response_time_total = 0.0
+        self.response_time_count = 0
+        self.result = None
+
+    def update(self, chunk):
+        if chunk.empty:
+            return
+        self.total_requests += len(chunk)
+        self.ip_counts = pipeline.add_counts(self.ip_counts, chunk['IP Address'])
+        self.status_code_counts = pipeline.add_counts(self.status_code_counts, chunk['Status Code'])
+        if 'Bytes' in chunk:
+            self.total_bytes = (self.total_bytes or 0) + int(chunk['Bytes'].sum())
+        if 'Request Time' in chunk:
+            response_times = chunk['Request Time'].dropna()
+            self.response_time_total += float(response_times.astype('float64').sum())
+            self.response_time_count += len(response_times)
+
+    def finish(self):
+        status_code_counts = self.status_code_counts.sort_index().sort_values(ascending=False, kind='mergesort')
+        if self.response_time_count:
+            average_response_time = self.response_time_total / self.response_time_count
+        else:
+            average_response_time = None
+        self.result = {
+            'total_requests': self.total_requests,
+            'unique_ips': len(self.ip_counts),
+            'status_code_counts': status_code_counts,
+            'most_common_status_code': status_code_counts.index[0] if len(status_code_counts) else None,
+            'total_bytes': self.total_bytes,
+            'average_response_time': average_response_time,
+        }
+        return self.result
+
+    def write(self, output_dir):
+        path = os.path.join(output_dir, 'summary.txt')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(format_summary(self.result) + '\n')
+        return [path]
 
-def summary(file_dir):
-    # Set Working path
-    _env = SetEnv.set_path()
-    # Read the data from the CSV file
-    df = pd.read_csv(f'{_env}/{file_dir}')
 
-    # Convert the Timestamp column to datetime
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'], format='%d/%b/%Y:%H:%M:%S %z')
+class SketchSummary(pipeline.Analysis):
+    """
+    Approximate summary in bounded memory, built from mergeable sketches.
 
-    # Calculate response time based on timestamp
-    df['Response Time'] = df['Timestamp'].diff().dt.total_seconds()
+    Distinct IPs and paths come from HyperLogLog, top talkers from
+    Space-Saving, and quantiles of the time between requests, bytes sent and
+    response time from t-digests, so memory
+    stays constant however many distinct keys the logs contain. The sketch
+    is written to disk and can be merged with sketches of other runs.
+    """
+
+    name = 'sketch_summary'
+    columns = sketches.SKETCH_COLUMNS
+    optional_columns = sketches.SKETCH_OPTIONAL_COLUMNS
+
+    def __init__(self, top=10):
+        self.top = top
+        self.sketch = sketches.LogSketch()
+        self.result = None
+
+    def update(self, chunk):
+        self.sketch.update(chunk)
+
+    def finish(self):
+        sketch = self.sketch
+        self.result = {
+            'total_requests': sketch.requests,
+            'unique_ips': sketch.unique_ips.count(),
+            'unique_paths': sketch.unique_paths.count(),
+            'top_ips': sketch.top_ips.top(self.top),
+            'top_paths': sketch.top_paths.top(self.top),
+        }
+        for prefix, digest in [('request_gap', sketch.request_gaps), ('bytes', sketch.bytes_sent),
+                               ('response_time', sketch.response_times)]:
+            if digest.count:
+                for q, value in zip(['p50', 'p95', 'p99'], digest.quantile([0.5, 0.95, 0.99])):
+                    self.result[f'{prefix}_{q}'] = value
+        return self.result
+
+    def write(self, output_dir):
+        sketch_path = os.path.join(output_dir, 'sketch_summary.pkl')
+        sketches.save(self.sketch, sketch_path)
+        paths = [sketch_path]
+        for key in ['top_ips', 'top_paths']:
+            path = os.path.join(output_dir, f'sketch_summary_{key}.csv')
+            self.result[key].to_csv(path, index=False)
+            paths.append(path)
+        return paths
+
+
+def format_summary(result):
+    """
+    Format the result of a Summary analysis as the printed report.
+    """
+    lines = [
+        f"Total Requests: {result['total_requests']}",
+        f"Unique IP Addresses: {result['unique_ips']}",
+        "Status Code Counts:",
+        result['status_code_counts'].to_string(),
+        f"Most Common Status Code: {result['most_common_status_code']}",
+    ]
+    if result['total_bytes'] is not None:
+        lines.append(f"Total Bytes Sent: {result['total_bytes']}")
+    if result['average_response_time'] is None:
+        lines.append("Average Response Time: not logged (use the nginx log format with $request_time)")
+    else:
+        lines.append(f"Average Response Time: {result['average_response_time']:.3f}s")
+    return '\n'.join(lines)
+
+
+def summary(file_dir):
+    # Read only the columns needed for the summary
+    columns = pipeline.analysis_columns(Summary, log_loader.available_columns(file_dir))
+    df = log_loader.load_logs(file_dir, columns=columns)
 
     # Summary statistics
-    total_requests = len(df)
-    unique_ips = df['IP Address'].nunique()
-    status_code_counts = df['Status Code'].value_counts()
-    most_common_status_code = status_code_counts.idxmax()
-    average_response_time = df['Response Time'].mean()
+    analysis = Summary()
+    analysis.update(df)
 
     # Print summary statistics
-    print(f"Total Requests: {total_requests}")
-    print(f"Unique IP Addresses: {unique_ips}")
-    print("Status Code Counts:")
-    print(status_code_counts)
-    print(f"Most Common Status Code: {most_common_status_code}")
-    print(f"Average Response Time: {average_response_time}")
+    print(format_summary(analysis.finish()))
 
 
-summary('data/csv/server_logs.csv')
\ No newline at end of file
+if __name__ == '__main__':
+    summary(log_store.DEFAULT_DATASET)
@@ -0,0 +1,280 @@
+import numpy as np
+import pandas as pd
+
+# Weight of the newest minute in the moving averages; about a 30 minute memory
+DEFAULT_ALPHA = 2 / 31
+
+# Standard deviations above the expected rate at which a minute is reported
+DEFAULT_THRESHOLD = 4.0
+
+# Minutes a rate is followed before its spikes are reported
+WARMUP_MINUTES = 10
+
+# Most IP addresses whose rates are followed; the least active ones are evicted first
+DEFAULT_IP_CAPACITY = 50_000
+
+# Status keys whose spikes are reported; 2xx and 3xx rates follow the overall traffic
+ALERT_STATUS_KEYS = ['4xx', '5xx', '404']
+
+# Fewest requests in a minute for a spike to be reported, per signal
+MIN_COUNTS = {'requests': 100, 'status': 20, 'ip': 120}
+
+# Columns of the reported alerts
+ALERT_COLUMNS = ['Minute', 'Signal', 'Key', 'Count', 'Expected', 'Z-Score']
+
+NANOSECONDS_PER_MINUTE = 60 * 10**9
+
+# Key of every status class, indexed by the first digit of the status code
+STATUS_CLASSES = np.array([f'{digit}xx' for digit in range(10)], dtype=object)
+
+
+def alert_label(signal, key):
+    """
+    Human readable name of an alert.
+    """
+    if signal == 'requests':
+        return 'Traffic spike'
+    if signal == 'ip':
+        return 'IP flood'
+    if key == '404':
+        return '404 burst'
+    return f'{key} spike'
+
+
+def _count_per_minute(minutes, keys):
+    """
+    Requests per minute and key, indexed by (minute, key).
+    """
+    frame = pd.DataFrame({'Minute': minutes, 'Key': keys})
+    return frame.groupby(['Minute', 'Key'], sort=False).size()
+
+
+class RateTracker:
+    """
+    Exponentially weighted mean and variance of per-minute counts, per key.
+
+    Each key holds a fixed amount of state: its mean, variance, number of
+    observations and the last minute it was seen. Until a key has 1 / alpha
+    observations they are weighted equally, so the first minutes do not
+    pull the averages towards zero. Minutes without requests are applied lazily, in
+    closed form, the next time the key is seen, so only the keys of the
+    current minute are touched. With a capacity, the keys with the lowest
+    decayed rate are evicted once there are more.
+    """
+
+    def __init__(self, alpha=DEFAULT_ALPHA, capacity=None):
+        self.alpha = alpha
+        self.capacity = capacity
+        # Position of every key in the state arrays
+        self.slots = {}
+        self.mean = np.empty(0)
+        self.var = np.empty(0)
+        self.last = np.empty(0, dtype=np.int64)
+        self.seen = np.empty(0, dtype=np.int64)
+        self.minutes = 0
+
+    def __len__(self):
+        return len(self.slots)
+
+    def _decayed(self, positions, minute):
+        # Mean and variance after the minutes without requests between the last observation and minute
+        gap = np.maximum(minute - self.last[positions] - 1, 0)
+        decay = (1 - self.alpha) ** gap
+        mean = self.mean[positions]
+        return mean * decay, decay * (self.var[positions] + mean ** 2 * (1 - decay))
+
+    def _positions(self, keys, minute):
+        slots = self.slots
+        size = len(slots)
+        positions = np.fromiter((slots.setdefault(key, len(slots)) for key in keys), dtype=np.int64, count=len(keys))
+        added = len(slots) - size
+        if added:
+            self.mean = np.concatenate([self.mean, np.zeros(added)])
+            self.var = np.concatenate([self.var, np.zeros(added)])
+            self.last = np.concatenate([self.last, np.full(added, minute - 1, dtype=np.int64)])
+            self.seen = np.concatenate([self.seen, np.zeros(added, dtype=np.int64)])
+        return positions
+
+    def observe(self, minute, keys, counts):
+        """
+        Score the counts of a closed minute, then fold them into the averages.
+
+        Args:
+            minute (int): Minutes since the epoch; later than any minute observed before.
+            keys (np.ndarray): Distinct keys with requests in that minute.
+            counts (np.ndarray): Requests per key.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Expected count and z-score of every key.
+        """
+        positions = self._positions(keys, minute)
+        count = counts.astype(np.float64)
+        mean, var = self._decayed(positions, minute)
+        # Counts are at least as noisy as a Poisson process of the same mean
+        z_score = (count - mean) / np.sqrt(np.maximum(np.maximum(var, mean), 1))
+
+        alpha = np.maximum(self.alpha, 1 / (self.seen[positions] + 1))
+        difference = count - mean
+        increment = alpha * difference
+        self.mean[positions] = mean + increment
+        self.var[positions] = (1 - alpha) * (var + difference * increment)
+        self.last[positions] = minute
+        self.seen[positions] += 1
+        self.minutes += 1
+
+        if self.capacity and len(self.slots) > self.capacity:
+            self._evict(minute)
+        return mean, z_score
+
+    def _evict(self, minute):
+        # Keep the most active keys and make room for a tenth more, so eviction runs only now and then
+        kept_size = self.capacity - self.capacity // 10
+        mean, _ = self._decayed(np.arange(len(self.slots)), minute + 1)
+        kept = np.sort(np.argpartition(-mean, kept_size - 1)[:kept_size])
+        keys = list(self.slots)
+        self.slots = {keys[position]: slot for slot, position in enumerate(kept)}
+        self.mean, self.var, self.last, self.seen = self.mean[kept], self.var[kept], self.last[kept], self.seen[kept]
+
+
+class StreamingAnomalyDetector:
+    """
+    Online detection of spikes in the request rate, the status mix and the
+    requests of single IP addresses.
+
+    Requests are counted per minute: overall, per status class (plus 404)
+    and per IP address. A minute is scored once a later minute shows up in
+    the stream, against the moving average and variance of the minutes
+    before it. Memory is bounded by the number of tracked keys, not by the
+    length of the stream. Requests older than the last scored minute are
+    counted in the oldest open one.
+    """
+
+    def __init__(self, alpha=DEFAULT_ALPHA, threshold=DEFAULT_THRESHOLD, ip_capacity=DEFAULT_IP_CAPACITY,
+                 warmup=WARMUP_MINUTES):
+        """
+        Args:
+            alpha (float): Weight of the newest minute in the moving averages.
+            threshold (float): Z-score from which a minute is reported.
+            ip_capacity (int): Most IP addresses followed at once.
+            warmup (int): Minutes of a signal scored before its spikes are reported.
+        """
+        self.threshold = threshold
+        self.warmup = warmup
+        self.trackers = {
+            'requests': RateTracker(alpha),
+            'status': RateTracker(alpha),
+            'ip': RateTracker(alpha, ip_capacity),
+        }
+        # Counts of the minutes not scored yet, per signal, indexed by (minute, key)
+        self.pending = {signal: None for signal in self.trackers}
+        # Last scored minute
+        self.watermark = None
+        self.tz = None
+
+    def _counts(self, chunk):
+        timestamps = chunk['Timestamp']
+        if self.tz is None:
+            self.tz = timestamps.dt.tz
+        # Minutes since the epoch in UTC
+        minutes = pd.DatetimeIndex(timestamps).asi8 // NANOSECONDS_PER_MINUTE
+        if self.watermark is not None:
+            minutes = np.maximum(minutes, self.watermark + 1)
+
+        status = chunk['Status Code'].to_numpy()
+        not_found = status == 404
+        ip = chunk['IP Address']
+        if isinstance(ip.dtype, pd.CategoricalDtype):
+            ip = ip.astype(ip.cat.categories.dtype)
+        return {
+            'requests': _count_per_minute(minutes, 'all'),
+            'status': pd.concat([
+                _count_per_minute(minutes, STATUS_CLASSES[(status // 100) % 10]),
+                _count_per_minute(minutes[not_found], '404'),
+            ]),
+            'ip': _count_per_minute(minutes, ip.to_numpy()),
+        }
+
+    def update(self, chunk):
+        """
+        Count a chunk of log records and score the minutes it closes.
+
+        Args:
+            chunk (pd.DataFrame): Records with tz-aware 'Timestamp', 'IP Address' and 'Status Code' columns.
+
+        Returns:
+            pd.DataFrame: Alerts of the scored minutes, with ALERT_COLUMNS.
+        """
+        if chunk.empty:
+            return self._alerts([])
+        counts = self._counts(chunk)
+        for signal, pending in self.pending.items():
+            # Minutes shared with the pending counts are summed when they close
+            self.pending[signal] = counts[signal] if pending is None else pd.concat([pending, counts[signal]])
+        newest = counts['requests'].index.get_level_values('Minute').max()
+        return self._close(newest)
+
+    def flush(self):
+        """
+        Score the minutes still open, e.g. at the end of a batch.
+
+        Returns:
+            pd.DataFrame: Alerts of those minutes.
+        """
+        pending = self.pending['requests']
+        if pending is None or not len(pending):
+            return self._alerts([])
+        return self._close(pending.index.get_level_values('Minute').max() + 1)
+
+    def _close(self, before):
+        """
+        Score the pending minutes earlier than before, oldest first.
+        """
+        closing = {}
+        for signal, pending in self.pending.items():
+            minutes = pending.index.get_level_values('Minute')
+            counts = pending[minutes < before]
+            self.pending[signal] = pending[minutes >= before]
+            counts = counts.groupby(level=['Minute', 'Key']).sum()
+            # Position of every minute's first and last key
+            minutes = counts.index.get_level_values('Minute').to_numpy()
+            bounds = np.flatnonzero(np.diff(minutes)) + 1
+            starts = np.concatenate([[0], bounds]) if len(minutes) else bounds
+            ends = np.concatenate([bounds, [len(minutes)]])
+            keys = counts.index.get_level_values('Key').to_numpy()
+            closing[signal] = {minutes[start]: (keys[start:end], counts.to_numpy()[start:end])
+                               for start, end in zip(starts, ends)}
+
+        alerts = []
+        # Every request counts towards the overall rate, so its minutes are all the closing minutes
+        for minute in closing['requests']:
+            for signal, by_minute in closing.items():
+                if minute not in by_minute:
+                    continue
+                keys, counts = by_minute[minute]
+                tracker = self.trackers[signal]
+                expected, z_score = tracker.observe(minute, keys, counts)
+                if tracker.minutes <= self.warmup:
+                    continue
+                flagged = (z_score >= self.threshold) & (counts >= MIN_COUNTS[signal])
+                if signal == 'status':
+                    flagged &= np.isin(keys, ALERT_STATUS_KEYS)
+                if flagged.any():
+                    alerts.append(pd.DataFrame({
+                        'Minute': minute,
+                        'Signal': [alert_label(signal, key) for key in keys[flagged]],
+                        'Key': keys[flagged],
+                        'Count': counts[flagged],
+                        'Expected': expected[flagged],
+                        'Z-Score': z_score[flagged],
+                    }))
+            self.watermark = minute
+        return self._alerts(alerts)
+
+    def _alerts(self, frames):
+        if not frames:
+            return pd.DataFrame(columns=ALERT_COLUMNS)
+        alerts = pd.concat(frames, ignore_index=True)
+        alerts['Minute'] = pd.to_datetime(alerts['Minute'] * NANOSECONDS_PER_MINUTE, utc=True)
+        if self.tz is not None:
+            alerts['Minute'] = alerts['Minute'].dt.tz_convert(self.tz)
+        return alerts[ALERT_COLUMNS].sort_values(['Minute', 'Z-Score'], ascending=[True, False], ignore_index=True)
@@ -1,91 +1,652 @@
-import pandas as pd
-import re
-import os
-import SetEnv
+import argparse
+import glob
+import io
 import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 
-# Set up logging
-logging.basicConfig(filename='error.log', level=logging.ERROR)
+import pandas as pd
 
-# Set the current directory
 try:
-    parent_dir = SetEnv.set_path()
-except Exception as e:
-    logging.error(f"Error setting parent directory: {e}")
-    exit(1)
+    from utils import SetEnv, log_store, metrics
+except ImportError:  # Executed directly as ``python utils/data_extractor.py``
+    import SetEnv
+    import log_store
+    import metrics
 
-# Specify the path to the log file relative to the parent directory
-log_file_path = os.path.join(parent_dir, 'data/raw/server_logs.txt')
+# Output column of every named group a log pattern may define
+FIELD_COLUMNS = {
+    'ip': 'IP Address',
+    'timestamp': 'Timestamp',
+    'method': 'Request Method',
+    'path': 'Request Path',
+    'status': 'Status Code',
+    'bytes': 'Bytes',
+    'referrer': 'Referrer',
+    'user_agent': 'User Agent',
+    'request_time': 'Request Time',
+    'upstream_time': 'Upstream Time',
+}
+
+# Anchored, precompiled patterns of the supported log formats. Every field is
+# matched with a negated character class so the engine never backtracks
+# across field boundaries.
+COMBINED_PATTERN = (
+    r'(?P<ip>\S+) \S+ \S+ \[(?P<timestamp>[^\]]+)\] '
+    r'"(?P<method>[A-Z]+) (?P<path>\S+)(?: [^"]*)?" '
+    r'(?P<status>\d{3}) (?P<bytes>\d+|-) "(?P<referrer>[^"]*)" "(?P<user_agent>[^"]*)"'
+)
+LOG_PATTERNS = {
+    # Apache/nginx combined format
+    'combined': COMBINED_PATTERN,
+    # nginx combined format followed by an optional "$http_x_forwarded_for",
+    # $request_time and $upstream_response_time (first upstream only)
+    'nginx': COMBINED_PATTERN + r'(?: "[^"]*")? (?P<request_time>[\d.]+|-) (?P<upstream_time>[\d.]+|-)',
+}
+
+# Log format used when none is given
+DEFAULT_LOG_FORMAT = 'combined'
+
+
+def compile_log_format(pattern):
+    """
+    Compile a log pattern and derive its output columns.
+
+    Args:
+        pattern (str): Regular expression whose named groups are keys of FIELD_COLUMNS.
+
+    Returns:
+        tuple[re.Pattern, list[str]]: The compiled pattern and its columns, in group order.
+    """
+    compiled = re.compile(pattern)
+    unknown = set(compiled.groupindex) - set(FIELD_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown log fields: {', '.join(sorted(unknown))}")
+    if compiled.groups != len(compiled.groupindex):
+        raise ValueError("Log patterns may only use named groups; use (?:...) for other groups")
+    groups = sorted(compiled.groupindex, key=compiled.groupindex.get)
+    return compiled, [FIELD_COLUMNS[group] for group in groups]
+
+
+@lru_cache(maxsize=None)
+def resolve_log_format(log_format):
+    """
+    Look up a log format by name, or compile a custom pattern.
+
+    Args:
+        log_format (str): A key of LOG_PATTERNS, or a regular expression with named groups.
+
+    Returns:
+        tuple[re.Pattern, list[str]]: The compiled pattern and its columns.
+    """
+    return compile_log_format(LOG_PATTERNS.get(log_format, log_format))
+
+
+# Pattern and columns of the default format
+LOG_PATTERN, COLUMNS = resolve_log_format(DEFAULT_LOG_FORMAT)
+
+# Number of log lines handed to pandas at once; bounds peak memory
+DEFAULT_BATCH_SIZE = 100_000
+
+# Number of byte ranges scheduled per worker, so faster workers can pick up more
+RANGES_PER_WORKER = 4
+
+# Largest byte range parsed by one task; bounds the records a worker hands back at once
+MAX_RANGE_BYTES = 64 * 1024 * 1024
+
+# Lines read from the start of a file to find its first timestamp
+FIRST_TIMESTAMP_LINES = 1000
+
+# Supported output formats; Parquet is the canonical input of the analyses
+OUTPUT_FORMATS = ['parquet', 'csv']
+
+# Extensions of compressed log files, mapped to the pyarrow codec that streams them
+COMPRESSED_EXTENSIONS = {'.gz': 'gzip', '.bz2': 'bz2', '.zst': 'zstd'}
+
+
+def is_compressed(log_file_path):
+    """
+    Tell whether a raw log file is compressed, judging by its extension.
+
+    Args:
+        log_file_path (str): Path to a raw log file.
+
+    Returns:
+        bool: True for the extensions in COMPRESSED_EXTENSIONS.
+    """
+    return os.path.splitext(log_file_path)[1] in COMPRESSED_EXTENSIONS
+
+
+def open_log(log_file_path):
+    """
+    Open a raw log file for reading in binary mode.
+
+    Compressed files are decompressed while they are read, a block at a time,
+    so they are never written or held decompressed in full.
+
+    Args:
+        log_file_path (str): Path to a plain or compressed (see COMPRESSED_EXTENSIONS) log file.
+
+    Returns:
+        A binary file object; only plain files support seek.
+    """
+    extension = os.path.splitext(log_file_path)[1]
+    if extension not in COMPRESSED_EXTENSIONS:
+        return open(log_file_path, 'rb')
+    import pyarrow as pa
+
+    return pa.input_stream(log_file_path, compression=COMPRESSED_EXTENSIONS[extension])
+
+
+def parse_line(line, log_format=DEFAULT_LOG_FORMAT):
+    """
+    Parse a single log line.
+
+    Args:
+        line (str): A raw access log line.
+        log_format (str): Name of a log format, or a custom pattern.
+
+    Returns:
+        tuple | None: The fields in column order of the format, or None if the line does not match.
+    """
+    pattern, _ = resolve_log_format(log_format)
+    match = pattern.match(line)
+    if match:
+        return match.groups()
+    return None
+
+
+def iter_batches(log_file_path, batch_size=DEFAULT_BATCH_SIZE, stats=None, log_format=DEFAULT_LOG_FORMAT):
+    """
+    Lazily parse a log file into fixed-size batches of records.
+
+    The file is read line by line, so memory use is bounded by batch_size
+    regardless of the size of the log file.
+
+    Args:
+        log_file_path (str): Path to the raw log file, optionally compressed.
+        batch_size (int): Maximum number of parsed records per batch.
+        stats (dict, optional): Updated in place with 'lines' and 'rows' counters.
+        log_format (str): Name of a log format, or a custom pattern.
+
+    Yields:
+        list[tuple]: Parsed records in column order of the format.
+    """
+    if stats is None:
+        stats = {}
+    stats.setdefault('lines', 0)
+    stats.setdefault('rows', 0)
+
+    match = resolve_log_format(log_format)[0].match
+    batch = []
+    began = time.perf_counter()
+    with io.TextIOWrapper(open_log(log_file_path), encoding='utf-8', errors='replace') as file:
+        for line in file:
+            stats['lines'] += 1
+            parsed = match(line)
+            if parsed is None:
+                continue
+            batch.append(parsed.groups())
+            if len(batch) >= batch_size:
+                stats['rows'] += len(batch)
+                metrics.observe('parse_lines', time.perf_counter() - began)
+                metrics.count('rows_parsed', len(batch))
+                yield batch
+                batch = []
+                began = time.perf_counter()
+    if batch:
+        stats['rows'] += len(batch)
+        metrics.observe('parse_lines', time.perf_counter() - began)
+        metrics.count('rows_parsed', len(batch))
+        yield batch
+
+
+def iter_chunks(log_file_path, batch_size=DEFAULT_BATCH_SIZE, stats=None, log_format=DEFAULT_LOG_FORMAT):
+    """
+    Lazily parse a log file into DataFrame chunks.
+
+    Args:
+        log_file_path (str): Path to the raw log file.
+        batch_size (int): Maximum number of rows per chunk.
+        stats (dict, optional): Updated in place with 'lines' and 'rows' counters.
+        log_format (str): Name of a log format, or a custom pattern.
+
+    Yields:
+        pd.DataFrame: A chunk of parsed log records with the columns of the format.
+    """
+    _, columns = resolve_log_format(log_format)
+    for batch in iter_batches(log_file_path, batch_size, stats, log_format):
+        yield pd.DataFrame.from_records(batch, columns=columns)
+
+
+def write_chunks(chunks, output, output_format='parquet', columns=COLUMNS):
+    """
+    Write parsed log chunks to the output store.
+
+    Args:
+        chunks (Iterable[pd.DataFrame]): Parsed log records.
+        output (str): CSV file or Parquet dataset directory to write.
+        output_format (str): One of OUTPUT_FORMATS.
+        columns (list[str]): Columns of the chunks, written as the CSV header.
+
+    Returns:
+        int: Number of rows written.
+    """
+    if output_format == 'parquet':
+        return log_store.write_dataset(chunks, output)
+
+    return _write_csv(chunks, output, columns)
+
+
+def _write_csv(chunks, output, columns):
+    """
+    Write a CSV file from chunks, each a DataFrame or the path of a headerless CSV
+    part written by extract_part, which is copied and removed.
+    """
+    rows = 0
+    with open(output, 'w', encoding='utf-8', newline='') as out:
+        # Always emit the header, even if no line matched
+        out.write(','.join(columns) + '\n')
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                with open(chunk, 'r', encoding='utf-8', newline='') as part:
+                    shutil.copyfileobj(part, out)
+                os.remove(chunk)
+                continue
+            chunk.to_csv(out, index=False, header=False)
+            rows += len(chunk)
+    return rows
+
+
+def extract(log_file_path, output, batch_size=DEFAULT_BATCH_SIZE, output_format='parquet',
+            log_format=DEFAULT_LOG_FORMAT):
+    """
+    Stream raw log files into the output store at constant memory.
+
+    Args:
+        log_file_path (str | list[str]): Path to the raw log file, or several files,
+            extracted in the order of their first timestamps (see order_by_time).
+        output (str): CSV file or Parquet dataset directory to write.
+        batch_size (int): Number of rows parsed and written per chunk.
+        output_format (str): One of OUTPUT_FORMATS.
+        log_format (str): Name of a log format, or a custom pattern.
+
+    Returns:
+        dict: Counters for the run ('lines', 'rows', 'bytes', 'seconds', 'lines_per_second'),
+        and 'files' with the counters of every file.
+
+    Raises:
+        ValueError: If no line is parsed into a Parquet output; an existing dataset is kept.
+    """
+    paths = [log_file_path] if isinstance(log_file_path, str) else order_by_time(log_file_path, log_format)
+    stats = {'lines': 0, 'rows': 0, 'files': {}}
+    start = time.perf_counter()
+    _, columns = resolve_log_format(log_format)
+
+    def chunks():
+        for path in paths:
+            file_stats = {}
+            began = time.perf_counter()
+            yield from iter_chunks(path, batch_size, file_stats, log_format)
+            stats['files'][path] = {'lines': file_stats['lines'], 'bytes': os.path.getsize(path),
+                                    'seconds': time.perf_counter() - began}
+            stats['lines'] += file_stats['lines']
+            stats['rows'] += file_stats['rows']
+
+    write_chunks(chunks(), output, output_format, columns)
+    stats['seconds'] = time.perf_counter() - start
+    stats['lines_per_second'] = stats['lines'] / stats['seconds'] if stats['seconds'] else 0.0
+    stats['bytes'] = sum(file_stats['bytes'] for file_stats in stats['files'].values())
+    _record_extract(stats)
+    return stats
+
+
+def _record_extract(stats):
+    metrics.observe('extract', stats['seconds'])
+    metrics.count('lines_read', stats['lines'])
+    metrics.count('bytes_read', stats['bytes'])
+
+
+def list_log_files(input_path):
+    """
+    Resolve the raw log files to extract.
+
+    Args:
+        input_path (str): A log file, a directory of (rotated) log files, or a glob
+            pattern such as 'logs/access.log*'.
+
+    Returns:
+        list[str]: Paths of the log files, sorted by name.
+    """
+    if os.path.isdir(input_path):
+        return sorted(
+            os.path.join(input_path, name) for name in os.listdir(input_path)
+            if os.path.isfile(os.path.join(input_path, name))
+        )
+    if glob.has_magic(input_path):
+        return sorted(path for path in glob.glob(input_path, recursive=True) if os.path.isfile(path))
+    return [input_path]
+
+
+def first_timestamp(log_file_path, log_format=DEFAULT_LOG_FORMAT):
+    """
+    Time of the first parsable line of a log file.
+
+    Args:
+        log_file_path (str): Path to a plain or compressed log file.
+        log_format (str): Name of a log format, or a custom pattern.
+
+    Returns:
+        pd.Timestamp | None: The timestamp in UTC, or None if none of the first
+        FIRST_TIMESTAMP_LINES lines parse.
+    """
+    pattern, columns = resolve_log_format(log_format)
+    if 'Timestamp' not in columns:
+        return None
+    position = columns.index('Timestamp')
+    with io.TextIOWrapper(open_log(log_file_path), encoding='utf-8', errors='replace') as file:
+        for _, line in zip(range(FIRST_TIMESTAMP_LINES), file):
+            parsed = pattern.match(line)
+            if parsed is not None:
+                return pd.Timestamp(log_store.parse_timestamps([parsed.groups()[position]]).iloc[0]).tz_convert('UTC')
+    return None
+
+
+def order_by_time(log_file_paths, log_format=DEFAULT_LOG_FORMAT):
+    """
+    Order log files by their first timestamps.
+
+    Rotated logs are named newest first (access.log, access.log.1, ...), so
+    sorting by name would extract them backwards. Files without a parsable
+    line come last, in their given order.
+
+    Args:
+        log_file_paths (list[str]): Raw log files.
+        log_format (str): Name of a log format, or a custom pattern.
+
+    Returns:
+        list[str]: The files, oldest first.
+    """
+    firsts = {path: first_timestamp(path, log_format) for path in log_file_paths}
+    return sorted(log_file_paths, key=lambda path: (firsts[path] is None, firsts[path] or pd.Timestamp(0, tz='UTC')))
+
+
+def split_byte_ranges(log_file_path, parts):
+    """
+    Split a file into line-aligned byte ranges.
+
+    Args:
+        log_file_path (str): Path to the raw log file.
+        parts (int): Desired number of ranges.
+
+    Returns:
+        list[tuple[int, int]]: (start, end) offsets; every range starts at the
+        beginning of a line and ends just after a newline (or at EOF).
+    """
+    size = os.path.getsize(log_file_path)
+    if size == 0:
+        return []
+    parts = max(1, min(parts, size))
+    boundaries = [0]
+    with open(log_file_path, 'rb') as file:
+        for i in range(1, parts):
+            offset = size * i // parts
+            if offset <= boundaries[-1]:
+                continue
+            # Move the boundary to the start of the next line
+            file.seek(offset - 1)
+            file.readline()
+            offset = file.tell()
+            if offset >= size:
+                break
+            if offset > boundaries[-1]:
+                boundaries.append(offset)
+    boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def parse_byte_range(task):
+    """
+    Parse one byte range of a log file. Runs inside a worker process.
+
+    Args:
+        task (tuple[str, int, int, str]): (log_file_path, start, end) as produced by
+            split_byte_ranges, and the log format.
+
+    Returns:
+        tuple[pd.DataFrame, int, float]: The parsed records, the number of lines read
+        and the seconds spent.
+    """
+    log_file_path, start, end, log_format = task
+    began = time.perf_counter()
+    pattern, columns = resolve_log_format(log_format)
+    match = pattern.match
+    records = []
+    lines = 0
+    with open(log_file_path, 'rb') as file:
+        file.seek(start)
+        position = start
+        while position < end:
+            line = file.readline()
+            if not line:
+                break
+            position += len(line)
+            lines += 1
+            parsed = match(line.decode('utf-8', errors='replace'))
+            if parsed is not None:
+                records.append(parsed.groups())
+    return pd.DataFrame.from_records(records, columns=columns), lines, time.perf_counter() - began
+
+
+def extract_part(task):
+    """
+    Stream a whole log file into its own part of the output. Runs inside a worker process.
+
+    Compressed streams cannot seek, so they are not split into ranges; they
+    are decompressed and parsed front to back in batches of
+    DEFAULT_BATCH_SIZE records, each written as soon as it is parsed, so
+    neither the file nor its records are held in memory.
+
+    Args:
+        task (tuple[str, str, str, str, int]): (log_file_path, part, output_format, log_format, sequence),
+            where part is a Parquet dataset directory to add files to, named after sequence (the
+            position of the job, see log_store.data_file_name), or a CSV file to write without a header.
+
+    Returns:
+        tuple[None, int, int, float]: No records (they are in the part), the number of lines read,
+        the number of records written and the seconds spent.
+    """
+    log_file_path, part, output_format, log_format, sequence = task
+    began = time.perf_counter()
+    stats = {}
+    chunks = iter_chunks(log_file_path, DEFAULT_BATCH_SIZE, stats, log_format)
+    if output_format == 'parquet':
+        log_store.write_parts(chunks, part, sequence)
+    else:
+        with open(part, 'w', encoding='utf-8', newline='') as out:
+            for chunk in chunks:
+                chunk.to_csv(out, index=False, header=False)
+    return None, stats.get('lines', 0), stats.get('rows', 0), time.perf_counter() - began
+
+
+def _ordered_results(executor, jobs, window):
+    """
+    Run (function, task) jobs in a pool and yield their results in order, with at most window jobs in flight.
+    """
+    pending = deque()
+    for function, task in jobs:
+        pending.append(executor.submit(function, task))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def parallel_extract(log_file_paths, output, workers, output_format='parquet', log_format=DEFAULT_LOG_FORMAT):
+    """
+    Parse log files in a process pool and write the result to the output store.
+
+    Files are taken in the order of their first timestamps (see
+    order_by_time). Plain files are split into line-aligned byte ranges of
+    at most MAX_RANGE_BYTES, parsed concurrently and written in file and
+    range order as they come back, with a bounded number in flight.
+    Compressed files cannot be split; each is streamed by one worker straight
+    into its own part of the output (see extract_part). The records keep the
+    order of the log files and memory does not grow with the size of the
+    input.
+
+    Args:
+        log_file_paths (list[str]): Raw log files to extract.
+        output (str): CSV file or Parquet dataset directory to write.
+        workers (int): Number of worker processes.
+        output_format (str): One of OUTPUT_FORMATS.
+        log_format (str): Name of a log format, or a custom pattern.
+
+    Returns:
+        dict: Counters for the run ('lines', 'rows', 'bytes', 'seconds', 'lines_per_second'),
+        and 'files' with the 'lines', 'bytes' and worker 'seconds' of every file.
+
+    Raises:
+        ValueError: If no line is parsed into a Parquet output; an existing dataset is kept.
+    """
+    start = time.perf_counter()
+    _, columns = resolve_log_format(log_format)
+    log_file_paths = order_by_time(log_file_paths, log_format)
+    sizes = {path: os.path.getsize(path) for path in log_file_paths}
+    total_bytes = sum(sizes.values())
+
+    # Parquet parts are written straight into the staging directory of the dataset; CSV parts
+    # into a directory next to the output, then copied into it in order
+    if output_format == 'parquet':
+        target = log_store.staging_dir(output)
+    else:
+        target = tempfile.mkdtemp(prefix='.extract-', dir=os.path.dirname(os.path.abspath(output)))
+    # Every job writes files named after its position, so the dataset reads them in input order
+    jobs = []
+    for path in log_file_paths:
+        if is_compressed(path):
+            part = target if output_format == 'parquet' else os.path.join(target, f'file-{len(jobs):05d}.csv')
+            jobs.append((extract_part, (path, part, output_format, log_format, len(jobs))))
+            continue
+        # Spread the ranges proportionally to file size
+        share = sizes[path] / total_bytes if total_bytes else 0
+        parts = max(1, round(share * workers * RANGES_PER_WORKER), -(-sizes[path] // MAX_RANGE_BYTES))
+        jobs.extend((parse_byte_range, (path, begin, end, log_format)) for begin, end in split_byte_ranges(path, parts))
+
+    files = {path: {'lines': 0, 'bytes': sizes[path], 'seconds': 0.0} for path in log_file_paths}
+    counters = {'lines': 0, 'rows': 0}
+
+    def chunks():
+        """
+        Job number and records of every job in order: a frame of records, or the path of a CSV part.
+        """
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for sequence, ((function, task), result) in enumerate(
+                    zip(jobs, _ordered_results(executor, jobs, 2 * workers))):
+                path = task[0]
+                if function is extract_part:
+                    frame, count, rows, seconds = result
+                else:
+                    frame, count, seconds = result
+                    rows = len(frame)
+                files[path]['lines'] += count
+                files[path]['seconds'] += seconds
+                counters['lines'] += count
+                counters['rows'] += rows
+                # Workers cannot report to the metrics of this process
+                metrics.observe('parse_lines', seconds)
+                metrics.count('rows_parsed', rows)
+                if frame is None:
+                    # Already in the Parquet staging directory; a CSV part is copied in its place
+                    if output_format != 'parquet':
+                        yield sequence, task[1]
+                elif not frame.empty:
+                    yield sequence, frame
 
-# Read the log file
-try:
-    with open(log_file_path, 'r') as file:
-        logs = file.readlines()
-except FileNotFoundError:
-    logging.error(f"Log file not found: {log_file_path}")
-    exit(1)
-except Exception as e:
-    logging.error(f"Error reading log file: {e}")
-    exit(1)
-
-# Initialize lists to store parsed data
-ip_addresses = []
-timestamps = []
-request_methods = []
-request_paths = []
-status_codes = []
-user_agents = []
-
-# Regular expression pattern to match the log format
-pattern = r'(?P<ip>[\d\.]+) - - \[(?P<timestamp>.*?)\] "(?P<method>.*?) (?P<path>.*?) .*?" (?P<status>\d+) .*?"(' \
-          r'?P<user_agent>.*?)" '
-
-# Iterate over each log entry and extract information
-for log in logs:
     try:
-        match = re.match(pattern, log)
-        if match:
-            ip_addresses.append(match.group('ip'))
-            timestamps.append(match.group('timestamp'))
-            request_methods.append(match.group('method'))
-            request_paths.append(match.group('path'))
-            status_codes.append(match.group('status'))
-            user_agents.append(match.group('user_agent'))
-    except re.error:
-        logging.error("Regular expression error")
-    except Exception as e:
-        logging.error(f"Error parsing log entry: {e}")
+        if output_format == 'parquet':
+            for sequence, frame in chunks():
+                log_store.write_parts([frame], target, sequence)
+            log_store.replace_dataset(target, output)
+        else:
+            _write_csv((records for _, records in chunks()), output, columns)
+    finally:
+        shutil.rmtree(target, ignore_errors=True)
 
-# Create a DataFrame
-try:
-    data = {
-        'IP Address': ip_addresses,
-        'Timestamp': timestamps,
-        'Request Method': request_methods,
-        'Request Path': request_paths,
-        'Status Code': status_codes,
-        'User Agent': user_agents
+    seconds = time.perf_counter() - start
+    stats = {
+        'lines': counters['lines'],
+        'rows': counters['rows'],
+        'bytes': total_bytes,
+        'seconds': seconds,
+        'lines_per_second': counters['lines'] / seconds if seconds else 0.0,
+        'files': files,
     }
-    df = pd.DataFrame(data)
-except Exception as e:
-    logging.error(f"Error creating DataFrame: {e}")
-    exit(1)
+    _record_extract(stats)
+    return stats
 
-# Specify the path to save the CSV file relative to the parent directory
-data_dir = os.path.join(parent_dir, 'data/csv')
-csv_file = os.path.join(data_dir, 'server_logs.csv')
 
-# Save the DataFrame to a CSV file
-try:
-    df.to_csv(csv_file, index=False)
-except Exception as e:
-    logging.error(f"Error saving CSV file: {e}")
-    exit(1)
+def main():
+    # Set up logging
+    logging.basicConfig(filename='error.log', level=logging.ERROR)
 
-# Display the CSV file contents
-try:
-    with open(csv_file,  'r') as file:
-        csv_contents = file.read()
-    print(csv_contents)
-except Exception as e:
-    logging.error(f"Error reading CSV file: {e}")
\ No newline at end of file
+    # Set the current directory
+    try:
+        parent_dir = SetEnv.set_path()
+    except Exception as e:
+        logging.error(f"Error setting parent directory: {e}")
+        exit(1)
+
+    parser = argparse.ArgumentParser(description='Extract server logs into a Parquet dataset or CSV file.')
+    parser.add_argument('--input', nargs='+', default=[os.path.join(parent_dir, 'data/raw/server_logs.txt')],
+                        help='Raw log files, directories of rotated log files or glob patterns; '
+                             f"{', '.join(COMPRESSED_EXTENSIONS)} files are decompressed while reading")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='parquet',
+                        help='Output format (default: parquet)')
+    parser.add_argument('--output',
+                        help='CSV file or Parquet dataset directory to write; defaults to data/csv/server_logs.csv '
+                             f'or {log_store.DEFAULT_DATASET}')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='Number of lines parsed per chunk')
+    parser.add_argument('--log-format', default=DEFAULT_LOG_FORMAT,
+                        help=f"Log format: {', '.join(LOG_PATTERNS)}, or a regular expression with named groups "
+                             f"among {', '.join(FIELD_COLUMNS)} (default: {DEFAULT_LOG_FORMAT})")
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes; above 1 the input is split into byte ranges')
+    args = parser.parse_args()
+    if args.output is None:
+        default_output = log_store.DEFAULT_DATASET if args.format == 'parquet' else 'data/csv/server_logs.csv'
+        args.output = os.path.join(parent_dir, default_output)
+
+    try:
+        log_files = list(dict.fromkeys(path for pattern in args.input for path in list_log_files(pattern)))
+        if not log_files:
+            raise FileNotFoundError(args.input)
+        if args.workers > 1:
+            stats = parallel_extract(log_files, args.output, args.workers, args.format, args.log_format)
+        else:
+            stats = extract(log_files, args.output, args.batch_size, args.format, args.log_format)
+    except FileNotFoundError:
+        logging.error(f"Log file not found: {args.input}")
+        exit(1)
+    except Exception as e:
+        logging.error(f"Error extracting log file: {e}")
+        exit(1)
+
+    for path, file_stats in stats['files'].items():
+        seconds = file_stats['seconds']
+        print(f"  {os.path.basename(path)}: {file_stats['lines']} lines, {file_stats['bytes'] / 1e6:.1f} MB read "
+              f"in {seconds:.2f}s ({file_stats['lines'] / seconds if seconds else 0:,.0f} lines/s, "
+              f"{file_stats['bytes'] / 1e6 / seconds if seconds else 0:.1f} MB/s)")
+    print(f"Parsed {stats['rows']} of {stats['lines']} lines ({stats['bytes'] / 1e6:.1f} MB read) "
+          f"in {stats['seconds']:.2f}s ({stats['lines_per_second']:,.0f} lines/s) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from utils import metrics
+
+# Default number of rendered figures kept
+DEFAULT_MAXSIZE = 128
+
+# Default lifetime of a rendered figure, in seconds
+DEFAULT_TTL = 300
+
+
+class FigureCache:
+    """
+    Thread-safe LRU cache of rendered dashboard figures with a time-to-live.
+
+    Keys should include everything the figure depends on, typically
+    (chart, format, filters, data version), so a new data version simply
+    misses; invalidate drops everything at once after an ingest.
+
+    A missing value is built once however many requests ask for it while
+    it is being built: they all wait for the same build. A key should be
+    fetched either always with get_or_build or always with get_or_submit,
+    so a pool thread never waits for a build queued behind it.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL):
+        """
+        Args:
+            maxsize (int): Maximum number of figures kept; least recently used are evicted.
+            ttl (float): Seconds after which a figure is rebuilt.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Requests served by waiting for a build another request started
+        self.shared = 0
+        self._entries = OrderedDict()
+        # Builds in progress: key -> Future of the value
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_build(self, key, builder):
+        """
+        Return the cached value for key, building and caching it on a miss.
+
+        The builder runs in the calling thread, outside the lock, so
+        concurrent misses for different charts render in parallel.
+
+        Args:
+            key (Hashable): Cache key.
+            builder (Callable[[], object]): Produces the value on a miss.
+
+        Returns:
+            object: The cached or freshly built value.
+        """
+        future, started = self._lookup(key, Future)
+        if not started:
+            return future.result()
+        try:
+            value = builder()
+        except BaseException as error:
+            future.set_exception(error)
+            self._finish(key, future)
+            raise
+        future.set_result(value)
+        self._finish(key, future)
+        return value
+
+    def get_or_submit(self, key, builder, executor):
+        """
+        Future of the cached value for key, building it on an executor on a miss.
+
+        The caller can wait for the value with a timeout; the build goes on
+        after a timeout and its value is cached for the next request.
+
+        Args:
+            key (Hashable): Cache key.
+            builder (Callable[[], object]): Produces the value on a miss.
+            executor (concurrent.futures.Executor): Runs the builder.
+
+        Returns:
+            concurrent.futures.Future: Completed on a hit.
+        """
+        future, started = self._lookup(key, lambda: executor.submit(builder))
+        if started:
+            future.add_done_callback(lambda done: self._finish(key, done))
+        return future
+
+    def _lookup(self, key, start):
+        """
+        Future of the value for key: completed on a hit, the build in progress if
+        there is one, else a new build from start() that the caller must finish.
+
+        Returns:
+            tuple[concurrent.futures.Future, bool]: The future, and whether it was started.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                metrics.count('cache_hits', cache='figures')
+                future = Future()
+                future.set_result(entry[1])
+                return future, False
+            future = self._pending.get(key)
+            if future is not None:
+                self.shared += 1
+                metrics.count('cache_shared', cache='figures')
+                return future, False
+            self.misses += 1
+            metrics.count('cache_misses', cache='figures')
+            future = self._pending[key] = start()
+            return future, True
+
+    def _finish(self, key, future):
+        # Cache the value of a completed build; failed builds are retried by the next request
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+            if future.cancelled() or future.exception() is not None:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, future.result())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """
+        Drop all cached figures, e.g. after new logs were ingested.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns:
+            dict: 'hits', 'misses', 'shared' (waits for a build in progress), 'evictions',
+            'size' and 'hit_rate' of the cache.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'shared': self.shared,
+            'evictions': self.evictions,
+            'size': len(self._entries),
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
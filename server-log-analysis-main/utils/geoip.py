@@ -0,0 +1,206 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils import SetEnv
+
+# Local IP-range database used by the geolocation analysis, relative to the project root
+DEFAULT_DATABASE = 'data/geoip/ip_ranges.csv'
+
+# How to get a database; it is not shipped with the project
+MISSING_DATABASE_HELP = (
+    "Download an IPv4 range database, e.g. the GeoLite2 City blocks CSV from MaxMind "
+    "(GeoLite2-City-Blocks-IPv4.csv, with 'network', 'latitude' and 'longitude' columns), "
+    "or build a CSV with 'start' and 'end' columns (dotted or integer addresses) and any of "
+    "'country', 'city', 'latitude' and 'longitude'. Save it there, or pass its path with --database."
+)
+
+# Location fields returned for every resolved IP, in output column order
+LOCATION_FIELDS = ['Country', 'City', 'Latitude', 'Longitude']
+
+# Dotted-quad IPv4 addresses; anything else (IPv6, garbage) is left unresolved
+IPV4_PATTERN = r'^(\d{1,3})\.(\d{1,3})\.(\d{1,3})\.(\d{1,3})$'
+
+
+def ipv4_to_int(addresses):
+    """
+    Convert IPv4 addresses to integers in one vectorized pass.
+
+    Args:
+        addresses (pd.Series): Dotted-quad address strings.
+
+    Returns:
+        np.ndarray: int64 addresses aligned with the input; -1 where the value
+        is not a valid IPv4 address.
+    """
+    octets = addresses.astype(str).str.extract(IPV4_PATTERN).astype(float).to_numpy()
+    valid = ~np.isnan(octets).any(axis=1) & (np.nan_to_num(octets) <= 255).all(axis=1)
+    octets = np.nan_to_num(octets).astype(np.int64)
+    numbers = (octets[:, 0] << 24) | (octets[:, 1] << 16) | (octets[:, 2] << 8) | octets[:, 3]
+    return np.where(valid, numbers, -1)
+
+
+def _range_bounds(ranges):
+    """
+    Read the integer start and end of every range of a database table.
+
+    Ranges are given either as 'start'/'end' columns holding dotted addresses
+    or integers, or as a 'network' column in CIDR notation.
+    """
+    if 'network' in ranges.columns:
+        network = ranges['network'].astype(str).str.split('/', n=1, expand=True)
+        starts = ipv4_to_int(network[0])
+        prefix = pd.to_numeric(network[1], errors='coerce').fillna(32).astype(np.int64).to_numpy()
+        return starts, starts + (np.int64(1) << (32 - prefix)) - 1
+
+    def to_int(column):
+        numbers = pd.to_numeric(column, errors='coerce')
+        if numbers.notna().all():
+            return numbers.astype(np.int64).to_numpy()
+        return ipv4_to_int(column)
+
+    return to_int(ranges['start']), to_int(ranges['end'])
+
+
+class GeoIPIndex:
+    """
+    Offline IPv4 geolocation backed by a sorted array of address ranges.
+
+    The database is a CSV file with one row per address range, either as
+    'start' and 'end' columns or as a CIDR 'network' column, plus 'country',
+    'city', 'latitude' and 'longitude' columns (missing ones are left empty).
+    Lookups resolve a whole column of addresses with one binary search, and
+    each distinct address is resolved at most once per index.
+    """
+
+    def __init__(self, database_path):
+        """
+        Args:
+            database_path (str): Path of the IP-range CSV file.
+        """
+        ranges = pd.read_csv(database_path)
+        ranges.columns = [column.strip().lower() for column in ranges.columns]
+        starts, ends = _range_bounds(ranges)
+        valid = (starts >= 0) & (ends >= starts)
+
+        order = np.argsort(starts[valid], kind='mergesort')
+        self.starts = starts[valid][order]
+        self.ends = ends[valid][order]
+        locations = pd.DataFrame({
+            field: ranges[field.lower()] if field.lower() in ranges.columns else None
+            for field in LOCATION_FIELDS
+        })
+        self.locations = locations[valid].iloc[order].reset_index(drop=True)
+        # Range position of every address resolved so far; -1 for unknown addresses
+        self._resolved = {}
+
+    def __len__(self):
+        return len(self.starts)
+
+    def lookup(self, numbers):
+        """
+        Find the range containing each integer address.
+
+        Args:
+            numbers (np.ndarray): int64 addresses; negative values are never found.
+
+        Returns:
+            np.ndarray: Position of the containing range in self.locations, or -1.
+        """
+        positions = np.searchsorted(self.starts, numbers, side='right') - 1
+        found = (positions >= 0) & (numbers >= 0)
+        found[found] = numbers[found] <= self.ends[positions[found]]
+        return np.where(found, positions, -1)
+
+    def resolve(self, ip_addresses):
+        """
+        Geolocate a column of IP addresses, resolving each distinct address once.
+
+        Args:
+            ip_addresses (pd.Series): IP address strings; may be categorical and contain nulls.
+
+        Returns:
+            pd.DataFrame: 'Country', 'City', 'Latitude' and 'Longitude' columns aligned
+            with ip_addresses; unresolved addresses give null fields.
+        """
+        if isinstance(ip_addresses.dtype, pd.CategoricalDtype):
+            codes = ip_addresses.cat.codes.to_numpy()
+            uniques = ip_addresses.cat.categories
+        else:
+            codes, uniques = pd.factorize(ip_addresses)
+
+        unique_positions = pd.Series(uniques, dtype=object).map(self._resolved)
+        missing = unique_positions.isna().to_numpy()
+        if missing.any():
+            new_addresses = pd.Series(uniques[missing], dtype=object)
+            new_positions = self.lookup(ipv4_to_int(new_addresses))
+            self._resolved.update(zip(new_addresses, new_positions.tolist()))
+            unique_positions[missing] = new_positions
+        unique_positions = unique_positions.to_numpy(dtype=np.int64)
+
+        positions = np.where(codes >= 0, unique_positions[codes] if len(uniques) else -1, -1)
+        # Append an all-null row so unresolved addresses map to it
+        locations = pd.concat([self.locations, pd.DataFrame([{}], columns=LOCATION_FIELDS)], ignore_index=True)
+        result = locations.iloc[np.where(positions >= 0, positions, len(self.locations))]
+        return result.set_index(ip_addresses.index)
+
+
+# Indexes already loaded, keyed by absolute path: {path: (mtime, GeoIPIndex)}
+_indexes = {}
+
+
+def load_index(database_path=DEFAULT_DATABASE):
+    """
+    Load an IP-range database, reusing the index while the file is unchanged.
+
+    Args:
+        database_path (str): Absolute path, or path relative to the project root.
+
+    Returns:
+        GeoIPIndex: The loaded index.
+
+    Raises:
+        FileNotFoundError: If there is no database at database_path; the message says how to get one.
+    """
+    if not os.path.isabs(database_path):
+        database_path = os.path.join(SetEnv.set_path(), database_path)
+    try:
+        mtime = os.stat(database_path).st_mtime_ns
+    except FileNotFoundError:
+        raise FileNotFoundError(f"No IP-range database at {database_path}. {MISSING_DATABASE_HELP}") from None
+    cached_mtime, index = _indexes.get(database_path, (None, None))
+    if cached_mtime != mtime:
+        index = GeoIPIndex(database_path)
+        _indexes[database_path] = (mtime, index)
+    return index
+
+
+def count_locations(ip_addresses, index):
+    """
+    Count requests per resolved location.
+
+    Requests are counted per distinct IP first, so only the distinct IPs are
+    resolved and grouped by location.
+
+    Args:
+        ip_addresses (pd.Series): IP address of every request.
+        index (GeoIPIndex): Index used to resolve the addresses.
+
+    Returns:
+        pd.DataFrame: 'Country', 'City', 'Latitude', 'Longitude', 'Requests' and
+        'Unique IPs' per location, most requests first; unresolved requests are left out.
+    """
+    if isinstance(ip_addresses.dtype, pd.CategoricalDtype):
+        codes = ip_addresses.cat.codes.to_numpy()
+        uniques = ip_addresses.cat.categories
+    else:
+        codes, uniques = pd.factorize(ip_addresses)
+    requests = np.bincount(codes[codes >= 0], minlength=len(uniques))
+
+    located = index.resolve(pd.Series(uniques, dtype=object))
+    located['Requests'] = requests
+    located['Unique IPs'] = 1
+    located = located[requests > 0].dropna(subset=['Latitude', 'Longitude'])
+    counts = located.groupby(LOCATION_FIELDS, dropna=False)[['Requests', 'Unique IPs']].sum()
+    return counts.reset_index().sort_values('Requests', ascending=False, kind='mergesort').reset_index(drop=True)
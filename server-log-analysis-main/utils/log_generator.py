@@ -0,0 +1,240 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    from utils import data_extractor
+except ImportError:  # Executed directly as ``python utils/log_generator.py``
+    import data_extractor
+
+# Status codes of the generated requests and their weights
+DEFAULT_STATUS_WEIGHTS = {200: 0.86, 304: 0.04, 302: 0.03, 301: 0.01, 404: 0.04, 403: 0.005, 500: 0.01,
+                          502: 0.003, 503: 0.002}
+
+# User agents of every kind of client
+USER_AGENTS = {
+    'mobile': [
+        'Mozilla/5.0 (Linux; Android 5.0; SM-G900H Build/LRX21T) AppleWebKit/537.36 (KHTML, like Gecko) '
+        'Chrome/39.0.2171.93 Mobile Safari/537.36',
+        'Mozilla/5.0 (iPhone; CPU iPhone OS 10_3_2 like Mac OS X) AppleWebKit/603.2.4 (KHTML, like Gecko) '
+        'Version/10.0 Mobile/14F89 Safari/602.1',
+        'Mozilla/5.0 (Linux; Android 8.0.0; SAMSUNG SM-G950F Build/R16NW) AppleWebKit/537.36 (KHTML, like Gecko) '
+        'SamsungBrowser/8.2 Chrome/63.0.3239.111 Mobile Safari/537.36',
+        'Mozilla/5.0 (Android 7.1.1; Mobile; rv:64.0) Gecko/64.0 Firefox/64.0',
+    ],
+    'desktop': [
+        'Mozilla/5.0 (Windows NT 6.1) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/71.0.3578.98 Safari/537.36',
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:64.0) Gecko/20100101 Firefox/64.0',
+        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_14_2) AppleWebKit/605.1.15 (KHTML, like Gecko) '
+        'Version/12.0.2 Safari/605.1.15',
+    ],
+    'bot': [
+        'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
+        'Mozilla/5.0 (compatible; bingbot/2.0; +http://www.bing.com/bingbot.htm)',
+        'Mozilla/5.0 (compatible; AhrefsBot/6.1; +http://ahrefs.com/robot/)',
+    ],
+}
+
+# Share of the requests sent by every kind of client
+DEFAULT_USER_AGENT_MIX = {'mobile': 0.6, 'desktop': 0.25, 'bot': 0.15}
+
+# Request path templates, filled with a resource id, and their weights
+PATH_TEMPLATES = {
+    '/product/{}': 0.3,
+    '/image/{}/productModel/200x200': 0.35,
+    '/m/product/{}': 0.1,
+    '/filter/p{}': 0.1,
+    '/browse/category-{}': 0.05,
+    '/static/js/bundle-{}.js': 0.1,
+}
+
+# Request methods and their weights
+METHOD_WEIGHTS = {'GET': 0.94, 'POST': 0.05, 'HEAD': 0.01}
+
+# Number of distinct client IP addresses
+DEFAULT_IPS = 10_000
+
+# Number of distinct resource ids in the request paths
+DEFAULT_RESOURCES = 50_000
+
+# Exponent of the power law of IP address and resource popularity; a few get most requests
+POPULARITY_SKEW = 1.1
+
+# First timestamp and time span of the generated logs
+DEFAULT_START = '2019-01-22 00:00:00+03:30'
+DEFAULT_SPAN = '1D'
+
+# Lines generated per batch
+DEFAULT_BATCH_SIZE = 100_000
+
+# Raw log format of the timestamps
+LOG_TIMESTAMP_FORMAT = '%d/%b/%Y:%H:%M:%S %z'
+
+
+def parse_weights(text, key_type=str):
+    """
+    Parse weights given as 'key=weight,key=weight'.
+
+    Args:
+        text (str): The weights.
+        key_type (type): Type the keys are converted to.
+
+    Returns:
+        dict: Weight of every key.
+    """
+    weights = {}
+    for item in text.split(','):
+        key, _, weight = item.partition('=')
+        weights[key_type(key.strip())] = float(weight)
+    return weights
+
+
+def _popularity(size, skew=POPULARITY_SKEW):
+    # Power-law probabilities of ranks 1..size
+    weights = 1 / np.arange(1, size + 1) ** skew
+    return weights / weights.sum()
+
+
+def _choice(rng, weights, size):
+    keys = np.array(list(weights), dtype=object)
+    probabilities = np.array(list(weights.values()), dtype=float)
+    return keys[rng.choice(len(keys), size, p=probabilities / probabilities.sum())]
+
+
+def _ip_addresses(rng, count):
+    # Distinct public-looking IPv4 addresses
+    addresses = np.empty(0, dtype=np.int64)
+    while len(addresses) < count:
+        drawn = rng.integers(1 << 24, 223 << 24, count - len(addresses) + 16)
+        addresses = np.unique(np.concatenate([addresses, drawn]))
+    addresses = rng.permutation(addresses)[:count]
+    octets = [(addresses >> shift) & 255 for shift in (24, 16, 8, 0)]
+    return np.array([f'{a}.{b}.{c}.{d}' for a, b, c, d in zip(*octets)], dtype=object)
+
+
+def generate_lines(rows, ips=DEFAULT_IPS, start=DEFAULT_START, span=DEFAULT_SPAN,
+                   status_weights=DEFAULT_STATUS_WEIGHTS, user_agent_mix=DEFAULT_USER_AGENT_MIX,
+                   log_format=data_extractor.DEFAULT_LOG_FORMAT, seed=0, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Generate synthetic access log lines in time order.
+
+    Requests are spread uniformly over the time span; IP addresses and
+    resources follow a power law, the other fields the given weights.
+
+    Args:
+        rows (int): Number of lines.
+        ips (int): Number of distinct client IP addresses.
+        start (str): Timestamp of the first line, with its UTC offset.
+        span (str): Time span of the lines, as a pandas timedelta.
+        status_weights (dict[int, float]): Weight of every status code.
+        user_agent_mix (dict[str, float]): Weight of every key of USER_AGENTS.
+        log_format (str): 'combined', or 'nginx' to add request and upstream times.
+        seed (int): Seed of the random generator; the same arguments give the same lines.
+        batch_size (int): Lines per batch.
+
+    Yields:
+        list[str]: Batches of log lines, newline terminated.
+    """
+    if log_format not in data_extractor.LOG_PATTERNS:
+        raise ValueError(f"Synthetic logs can only use the formats {', '.join(data_extractor.LOG_PATTERNS)}")
+    rng = np.random.default_rng(seed)
+    addresses = _ip_addresses(rng, ips)
+    ip_probabilities = _popularity(ips)
+    resource_probabilities = _popularity(DEFAULT_RESOURCES)
+    # Every client keeps its user agent
+    kinds = _choice(rng, user_agent_mix, ips)
+    client_agents = np.array([USER_AGENTS[kind][rng.integers(len(USER_AGENTS[kind]))] for kind in kinds],
+                             dtype=object)
+
+    first = pd.Timestamp(start)
+    first_second = first.value // 10**9
+    seconds = max(1, int(pd.Timedelta(span).total_seconds()))
+    for offset in range(0, rows, batch_size):
+        size = min(batch_size, rows - offset)
+        # The batch covers its share of the span, so batches follow each other in time
+        begin = first_second + seconds * offset // rows
+        end = max(begin + 1, first_second + seconds * (offset + size) // rows)
+        timestamps = np.sort(rng.integers(begin, end, size))
+        distinct, codes = np.unique(timestamps, return_inverse=True)
+        formatted = (pd.to_datetime(distinct, unit='s', utc=True).tz_convert(first.tz)
+                     .strftime(LOG_TIMESTAMP_FORMAT).to_numpy(dtype=object))[codes]
+
+        clients = rng.choice(ips, size, p=ip_probabilities)
+        statuses = _choice(rng, status_weights, size)
+        paths = _choice(rng, PATH_TEMPLATES, size)
+        resources = rng.choice(DEFAULT_RESOURCES, size, p=resource_probabilities) + 1
+        methods = _choice(rng, METHOD_WEIGHTS, size)
+        sizes = np.where(statuses == 304, 0, rng.lognormal(9, 1.2, size).astype(np.int64))
+        referred = rng.random(size) < 0.3
+        latencies = np.round(rng.lognormal(-3, 1, size), 3)
+
+        lines = []
+        for ip, timestamp, method, path, resource, status, bytes_sent, referrer, agent, latency in zip(
+                addresses[clients], formatted, methods, paths, resources, statuses, sizes, referred,
+                client_agents[clients], latencies):
+            path = path.format(resource)
+            referrer = f'https://www.example.com{path}' if referrer else '-'
+            line = (f'{ip} - - [{timestamp}] "{method} {path} HTTP/1.1" {status} {bytes_sent} '
+                    f'"{referrer}" "{agent}" "-"')
+            if log_format == 'nginx':
+                line += f' {latency:.3f} {latency * 0.9:.3f}'
+            lines.append(line + '\n')
+        yield lines
+
+
+def write_logs(path, rows, **options):
+    """
+    Write a synthetic access log file, compressed if its extension asks for it.
+
+    Args:
+        path (str): Log file to write; .gz, .bz2 and .zst files are compressed.
+        rows (int): Number of lines.
+        **options: Further arguments of generate_lines.
+
+    Returns:
+        dict: 'rows', 'bytes' (file size) and 'seconds' of the run.
+    """
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    compression = data_extractor.COMPRESSED_EXTENSIONS.get(os.path.splitext(path)[1])
+    if compression:
+        import pyarrow as pa
+        file = pa.output_stream(path, compression=compression)
+    else:
+        file = open(path, 'wb')
+    with file:
+        for lines in generate_lines(rows, **options):
+            file.write(''.join(lines).encode('utf-8'))
+    return {'rows': rows, 'bytes': os.path.getsize(path), 'seconds': time.perf_counter() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic server access log.')
+    parser.add_argument('--output', required=True, help='Log file to write; .gz, .bz2 and .zst files are compressed')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Number of lines')
+    parser.add_argument('--ips', type=int, default=DEFAULT_IPS, help='Number of distinct client IP addresses')
+    parser.add_argument('--start', default=DEFAULT_START, help='Timestamp of the first line, with its UTC offset')
+    parser.add_argument('--span', default=DEFAULT_SPAN, help='Time span of the lines, e.g. 1D or 12H')
+    parser.add_argument('--status', type=lambda text: parse_weights(text, int), default=DEFAULT_STATUS_WEIGHTS,
+                        help='Status code weights, e.g. 200=0.9,404=0.07,500=0.03')
+    parser.add_argument('--user-agents', type=parse_weights, default=DEFAULT_USER_AGENT_MIX,
+                        help=f"Client kind weights among {', '.join(USER_AGENTS)}, e.g. mobile=0.5,desktop=0.3,bot=0.2")
+    parser.add_argument('--log-format', choices=list(data_extractor.LOG_PATTERNS),
+                        default=data_extractor.DEFAULT_LOG_FORMAT, help='Log format of the lines')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator')
+    args = parser.parse_args()
+
+    unknown = set(args.user_agents) - set(USER_AGENTS)
+    if unknown:
+        parser.error(f"Unknown client kinds: {', '.join(sorted(unknown))}")
+    stats = write_logs(args.output, args.rows, ips=args.ips, start=args.start, span=args.span,
+                       status_weights=args.status, user_agent_mix=args.user_agents, log_format=args.log_format,
+                       seed=args.seed)
+    print(f"Wrote {stats['rows']} lines ({stats['bytes'] / 1e6:.1f} MB) in {stats['seconds']:.2f}s -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
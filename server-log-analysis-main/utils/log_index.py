@@ -0,0 +1,266 @@
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from utils import log_loader, log_store, sketches
+
+# Index file kept at the root of a dataset; the leading underscore hides it from dataset readers
+INDEX_FILE = '_index.pkl'
+
+# Target false positive rate of the per-row-group IP filters
+IP_FILTER_ERROR_RATE = 0.01
+
+# Columns of the index, one row per row group
+INDEX_COLUMNS = ['file', 'signature', 'row_group', 'rows', 'start', 'end', 'ip_filter']
+
+# Indexes already loaded, keyed by dataset directory: {path: (signature, index)}
+_indexes = {}
+
+
+def _data_files(dataset_dir):
+    """
+    List the Parquet files of a dataset with their size and mtime.
+    """
+    files = {}
+    for root, directories, names in os.walk(dataset_dir):
+        directories[:] = [name for name in directories if not name.startswith(('_', '.'))]
+        for name in names:
+            if name.endswith('.parquet') and not name.startswith(('_', '.')):
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                files[os.path.relpath(path, dataset_dir)] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def _index_file(dataset_dir, relative_path, signature):
+    """
+    Describe every row group of one Parquet file.
+    """
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(os.path.join(dataset_dir, relative_path))
+    timestamp_column = parquet_file.schema_arrow.get_field_index('Timestamp')
+    entries = []
+    for row_group in range(parquet_file.metadata.num_row_groups):
+        ips = parquet_file.read_row_group(row_group, columns=['IP Address']).column(0).to_pandas()
+        distinct_ips = pd.unique(ips.dropna().astype(object))
+        ip_filter = sketches.BloomFilter(len(distinct_ips), IP_FILTER_ERROR_RATE)
+        ip_filter.add(distinct_ips)
+
+        statistics = parquet_file.metadata.row_group(row_group).column(timestamp_column).statistics
+        if statistics is not None and statistics.has_min_max:
+            first, last = pd.Timestamp(statistics.min), pd.Timestamp(statistics.max)
+        else:
+            timestamps = parquet_file.read_row_group(row_group, columns=['Timestamp']).column(0).to_pandas()
+            first, last = timestamps.min(), timestamps.max()
+        entries.append({
+            'file': relative_path,
+            'signature': signature,
+            'row_group': row_group,
+            'rows': parquet_file.metadata.row_group(row_group).num_rows,
+            'start': _utc(first),
+            'end': _utc(last),
+            'ip_filter': ip_filter,
+        })
+    return entries
+
+
+def build_index(dataset_dir=log_store.DEFAULT_DATASET):
+    """
+    Create or refresh the row-group index of a partitioned dataset.
+
+    The index holds, for every row group, its time range and a Bloom filter
+    of its IP addresses. Only files added or changed since the last build are
+    read, so refreshing after an append is cheap. The index is stored next
+    to the data in INDEX_FILE.
+
+    Args:
+        dataset_dir (str): Dataset written by log_store.write_dataset.
+
+    Returns:
+        pd.DataFrame: One row per row group with 'file', 'row_group', 'rows',
+        'start' and 'end' (UTC) and 'ip_filter'.
+    """
+    dataset_dir = log_loader.resolve_path(dataset_dir)
+    index_path = os.path.join(dataset_dir, INDEX_FILE)
+    files = _data_files(dataset_dir)
+
+    index = sketches.load(index_path) if os.path.exists(index_path) else pd.DataFrame(columns=INDEX_COLUMNS)
+    # Drop the entries of files that were removed or rewritten
+    current = index[index['signature'] == index['file'].map(files)]
+    missing = sorted(set(files) - set(current['file']))
+    if not missing and len(current) == len(index) and os.path.exists(index_path):
+        return index
+
+    entries = pd.DataFrame(
+        [entry for path in missing for entry in _index_file(dataset_dir, path, files[path])], columns=INDEX_COLUMNS)
+    index = pd.concat([frame for frame in [current, entries] if len(frame)] or [entries], ignore_index=True)
+    index = index.sort_values(['start', 'file', 'row_group'], kind='mergesort', ignore_index=True)
+    sketches.save(index, index_path)
+    return index
+
+
+def load_index(dataset_dir=log_store.DEFAULT_DATASET):
+    """
+    Return the row-group index of a dataset, refreshing it if the data changed.
+
+    Args:
+        dataset_dir (str): Dataset written by log_store.write_dataset.
+
+    Returns:
+        pd.DataFrame: The index, as returned by build_index.
+    """
+    dataset_dir = log_loader.resolve_path(dataset_dir)
+    signature = _data_files(dataset_dir)
+    cached_signature, index = _indexes.get(dataset_dir, (None, None))
+    if cached_signature != signature:
+        index = build_index(dataset_dir)
+        _indexes[dataset_dir] = (signature, index)
+    return index
+
+
+def _timezone(dataset_dir, index):
+    """
+    Time zone of the timestamps of a dataset, read from the schema of its first file.
+    """
+    import pyarrow.parquet as pq
+
+    if not len(index):
+        return None
+    return pq.read_schema(os.path.join(dataset_dir, index['file'].iloc[0])).field('Timestamp').type.tz
+
+
+def _utc(timestamp):
+    return timestamp.tz_convert('UTC') if timestamp.tzinfo else timestamp
+
+
+def query_logs(dataset_dir=log_store.DEFAULT_DATASET, start=None, end=None, ip=None, columns=None, stats=None,
+               limit=None):
+    """
+    Fetch the requests of a time range and/or IP address, reading only the
+    row groups that can contain them.
+
+    Row groups are skipped by their time range and by the Bloom filter of
+    their IP addresses; the remaining rows are filtered exactly. Row groups
+    are read in order of their first timestamp, so with a limit reading
+    stops as soon as no further row group can hold an earlier match.
+
+    Args:
+        dataset_dir (str): Dataset written by log_store.write_dataset.
+        start (str | datetime, optional): Keep requests at or after this time.
+        end (str | datetime, optional): Keep requests before this time.
+        ip (str, optional): Keep requests from this IP address.
+        columns (list[str], optional): Columns to return; all stored columns if None.
+        stats (dict, optional): Updated in place with 'row_groups', 'row_groups_read',
+            'rows_read', 'rows' and 'seconds'.
+        limit (int, optional): Return only the first limit matching requests.
+
+    Returns:
+        pd.DataFrame: The matching requests in timestamp order, with typed columns.
+    """
+    import pyarrow.parquet as pq
+
+    began = time.perf_counter()
+    dataset_dir = log_loader.resolve_path(dataset_dir)
+    index = load_index(dataset_dir)
+    if columns is None:
+        columns = [column for column in log_store.read_dataset_columns(dataset_dir)
+                   if column != log_store.PARTITION_COLUMN]
+    needed = list(columns) + [column for column in ['Timestamp', 'IP Address'] if column not in columns]
+
+    # Naive bounds are in the time zone of the data; the index is kept in UTC
+    tz = _timezone(dataset_dir, index)
+    selected = pd.Series(True, index=index.index)
+    if start is not None:
+        selected &= index['end'] >= _utc(log_loader.time_bound(start, tz))
+    if end is not None:
+        selected &= index['start'] < _utc(log_loader.time_bound(end, tz))
+    if ip is not None:
+        selected &= index['ip_filter'].map(lambda ip_filter: ip_filter.might_contain(ip)).astype(bool)
+    candidates = index[selected]
+    if limit is not None and limit <= 0:
+        # No requests are wanted, so no row group needs reading
+        candidates = candidates.iloc[:0]
+
+    frames = []
+    files = {}
+    rows_read = row_groups_read = matched = 0
+    # UTC timestamps of the matches so far, to tell when the first limit of them are known
+    matched_times = []
+    for entry in candidates.itertuples(index=False):
+        if limit is not None and matched >= limit:
+            matched_times = [pd.concat(matched_times, ignore_index=True).nsmallest(limit)]
+            if entry.start > matched_times[0].iloc[-1]:
+                break
+        if entry.file not in files:
+            files[entry.file] = pq.ParquetFile(os.path.join(dataset_dir, entry.file))
+        frame = files[entry.file].read_row_group(entry.row_group, columns=needed).to_pandas()
+        rows_read += len(frame)
+        row_groups_read += 1
+        frame_tz = frame['Timestamp'].dt.tz
+        mask = pd.Series(True, index=frame.index)
+        if start is not None:
+            mask &= frame['Timestamp'] >= log_loader.time_bound(start, frame_tz)
+        if end is not None:
+            mask &= frame['Timestamp'] < log_loader.time_bound(end, frame_tz)
+        if ip is not None:
+            mask &= frame['IP Address'] == ip
+        frame = frame[mask]
+        if len(frame):
+            frames.append(frame)
+            matched += len(frame)
+            if limit is not None:
+                times = frame['Timestamp']
+                matched_times.append(times.dt.tz_convert('UTC') if times.dt.tz is not None else times)
+
+    if frames:
+        if len({str(frame['Timestamp'].dt.tz) for frame in frames}) > 1:
+            # Files written under different UTC offsets cannot share one dtype
+            frames = [frame.assign(Timestamp=frame['Timestamp'].dt.tz_convert('UTC')) for frame in frames]
+        df = pd.concat(frames, ignore_index=True)
+        df = df[list(columns)].sort_values('Timestamp', kind='mergesort', ignore_index=True)
+        if limit is not None:
+            df = df.head(limit)
+        # Row groups carry their own categories; re-encode the combined result
+        df = log_store.to_typed_frame(df.astype({column: object for column in df.select_dtypes('category')}))
+    else:
+        df = log_store.to_typed_frame(pd.DataFrame(columns=columns))
+        if 'Timestamp' in df:
+            # Keep the timestamp dtype, so callers can use the .dt accessor on no matches too
+            df['Timestamp'] = pd.DatetimeIndex([], tz=tz or 'UTC')
+
+    if stats is not None:
+        stats.update({
+            'row_groups': len(index),
+            'row_groups_read': row_groups_read,
+            'rows_read': rows_read,
+            'rows': len(df),
+            'seconds': time.perf_counter() - began,
+        })
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the log dataset by time range and IP address.')
+    parser.add_argument('--input', default=log_store.DEFAULT_DATASET, help='Log dataset to query')
+    parser.add_argument('--start', help='Keep requests at or after this time')
+    parser.add_argument('--end', help='Keep requests before this time')
+    parser.add_argument('--ip', help='Keep requests from this IP address')
+    parser.add_argument('--repeat', type=int, default=1, help='Run the query this many times and report the best')
+    args = parser.parse_args()
+
+    build_index(args.input)
+    best = None
+    for _ in range(args.repeat):
+        stats = {}
+        df = query_logs(args.input, args.start, args.end, args.ip, stats=stats)
+        best = stats if best is None or stats['seconds'] < best['seconds'] else best
+    print(df.to_string(max_rows=20))
+    print(f"{best['rows']} rows in {best['seconds'] * 1000:.1f}ms; read {best['rows_read']} rows from "
+          f"{best['row_groups_read']} of {best['row_groups']} row groups")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,410 @@
+import hashlib
+import os
+
+import pandas as pd
+
+from utils import SetEnv, log_store, metrics
+
+# Read-time dtypes for the legacy CSV format, so strings are never materialized per row
+CSV_DTYPES = {column: 'category' for column in log_store.CATEGORY_COLUMNS}
+
+# Memory-mapped column file kept inside a dataset directory; for a single file it is a hidden
+# '.<name>.arrow' next to it. Names starting with '_' or '.' are not read as data
+MMAP_CACHE_FILE = '_columns.arrow'
+
+# Schema metadata key of the digest of the source the column file was built from
+MMAP_DIGEST_KEY = b'source_digest'
+
+# Rows per record batch of the column file; bounds the memory used to build it
+MMAP_BATCH_ROWS = 1_000_000
+
+# Typed columns already loaded, keyed by absolute path:
+# {path: (signature, {column: pd.Series})}
+_cache = {}
+
+
+def resolve_path(file_dir):
+    """
+    Resolve a data path relative to the project root.
+
+    Args:
+        file_dir (str): Absolute path, or path relative to the project root.
+
+    Returns:
+        str: The absolute path.
+    """
+    if os.path.isabs(file_dir):
+        return file_dir
+    return os.path.join(SetEnv.set_path(), file_dir)
+
+
+def _is_dataset(path):
+    return os.path.isdir(path) or path.endswith('.parquet')
+
+
+def _signature(path):
+    """
+    Identify the current version of a dataset by the size and mtime of its files.
+
+    Files starting with '_' or '.' (indexes, temporary files) are not data and are ignored.
+    """
+    if os.path.isdir(path):
+        entries = []
+        for root, directories, files in os.walk(path):
+            directories[:] = [name for name in directories if not name.startswith(('_', '.'))]
+            for name in files:
+                if name.startswith(('_', '.')):
+                    continue
+                stat = os.stat(os.path.join(root, name))
+                entries.append((os.path.join(root, name), stat.st_size, stat.st_mtime_ns))
+        return tuple(sorted(entries))
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _digest(signature):
+    return hashlib.sha1(repr(signature).encode()).hexdigest()
+
+
+def dataset_digest(file_dir):
+    """
+    Fingerprint the current version of a dataset or CSV file.
+
+    Args:
+        file_dir (str): Dataset directory, Parquet file or CSV file.
+
+    Returns:
+        str: A hex digest that changes whenever any file of the dataset changes.
+    """
+    return _digest(_signature(resolve_path(file_dir)))
+
+
+def time_bound(value, tz):
+    """
+    Convert a time-range bound to a Timestamp comparable with the data.
+
+    Args:
+        value (str | datetime): The bound; naive values are taken in the time zone of the data.
+        tz (tzinfo | None): Time zone of the data's timestamps.
+
+    Returns:
+        pd.Timestamp: The bound, in the time zone of the data.
+    """
+    bound = pd.Timestamp(value)
+    if bound.tzinfo is None and tz is not None:
+        bound = bound.tz_localize(tz)
+    elif bound.tzinfo is not None and tz is None:
+        bound = bound.tz_convert(None)
+    return bound
+
+
+def _partition_filters(start, end):
+    """
+    Build day-partition predicates for a time range.
+
+    Partition names are local dates of the data, so the range is widened by
+    a day on each side to stay correct for any UTC offset.
+    """
+    filters = []
+    if start is not None:
+        day = (pd.Timestamp(start) - pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+        filters.append((log_store.PARTITION_COLUMN, '>=', day))
+    if end is not None:
+        day = (pd.Timestamp(end) + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+        filters.append((log_store.PARTITION_COLUMN, '<=', day))
+    return filters or None
+
+
+def _read_columns(path, columns, filters=None):
+    """
+    Read and type the given columns from disk.
+    """
+    if _is_dataset(path):
+        return log_store.read_dataset(path, columns=columns, filters=filters)
+    dtypes = {column: dtype for column, dtype in CSV_DTYPES.items() if column in columns}
+    return log_store.to_typed_frame(pd.read_csv(path, usecols=columns, dtype=dtypes))
+
+
+def mmap_cache_path(file_dir):
+    """
+    Path of the memory-mapped column file of a dataset or CSV file.
+
+    Args:
+        file_dir (str): Dataset directory, Parquet file or CSV file.
+
+    Returns:
+        str: MMAP_CACHE_FILE inside a dataset directory, or '.<name>.arrow' next to a file.
+    """
+    path = resolve_path(file_dir)
+    if os.path.isdir(path):
+        return os.path.join(path, MMAP_CACHE_FILE)
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f'.{name}.arrow')
+
+
+def open_mmap_cache(file_dir, signature=None):
+    """
+    Open the memory-mapped column file of a dataset, if it is up to date.
+
+    Only the footer and schema are read; the columns stay on disk and are
+    paged in by the operating system as they are used, so processes opening
+    the same file share one copy in the page cache.
+
+    Args:
+        file_dir (str): Dataset directory, Parquet file or CSV file.
+        signature (tuple, optional): Current signature of the source, if already known.
+
+    Returns:
+        pa.Table | None: Zero-copy table over the file, or None if it is missing,
+        unreadable or was built from another version of the source.
+    """
+    import pyarrow as pa
+
+    path = resolve_path(file_dir)
+    cache_path = mmap_cache_path(path)
+    if not os.path.exists(cache_path):
+        return None
+    digest = _digest(signature if signature is not None else _signature(path))
+    try:
+        reader = pa.ipc.open_file(pa.memory_map(cache_path, 'r'))
+        if (reader.schema.metadata or {}).get(MMAP_DIGEST_KEY) != digest.encode():
+            return None
+        return reader.read_all()
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+
+def _mmap_batches(path, columns):
+    """
+    Stream typed columns of a source as Arrow record batches of at most MMAP_BATCH_ROWS rows.
+    """
+    import pyarrow as pa
+
+    if _is_dataset(path):
+        yield from log_store.iter_dataset_batches(path, columns=columns, batch_size=MMAP_BATCH_ROWS)
+        return
+    for chunk in iter_logs(path, columns=columns, chunk_size=MMAP_BATCH_ROWS):
+        yield pa.RecordBatch.from_pandas(chunk, preserve_index=False)
+
+
+def _mmap_dictionaries(path, columns):
+    """
+    Collect the values of categorical columns across a whole source, in order of first appearance.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    dictionaries = {column: pa.array([], pa.string()) for column in columns}
+    if not columns:
+        return dictionaries
+    for batch in _mmap_batches(path, columns):
+        for column in columns:
+            values = batch.column(column)
+            values = values.dictionary if pa.types.is_dictionary(values.type) else pc.unique(values)
+            dictionaries[column] = pc.unique(pa.concat_arrays([dictionaries[column], values.cast(pa.string())]))
+    return dictionaries
+
+
+def _encode(values, dictionary):
+    """
+    Dictionary-encode a column of a batch against the dictionary of the whole source.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if pa.types.is_dictionary(values.type):
+        # Map each value of the batch's own dictionary once, then remap the codes
+        positions = pc.index_in(values.dictionary.cast(pa.string()), value_set=dictionary)
+        indices = pc.take(positions, values.indices)
+    else:
+        indices = pc.index_in(values.cast(pa.string()), value_set=dictionary)
+    return pa.DictionaryArray.from_arrays(indices.cast(pa.int32()), dictionary)
+
+
+def build_mmap_cache(file_dir, signature=None):
+    """
+    Write the memory-mapped column file of a dataset and open it.
+
+    The source is streamed in Arrow record batches and stored uncompressed
+    in the Arrow IPC file format: numeric and timestamp columns as
+    fixed-width arrays and categorical columns as dictionary-encoded integer
+    codes. The file format allows only one dictionary per column, so a first
+    pass over the categorical columns collects their values and every batch
+    is encoded against them; at most one batch is held in memory. The digest
+    of the source's file sizes and mtimes is stored in the schema, so a
+    changed source invalidates the file. The file is written to a temporary
+    name and renamed, so concurrent readers see either the old or the new
+    version.
+
+    Args:
+        file_dir (str): Dataset directory, Parquet file or CSV file.
+        signature (tuple, optional): Signature of the source, if already known.
+
+    Returns:
+        pa.Table: Zero-copy table over the new file.
+    """
+    import pyarrow as pa
+
+    path = resolve_path(file_dir)
+    cache_path = mmap_cache_path(path)
+    signature = signature if signature is not None else _signature(path)
+    columns = available_columns(path)
+    # The partition column is read back as strings; store it as a category like read_dataset
+    categorical = [column for column in columns
+                   if column in log_store.CATEGORY_COLUMNS or column == log_store.PARTITION_COLUMN]
+    with metrics.timer('build_mmap_cache'):
+        dictionaries = _mmap_dictionaries(path, categorical)
+        temporary_path = f'{cache_path}.{os.getpid()}.tmp'
+        try:
+            with pa.OSFile(temporary_path, 'wb') as sink:
+                writer = schema = None
+                for batch in _mmap_batches(path, columns):
+                    arrays = [_encode(batch.column(column), dictionaries[column]) if column in dictionaries
+                              else batch.column(column) for column in columns]
+                    if writer is None:
+                        schema = pa.schema([pa.field(column, array.type) for column, array in zip(columns, arrays)],
+                                           metadata={**(batch.schema.metadata or {}),
+                                                     MMAP_DIGEST_KEY: _digest(signature).encode()})
+                        writer = pa.ipc.new_file(sink, schema)
+                    writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+                if writer is None:
+                    # No rows; keep the typed, empty columns
+                    empty = pa.Table.from_pandas(_read_columns(path, columns), preserve_index=False)
+                    writer = pa.ipc.new_file(sink, empty.schema.with_metadata(
+                        {**(empty.schema.metadata or {}), MMAP_DIGEST_KEY: _digest(signature).encode()}))
+                writer.close()
+            os.replace(temporary_path, cache_path)
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+    return open_mmap_cache(path, signature)
+
+
+def _mmap_columns(path, columns, signature):
+    """
+    Read typed columns through the memory-mapped column file, building it if needed.
+
+    Falls back to reading the source when the file cannot be written, e.g.
+    next to read-only data.
+    """
+    table = open_mmap_cache(path, signature)
+    if table is None:
+        metrics.count('cache_misses', cache='mmap')
+        try:
+            table = build_mmap_cache(path, signature)
+        except OSError:
+            table = None
+        if table is None:
+            return _read_columns(path, columns)
+    else:
+        metrics.count('cache_hits', cache='mmap')
+    # Only the requested columns are copied out of the mapped file
+    return table.select(columns).to_pandas(split_blocks=True)
+
+
+def available_columns(file_dir):
+    """
+    List the columns stored in a dataset or CSV file, without reading any rows.
+
+    Args:
+        file_dir (str): Dataset directory, Parquet file or CSV file.
+
+    Returns:
+        list[str]: The column names.
+    """
+    path = resolve_path(file_dir)
+    if _is_dataset(path):
+        return log_store.read_dataset_columns(path)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def load_logs(file_dir, columns=None, start=None, end=None, cache=True, mmap=True):
+    """
+    Load parsed server logs with compact, typed columns.
+
+    Reads the Parquet dataset written by data_extractor (a directory or a
+    .parquet file), falling back to the legacy CSV format. Only the requested
+    columns are read. With caching enabled each column is read and typed at
+    most once per version of the dataset, so timestamps are parsed only once
+    no matter how many analyses load them. Across processes, columns are
+    served from a memory-mapped column file next to the data (see
+    build_mmap_cache), built on first use and rebuilt when the data changes.
+
+    Args:
+        file_dir (str): Dataset directory, Parquet file or CSV file.
+        columns (list[str], optional): Columns to load; all columns if None.
+        start (str | datetime, optional): Keep requests at or after this time.
+        end (str | datetime, optional): Keep requests before this time.
+        cache (bool): Keep loaded columns in memory for later calls.
+        mmap (bool): With caching enabled, read columns through the memory-mapped column file.
+
+    Returns:
+        pd.DataFrame: The log records with datetime64, int16 and category dtypes.
+    """
+    path = resolve_path(file_dir)
+    time_range = start is not None or end is not None
+    if columns is None:
+        columns = available_columns(path)
+    wanted = list(columns)
+    needed = wanted + ['Timestamp'] if time_range and 'Timestamp' not in wanted else wanted
+
+    if cache:
+        signature = _signature(path)
+        cached_signature, loaded = _cache.get(path, (None, {}))
+        if cached_signature != signature:
+            loaded = {}
+        missing = [column for column in needed if column not in loaded]
+        metrics.count('cache_hits', len(needed) - len(missing), cache='columns')
+        metrics.count('cache_misses', len(missing), cache='columns')
+        if missing:
+            with metrics.timer('load_columns'):
+                frame = _mmap_columns(path, missing, signature) if mmap else _read_columns(path, missing)
+                loaded.update(frame.items())
+            _cache[path] = (signature, loaded)
+        df = pd.DataFrame({column: loaded[column] for column in needed})
+    else:
+        filters = _partition_filters(start, end) if time_range and _is_dataset(path) else None
+        df = _read_columns(path, needed, filters)
+
+    if time_range:
+        tz = df['Timestamp'].dt.tz
+        mask = pd.Series(True, index=df.index)
+        if start is not None:
+            mask &= df['Timestamp'] >= time_bound(start, tz)
+        if end is not None:
+            mask &= df['Timestamp'] < time_bound(end, tz)
+        df = df.loc[mask, wanted].reset_index(drop=True)
+        # Drop categories that no longer occur so counts stay free of zero rows
+        for column in df.select_dtypes('category').columns:
+            df[column] = df[column].cat.remove_unused_categories()
+    return df
+
+
+def iter_logs(file_dir, columns=None, chunk_size=100_000):
+    """
+    Stream parsed server logs in typed chunks of bounded size.
+
+    Args:
+        file_dir (str): Dataset directory, Parquet file or CSV file.
+        columns (list[str], optional): Columns to load; all columns if None.
+        chunk_size (int): Maximum number of rows per chunk.
+
+    Yields:
+        pd.DataFrame: Chunks of log records with typed columns.
+    """
+    path = resolve_path(file_dir)
+    if _is_dataset(path):
+        yield from metrics.timed(log_store.iter_dataset(path, columns=columns, batch_size=chunk_size),
+                                 'load_chunk', source='parquet')
+        return
+    dtypes = {column: dtype for column, dtype in CSV_DTYPES.items() if columns is None or column in columns}
+    chunks = (log_store.to_typed_frame(chunk)
+              for chunk in pd.read_csv(path, usecols=columns, dtype=dtypes, chunksize=chunk_size))
+    yield from metrics.timed(chunks, 'load_chunk', source='csv')
+
+
+def clear_cache():
+    """
+    Drop all cached columns.
+    """
+    _cache.clear()
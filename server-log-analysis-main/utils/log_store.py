@@ -0,0 +1,432 @@
+import os
+import shutil
+import time
+
+import pandas as pd
+
+try:
+    from utils import metrics
+except ImportError:  # Imported by a script executed directly from utils
+    import metrics
+
+# Format of the Timestamp field in the raw logs
+TIMESTAMP_FORMAT = '%d/%b/%Y:%H:%M:%S %z'
+
+# The same without the UTC offset
+WALL_TIME_FORMAT = '%d/%b/%Y:%H:%M:%S'
+
+# Columns stored as dictionary-encoded categories
+CATEGORY_COLUMNS = ['IP Address', 'Request Method', 'Request Path', 'Referrer', 'User Agent']
+
+# Response times in seconds; '-' (no upstream, or not logged) becomes NaN
+LATENCY_COLUMNS = ['Request Time', 'Upstream Time']
+
+# Name of the partition column; one directory per day
+PARTITION_COLUMN = 'Date'
+
+# Location of the columnar dataset, relative to the project root
+DEFAULT_DATASET = 'data/parquet/server_logs'
+
+# Maximum number of rows per Parquet row group; row groups never span an hour
+ROW_GROUP_SIZE = 65_536
+
+# Number of files append_dataset may add to a partition before compact_dataset merges them
+COMPACT_MIN_FILES = 32
+
+# Digits of the sequence number that starts every data file name (see data_file_name)
+SEQUENCE_WIDTH = 20
+
+
+def parse_timestamps(timestamps):
+    """
+    Parse raw log timestamps into a tz-aware datetime64 Series.
+
+    Logs repeat the same second many times, so every distinct timestamp is
+    parsed once. The UTC offset is split off and applied per offset, which
+    avoids the slow per-element offset handling of pd.to_datetime.
+
+    Args:
+        timestamps (pd.Series): Timestamps formatted as in the raw logs.
+
+    Returns:
+        pd.Series: Parsed timestamps; converted to UTC if the input mixes offsets.
+    """
+    timestamps = pd.Series(timestamps)
+    with metrics.timer('parse_timestamps'):
+        parsed = _parse_timestamps(timestamps)
+    metrics.count('timestamps_parsed', len(timestamps))
+    return parsed
+
+
+def _parse_timestamps(timestamps):
+    codes, distinct = pd.factorize(timestamps)
+    distinct = pd.Series(distinct, dtype=object)
+    offsets = distinct.str[-5:].unique()
+    if len(offsets) == 1 and distinct.str[-6].eq(' ').all():
+        tz = pd.to_datetime(distinct.iloc[0], format=TIMESTAMP_FORMAT).tz
+        parsed = pd.to_datetime(distinct.str[:-6], format=WALL_TIME_FORMAT).dt.tz_localize(tz)
+    else:
+        parsed = pd.to_datetime(distinct, format=TIMESTAMP_FORMAT)
+        if not pd.api.types.is_datetime64_any_dtype(parsed):
+            # Mixed UTC offsets cannot share one dtype
+            parsed = pd.to_datetime(distinct, format=TIMESTAMP_FORMAT, utc=True)
+    return pd.Series(parsed.array.take(codes, allow_fill=True), index=timestamps.index, name=timestamps.name)
+
+
+def to_typed_frame(df):
+    """
+    Convert raw string columns to compact, typed columns.
+
+    Only the columns present in df are converted, so projected frames are supported.
+
+    Args:
+        df (pd.DataFrame): Parsed log records with string columns.
+
+    Returns:
+        pd.DataFrame: The same records with datetime, integer, float and category dtypes.
+    """
+    df = df.copy()
+    if 'Timestamp' in df and not pd.api.types.is_datetime64_any_dtype(df['Timestamp']):
+        df['Timestamp'] = parse_timestamps(df['Timestamp'])
+    if 'Status Code' in df:
+        df['Status Code'] = pd.to_numeric(df['Status Code']).astype('int16')
+    if 'Bytes' in df:
+        # '-' is logged for responses without a body
+        df['Bytes'] = pd.to_numeric(df['Bytes'], errors='coerce').fillna(0).astype('int64')
+    for column in LATENCY_COLUMNS:
+        if column in df:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype('float32')
+    for column in CATEGORY_COLUMNS:
+        if column in df and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    return df
+
+
+def _write_partitions(typed, dataset_dir, file_name):
+    """
+    Write typed log records to one file per day partition, one row group per hour.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Group on local midnights; formatting every timestamp as a date string is far slower
+    days = typed['Timestamp'].dt.normalize()
+    hours = typed['Timestamp'].dt.hour
+    for day, part in typed.groupby(days, sort=False):
+        # Hive-style directories, so readers recover the partition column
+        partition_dir = os.path.join(dataset_dir, f"{PARTITION_COLUMN}={day.strftime('%Y-%m-%d')}")
+        os.makedirs(partition_dir, exist_ok=True)
+        schema = pa.Schema.from_pandas(part, preserve_index=False)
+        # One dictionary index type for every row group and file, whatever the number of categories
+        schema = pa.schema([pa.field(field.name, pa.dictionary(pa.int32(), field.type.value_type))
+                            if pa.types.is_dictionary(field.type) else field for field in schema],
+                           metadata=schema.metadata)
+        # Written under a hidden name and renamed, so readers never see a partial file
+        path = os.path.join(partition_dir, file_name)
+        temporary_path = os.path.join(partition_dir, f'.{file_name}')
+        with pq.ParquetWriter(temporary_path, schema, compression='zstd') as writer:
+            for _, hour in part.groupby(hours[part.index], sort=True):
+                # Keep only the categories of the hour; otherwise every row group stores the whole dictionary
+                hour = hour.assign(**{column: hour[column].cat.remove_unused_categories()
+                                      for column in hour.select_dtypes('category')})
+                writer.write_table(pa.Table.from_pandas(hour, schema=schema, preserve_index=False),
+                                   row_group_size=ROW_GROUP_SIZE)
+        os.replace(temporary_path, path)
+
+
+def _check_replaceable(dataset_dir):
+    """
+    Refuse to replace anything but a log dataset: a directory holding only day
+    partitions and hidden or '_' files such as indexes and caches.
+    """
+    if not os.path.exists(dataset_dir):
+        return
+    if not os.path.isdir(dataset_dir) or any(
+            not name.startswith(('_', '.', f'{PARTITION_COLUMN}=')) for name in os.listdir(dataset_dir)):
+        raise ValueError(f"Refusing to replace {dataset_dir}: it is not a log dataset")
+
+
+def staging_dir(dataset_dir):
+    """
+    Create an empty hidden sibling directory in which a new version of a dataset is written.
+
+    Args:
+        dataset_dir (str): Root directory of the dataset to replace.
+
+    Returns:
+        str: The staging directory, to be passed to replace_dataset.
+
+    Raises:
+        ValueError: If dataset_dir exists and is not a log dataset.
+    """
+    _check_replaceable(dataset_dir)
+    parent, name = os.path.split(os.path.abspath(dataset_dir))
+    staging = os.path.join(parent, f'.{name}.tmp-{os.getpid()}')
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    return staging
+
+
+def replace_dataset(staging, dataset_dir):
+    """
+    Swap a fully written staging directory in place of a dataset.
+
+    The old dataset is renamed aside before the new one is renamed into
+    place, and only removed once the swap succeeded.
+
+    Args:
+        staging (str): Directory returned by staging_dir.
+        dataset_dir (str): Root directory of the dataset to replace.
+
+    Raises:
+        ValueError: If staging holds no records, as a dataset without any file has no
+            schema to read, or if dataset_dir exists and is not a log dataset.
+    """
+    if not any(name.startswith(f'{PARTITION_COLUMN}=') for name in os.listdir(staging)):
+        raise ValueError(f"No log records to write; keeping {dataset_dir} as it is")
+    _check_replaceable(dataset_dir)
+    if not os.path.exists(dataset_dir):
+        os.replace(staging, dataset_dir)
+        return
+    parent, name = os.path.split(os.path.abspath(dataset_dir))
+    old = os.path.join(parent, f'.{name}.old-{os.getpid()}')
+    shutil.rmtree(old, ignore_errors=True)
+    os.replace(dataset_dir, old)
+    os.replace(staging, dataset_dir)
+    shutil.rmtree(old)
+
+
+def data_file_name(sequence, suffix):
+    """
+    Name of a data file of a dataset.
+
+    Readers scan the files of a partition in name order, so every name
+    starts with a zero-padded sequence number that increases in the order
+    the records were written: extraction numbers its writers from 0 in input
+    order, appends and compactions use the time of the write.
+
+    Args:
+        sequence (int): Position of the writer in write order.
+        suffix (str): Rest of the name, e.g. the number of the chunk or the kind of write.
+
+    Returns:
+        str: 'part-<sequence>-<suffix>.parquet'.
+    """
+    return f'part-{sequence:0{SEQUENCE_WIDTH}d}-{suffix}.parquet'
+
+
+def write_parts(chunks, dataset_dir, sequence=0):
+    """
+    Write parsed log chunks into an existing dataset directory, each chunk as its own set of files.
+
+    Args:
+        chunks (Iterable[pd.DataFrame]): Parsed log records, with string or typed columns.
+        dataset_dir (str): Root directory of the dataset.
+        sequence (int): Position of the writer in write order (see data_file_name), unique to the writer.
+
+    Returns:
+        int: Number of rows written.
+    """
+    rows = 0
+    for number, chunk in enumerate(chunks):
+        typed = to_typed_frame(chunk)
+        _write_partitions(typed, dataset_dir, data_file_name(sequence, f'{number:05d}'))
+        rows += len(typed)
+    return rows
+
+
+def write_dataset(chunks, dataset_dir):
+    """
+    Write parsed log chunks to a compressed Parquet dataset partitioned by day.
+
+    Any existing dataset at dataset_dir is replaced, but only once the new one
+    is completely written to a staging directory; a directory that is not a
+    log dataset is never replaced. Each chunk is written as its own set of
+    files, so memory use is bounded by the chunk size. Within a file every
+    hour gets its own row groups, so the timestamp statistics of the row
+    groups let time-range queries skip everything outside the range.
+
+    Args:
+        chunks (Iterable[pd.DataFrame]): Parsed log records with string columns.
+        dataset_dir (str): Root directory of the dataset.
+
+    Returns:
+        int: Number of rows written.
+
+    Raises:
+        ValueError: If the chunks hold no records, or if dataset_dir exists and is not a log dataset.
+    """
+    staging = staging_dir(dataset_dir)
+    try:
+        rows = write_parts(chunks, staging)
+        replace_dataset(staging, dataset_dir)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return rows
+
+
+# End of the names of the files written by append_dataset
+APPEND_SUFFIX = '-append.parquet'
+
+
+def append_file_name():
+    """
+    Name for the files of a new append; names sort after all files written before.
+    """
+    return data_file_name(time.time_ns(), 'append')
+
+
+def append_dataset(chunk, dataset_dir, file_name=None):
+    """
+    Add parsed log records to a dataset without rewriting the existing files.
+
+    The records are written as new files in their day partitions, named after
+    the time of the write so appends never collide with each other and are
+    read after the records already in the dataset.
+
+    Args:
+        chunk (pd.DataFrame): Parsed log records, with string or typed columns.
+        dataset_dir (str): Root directory of the dataset; created if needed.
+        file_name (str, optional): Name of the new files, from append_file_name; a new one if None.
+
+    Returns:
+        int: Number of rows written.
+    """
+    if chunk.empty:
+        return 0
+    os.makedirs(dataset_dir, exist_ok=True)
+    typed = to_typed_frame(chunk)
+    _write_partitions(typed, dataset_dir, file_name or append_file_name())
+    return len(typed)
+
+
+def discard_appends(dataset_dir, after):
+    """
+    Remove the files of the appends made after a given one.
+
+    Used to drop appends whose records were not recorded as stored elsewhere
+    before a crash, so they can be appended again without being counted twice.
+
+    Args:
+        dataset_dir (str): Root directory of the dataset.
+        after (str): File name of the last append to keep, from append_file_name.
+
+    Returns:
+        int: Number of files removed.
+    """
+    removed = 0
+    if not os.path.isdir(dataset_dir):
+        return removed
+    for partition in sorted(os.listdir(dataset_dir)):
+        partition_dir = os.path.join(dataset_dir, partition)
+        if partition.startswith(('_', '.')) or not os.path.isdir(partition_dir):
+            continue
+        for name in sorted(os.listdir(partition_dir)):
+            if name.endswith(APPEND_SUFFIX) and name > after:
+                os.remove(os.path.join(partition_dir, name))
+                removed += 1
+    return removed
+
+
+def compact_dataset(dataset_dir, min_files=COMPACT_MIN_FILES):
+    """
+    Merge the small files left by append_dataset into one file per partition.
+
+    The merged file is written before the small files are removed, so readers
+    may briefly see both, but never neither.
+
+    Args:
+        dataset_dir (str): Root directory of the dataset.
+        min_files (int): Only partitions with at least this many appended files are merged.
+
+    Returns:
+        int: Number of files merged.
+    """
+    import pyarrow.parquet as pq
+
+    merged = 0
+    for partition in sorted(os.listdir(dataset_dir)):
+        partition_dir = os.path.join(dataset_dir, partition)
+        if partition.startswith(('_', '.')) or not os.path.isdir(partition_dir):
+            continue
+        paths = [os.path.join(partition_dir, name) for name in sorted(os.listdir(partition_dir))
+                 if name.endswith(APPEND_SUFFIX)]
+        if len(paths) < min_files:
+            continue
+        # Files carry their own categories; combine plain values and re-encode
+        frames = [pq.read_table(path).to_pandas() for path in paths]
+        df = pd.concat([frame.astype({column: object for column in frame.select_dtypes('category')})
+                        for frame in frames], ignore_index=True)
+        df = df.sort_values('Timestamp', kind='mergesort', ignore_index=True)
+        # Named after the time of the merge, so the merged file keeps the place of the appends it replaces
+        _write_partitions(to_typed_frame(df), dataset_dir, data_file_name(time.time_ns(), 'compact'))
+        for path in paths:
+            os.remove(path)
+        merged += len(paths)
+    return merged
+
+
+def read_dataset_columns(dataset_dir):
+    """
+    List the columns of a Parquet log dataset, including the partition column.
+
+    Args:
+        dataset_dir (str): Root directory of the dataset, or a single Parquet file.
+
+    Returns:
+        list[str]: Column names.
+    """
+    import pyarrow.dataset as ds
+
+    return ds.dataset(dataset_dir, format='parquet', partitioning='hive').schema.names
+
+
+def iter_dataset_batches(dataset_dir, columns=None, batch_size=100_000):
+    """
+    Stream a Parquet log dataset as Arrow record batches, in partition order.
+
+    Args:
+        dataset_dir (str): Root directory of the dataset, or a single Parquet file.
+        columns (list[str], optional): Columns to load; all columns if None.
+        batch_size (int): Maximum number of rows per batch.
+
+    Yields:
+        pa.RecordBatch: Non-empty batches; categorical columns are dictionary-encoded.
+    """
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(dataset_dir, format='parquet', partitioning='hive')
+    for batch in dataset.to_batches(columns=columns, batch_size=batch_size):
+        if batch.num_rows:
+            yield batch
+
+
+def iter_dataset(dataset_dir, columns=None, batch_size=100_000):
+    """
+    Stream a Parquet log dataset in record batches, in partition order.
+
+    Args:
+        dataset_dir (str): Root directory of the dataset, or a single Parquet file.
+        columns (list[str], optional): Columns to load; all columns if None.
+        batch_size (int): Maximum number of rows per batch.
+
+    Yields:
+        pd.DataFrame: Chunks of log records with typed columns.
+    """
+    for batch in iter_dataset_batches(dataset_dir, columns=columns, batch_size=batch_size):
+        yield batch.to_pandas()
+
+
+def read_dataset(dataset_dir, columns=None, filters=None):
+    """
+    Read a Parquet log dataset, loading only the requested columns.
+
+    Args:
+        dataset_dir (str): Root directory of the dataset.
+        columns (list[str], optional): Columns to load; all columns if None.
+        filters (list[tuple], optional): pyarrow predicates pushed down to the scan.
+
+    Returns:
+        pd.DataFrame: The log records with typed columns.
+    """
+    return pd.read_parquet(dataset_dir, engine='pyarrow', columns=columns, filters=filters)
@@ -0,0 +1,287 @@
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+
+from utils import data_extractor, log_loader, metrics
+
+# Directory watched for appended and rotated log files
+DEFAULT_RAW_DIR = 'data/raw'
+
+# Read positions of the followed files, kept across runs
+DEFAULT_STATE_FILE = 'data/cache/tail_state.json'
+
+# Leading bytes hashed to recognize a file after it was renamed or compressed
+FINGERPRINT_SIZE = 1024
+
+# Maximum number of bytes read from one file per batch; bounds memory on a large backlog
+MAX_READ_BYTES = 32 * 1024 * 1024
+
+def _head(path):
+    """
+    Leading bytes of a file, decompressed if needed.
+    """
+    with data_extractor.open_log(path) as file:
+        return file.read(FINGERPRINT_SIZE)
+
+
+def _fingerprint(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def _find_match(entries, head):
+    """
+    Key of the followed file whose recorded leading bytes are those of head, if any.
+    """
+    for key, entry in entries.items():
+        size = entry['fingerprint_size']
+        if size and len(head) >= size and _fingerprint(head[:size]) == entry['fingerprint']:
+            return key
+    return None
+
+
+class LogTailer:
+    """
+    Follows the log files of a directory and parses only the lines appended
+    since the last read.
+
+    Files are identified by device and inode, so a file renamed by log
+    rotation keeps its read position. A rotated file that was compressed
+    gets a new inode; it is recognized by the hash of its first bytes and
+    read from the same position. Truncated files (copytruncate rotation) and
+    reused inodes are read again from the start. Only complete lines are
+    consumed from files that may still grow.
+    """
+
+    def __init__(self, raw_dir=DEFAULT_RAW_DIR, log_format=data_extractor.DEFAULT_LOG_FORMAT,
+                 state_file=DEFAULT_STATE_FILE, from_start=False):
+        """
+        Args:
+            raw_dir (str): Directory of the raw log files.
+            log_format (str): Name of a log format, or a custom pattern.
+            state_file (str | None): JSON file the read positions are kept in; None keeps them in memory only.
+            from_start (bool): On the first run, read the existing files from the start instead
+                of only the lines appended from now on.
+        """
+        self.raw_dir = log_loader.resolve_path(raw_dir)
+        self.pattern, self.columns = data_extractor.resolve_log_format(log_format)
+        self.state_file = log_loader.resolve_path(state_file) if state_file else None
+        # Read positions keyed by 'device:inode': {'path', 'offset', 'size', 'mtime', 'fingerprint',
+        # 'fingerprint_size'}. Offsets of compressed files count decompressed bytes; their size and
+        # mtime are recorded once they are read completely.
+        self.files = {}
+        self.first_run = True
+        if self.state_file and os.path.exists(self.state_file):
+            self.load()
+        if from_start:
+            self.first_run = False
+        self.stats = {'lines': 0, 'rows': 0, 'bytes': 0}
+
+    def load(self):
+        with open(self.state_file, 'r', encoding='utf-8') as file:
+            self.restore(file.read())
+
+    def state(self):
+        """
+        Returns:
+            str: The read positions as JSON, to be stored together with the chunks read up to them.
+        """
+        return json.dumps(self.files)
+
+    def restore(self, state):
+        """
+        Continue from read positions returned by state.
+        """
+        self.files = json.loads(state)
+        self.first_run = False
+
+    def save(self):
+        """
+        Persist the read positions, atomically.
+        """
+        if not self.state_file:
+            return
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        temporary_path = f'{self.state_file}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump(self.files, file)
+        os.replace(temporary_path, self.state_file)
+
+    def _scan(self):
+        """
+        Match the files of the directory with the known read positions.
+
+        Returns:
+            list[tuple[str, str, os.stat_result]]: Key, path and stat of every file, oldest first.
+        """
+        found = []
+        for path in data_extractor.list_log_files(self.raw_dir):
+            if os.path.basename(path).startswith(('_', '.')):
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:  # Rotated away since the listing
+                continue
+            found.append((f'{stat.st_dev}:{stat.st_ino}', path, stat))
+        # Rotated files are older than the file they were rotated from
+        found.sort(key=lambda item: (item[2].st_mtime_ns, item[1]))
+
+        present = {key for key, _, _ in found}
+        vanished = {key: entry for key, entry in self.files.items() if key not in present}
+        files = {}
+        for key, path, stat in found:
+            try:
+                head = _head(path)
+            except (OSError, EOFError):  # Compressed file still being written
+                continue
+            entry = self.files.get(key)
+            # Rotated files compressed by logrotate never grow
+            compressed = data_extractor.is_compressed(path)
+            if entry is not None and (
+                    _fingerprint(head[:entry['fingerprint_size']]) != entry['fingerprint']
+                    or (not compressed and stat.st_size < entry['offset'])):
+                # Truncated in place, or the inode now belongs to another file
+                entry = dict(entry, offset=0, size=0, mtime=0)
+            if entry is None:
+                moved = _find_match(vanished, head)
+                if moved is not None:
+                    entry = dict(vanished.pop(moved), size=0, mtime=0)
+                elif compressed and _find_match({known: self.files[known] for known in present
+                                                 if known in self.files}, head) is not None:
+                    # Compressed copy of a file that is still there; taken over once the original is removed
+                    continue
+            if entry is None:
+                entry = {'offset': 0, 'size': 0, 'mtime': 0}
+                if self.first_run:
+                    # Existing content is taken as already loaded, e.g. by data_extractor
+                    entry.update(size=stat.st_size, mtime=stat.st_mtime_ns)
+                    if not compressed:
+                        entry['offset'] = stat.st_size
+            entry.update(path=path, fingerprint=_fingerprint(head), fingerprint_size=len(head))
+            files[key] = entry
+        self.files = files
+        self.first_run = False
+        return found
+
+    @staticmethod
+    def _read(entry):
+        """
+        Read the complete lines after the read position of a plain file.
+
+        Returns:
+            bytes: The lines read; the read position is not advanced.
+        """
+        with open(entry['path'], 'rb') as file:
+            file.seek(entry['offset'])
+            data = file.read(MAX_READ_BYTES)
+        return data[:data.rfind(b'\n') + 1]
+
+    @staticmethod
+    def _read_compressed(entry):
+        """
+        Read the lines after the read position of a complete compressed file, in one decompression pass.
+
+        Compressed streams cannot seek, so the file is decompressed up to the
+        read position once, and the stream is kept open for the rest.
+
+        Yields:
+            bytes: Complete lines, about MAX_READ_BYTES at a time; the read position is not advanced.
+        """
+        with data_extractor.open_log(entry['path']) as file:
+            remaining = entry['offset']
+            while remaining > 0:
+                skipped = len(file.read(min(MAX_READ_BYTES, remaining)))
+                if not skipped:
+                    return
+                remaining -= skipped
+            pending = b''
+            while True:
+                data = file.read(MAX_READ_BYTES)
+                if not data:
+                    # The file is complete, so is its last line
+                    if pending:
+                        yield pending
+                    return
+                data = pending + data
+                end = data.rfind(b'\n') + 1
+                pending = data[end:]
+                if end:
+                    yield data[:end]
+
+    def _parse(self, data):
+        with metrics.timer('parse_lines'):
+            lines = data.decode('utf-8', errors='replace').splitlines()
+            match = self.pattern.match
+            records = [parsed.groups() for parsed in map(match, lines) if parsed is not None]
+        self.stats['lines'] += len(lines)
+        self.stats['rows'] += len(records)
+        self.stats['bytes'] += len(data)
+        metrics.count('lines_read', len(lines))
+        metrics.count('rows_parsed', len(records))
+        metrics.count('bytes_read', len(data))
+        return pd.DataFrame.from_records(records, columns=self.columns)
+
+    def read_new(self):
+        """
+        Parse the lines appended to the log files since the last read.
+
+        The read position of a file advances past a chunk before it is
+        yielded, so state taken while handling a chunk includes it. Store that
+        state together with the chunk (see app.append_logs), or call save once
+        the chunks are stored; chunks that were not stored are then read again
+        after a restart.
+
+        Yields:
+            pd.DataFrame: Parsed log records with string columns, oldest files first.
+        """
+        for key, path, stat in self._scan():
+            entry = self.files.get(key)
+            if entry is None:
+                continue
+            if data_extractor.is_compressed(path):
+                if (entry['size'], entry['mtime']) == (stat.st_size, stat.st_mtime_ns):
+                    continue
+                for data in self._read_compressed(entry):
+                    entry['offset'] += len(data)
+                    chunk = self._parse(data)
+                    if len(chunk):
+                        yield chunk
+                entry.update(size=stat.st_size, mtime=stat.st_mtime_ns)
+                continue
+            while True:
+                data = self._read(entry)
+                if data:
+                    entry['offset'] += len(data)
+                    chunk = self._parse(data)
+                    if len(chunk):
+                        yield chunk
+                if len(data) < MAX_READ_BYTES // 2:
+                    break
+
+
+def follow(tailer, handle, interval=1.0, stop=None):
+    """
+    Hand the lines appended to the log files to a callback as they are written.
+
+    The directory is polled every interval seconds while it is idle; a
+    backlog is read without waiting, in batches of at most MAX_READ_BYTES
+    per file.
+
+    Args:
+        tailer (LogTailer): The files to follow.
+        handle (Callable[[pd.DataFrame], None]): Called with every parsed chunk.
+        interval (float): Seconds between polls when there is nothing new.
+        stop (Callable[[], bool], optional): Checked after every poll; follow returns once it is true.
+    """
+    while True:
+        rows = 0
+        for chunk in tailer.read_new():
+            handle(chunk)
+            rows += len(chunk)
+        tailer.save()
+        if stop is not None and stop():
+            return
+        if not rows:
+            time.sleep(interval)
@@ -0,0 +1,179 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds of the stage duration histogram buckets, in seconds
+DURATION_BUCKETS = [0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0]
+
+# Prefix of every exported metric name
+METRIC_PREFIX = 'server_logs'
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Metrics:
+    """
+    Thread-safe timers and counters of the processing stages.
+
+    Timers record how long each stage took, as a histogram per stage and
+    label set; counters add up quantities such as rows processed, bytes read
+    or cache hits. Both are exported in the Prometheus text format.
+    """
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        """
+        Args:
+            buckets (list[float]): Upper bounds of the duration histogram buckets, in seconds.
+        """
+        self.buckets = buckets
+        # (name, labels) -> value
+        self._counters = {}
+        # (stage, labels) -> [count per bucket..., count, sum, max]
+        self._timers = {}
+        self._lock = threading.Lock()
+
+    def count(self, name, value=1, **labels):
+        """
+        Add to a counter.
+
+        Args:
+            name (str): Counter name, e.g. 'rows_loaded'.
+            value (int | float): Amount added.
+            **labels: Labels telling apart counters of the same name.
+        """
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, stage, seconds, **labels):
+        """
+        Record one run of a stage.
+
+        Args:
+            stage (str): Stage name, e.g. 'parse_timestamps'.
+            seconds (float): Duration of the run.
+            **labels: Labels telling apart runs of the same stage.
+        """
+        key = (stage, _label_key(labels))
+        bucket = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            timer = self._timers.get(key)
+            if timer is None:
+                timer = self._timers[key] = [0] * len(self.buckets) + [0, 0.0, 0.0]
+            if bucket < len(self.buckets):
+                timer[bucket] += 1
+            timer[-3] += 1
+            timer[-2] += seconds
+            timer[-1] = max(timer[-1], seconds)
+
+    @contextmanager
+    def timer(self, stage, **labels):
+        """
+        Time the enclosed block as one run of a stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, **labels)
+
+    def timed(self, chunks, stage, **labels):
+        """
+        Time the production of every chunk of an iterable and count its rows.
+
+        Time spent by the consumer between chunks is not included.
+
+        Args:
+            chunks (Iterable[Sized]): Chunks, e.g. DataFrames.
+            stage (str): Stage name of the production of a chunk.
+            **labels: Labels of the stage and of its 'rows' counter.
+
+        Yields:
+            The chunks, unchanged.
+        """
+        iterator = iter(chunks)
+        while True:
+            start = time.perf_counter()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            self.observe(stage, time.perf_counter() - start, **labels)
+            self.count('rows', len(chunk), stage=stage, **labels)
+            yield chunk
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: 'counters' as a list of {'name', 'labels', 'value'}, and 'timers' as a list of
+            {'stage', 'labels', 'count', 'seconds', 'max_seconds'}.
+        """
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in self._counters.items()]
+            timers = [{'stage': stage, 'labels': dict(labels), 'count': timer[-3], 'seconds': timer[-2],
+                       'max_seconds': timer[-1]}
+                      for (stage, labels), timer in self._timers.items()]
+        return {'counters': counters, 'timers': timers}
+
+    def reset(self):
+        """
+        Drop all recorded values.
+        """
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+
+    def to_prometheus(self):
+        """
+        Returns:
+            str: All counters and timers in the Prometheus text exposition format.
+        """
+        with self._lock:
+            counters = sorted(self._counters.items())
+            timers = sorted((key, list(timer)) for key, timer in self._timers.items())
+
+        lines = []
+        names = []
+        for (name, _), _ in counters:
+            if name not in names:
+                names.append(name)
+        for name in names:
+            metric = f'{METRIC_PREFIX}_{name}_total'
+            lines += [f'# HELP {metric} Total {name.replace("_", " ")}.', f'# TYPE {metric} counter']
+            lines += [f'{metric}{_format_labels(labels)} {value}'
+                      for (counter, labels), value in counters if counter == name]
+
+        metric = f'{METRIC_PREFIX}_stage_seconds'
+        if timers:
+            lines += [f'# HELP {metric} Time spent in each processing stage.', f'# TYPE {metric} histogram']
+        for (stage, labels), timer in timers:
+            labels = (('stage', stage),) + labels
+            cumulative = 0
+            for bound, count in zip(self.buckets, timer):
+                cumulative += count
+                lines.append(f'{metric}_bucket{_format_labels(labels, le=bound)} {cumulative}')
+            lines.append(f'{metric}_bucket{_format_labels(labels, le="+Inf")} {timer[-3]}')
+            lines.append(f'{metric}_sum{_format_labels(labels)} {timer[-2]}')
+            lines.append(f'{metric}_count{_format_labels(labels)} {timer[-3]}')
+        return '\n'.join(lines) + '\n'
+
+
+# Metrics of this process, shared by all modules
+REGISTRY = Metrics()
+
+count = REGISTRY.count
+observe = REGISTRY.observe
+timer = REGISTRY.timer
+timed = REGISTRY.timed
@@ -0,0 +1,134 @@
+import re
+
+import pandas as pd
+
+from utils import metrics
+
+# Rules applied to every segment of a path, in order: the first pattern matching the whole
+# segment (case-insensitively) replaces it with its template, which may refer to its groups
+DEFAULT_RULES = [
+    # Numeric ids: /product/10214
+    (r'\d+', '{id}'),
+    # Image sizes: /image/57710/productModel/100x100
+    (r'\d+x\d+', '{size}'),
+    # UUIDs: /api/v2/users/3f2a9c1e-...
+    (r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}', '{uuid}'),
+    # Hex digests of content-addressed files and sessions, 16 digits or more: /static/a3f9c2d1e4b5a6f7.css
+    (r'(?=[0-9a-f]*\d)[0-9a-f]{16,}(?P<suffix>\.\w+)?', r'{hash}\g<suffix>'),
+    # Comma or pipe separated filter lists, plain or percent-encoded: /filter/b41,b113,p53
+    (r'.*(?:,|\||%2C|%7C).*', '{list}'),
+    # Percent-encoded slugs, e.g. product names: /product/10214/25676/%D8%B3...
+    (r'.*%[0-9a-f]{2}.*', '{slug}'),
+    # API versions stay as they are: /api/v2
+    (r'v\d+(?:\.\d+)*', r'\g<0>'),
+    # Ids behind a short prefix or a separator: /filter/p53, /browse/category-12, /static/bundle-9.js
+    (r'(?P<prefix>[a-z]{1,2}|[\w.]*[-_])\d+(?P<suffix>\.\w+)?', r'\g<prefix>{id}\g<suffix>'),
+    # Numbered files: /static/12.jpg
+    (r'\d+(?P<suffix>\.\w+)', r'{id}\g<suffix>'),
+]
+
+# Default number of distinct segments whose templates are kept in memory
+DEFAULT_MAXSIZE = 200_000
+
+
+class PathNormalizer:
+    """
+    Collapses request paths into route templates.
+
+    Query strings and fragments are dropped, and every path segment is
+    rewritten by the first rule of a compiled rule set that matches it,
+    e.g. /image/57710/productModel/100x100?wh=max becomes
+    /image/{id}/productModel/{size}. Path and segment templates are cached,
+    so each distinct path is normalized, and each distinct segment matched
+    against the rules, once.
+    """
+
+    def __init__(self, rules=DEFAULT_RULES, maxsize=DEFAULT_MAXSIZE):
+        """
+        Args:
+            rules (list[tuple[str, str]]): (pattern, template) segment rules, applied in order.
+            maxsize (int): Most path and segment templates kept; a cache is emptied when it is full.
+        """
+        self.rules = [(re.compile(pattern, re.IGNORECASE), template) for pattern, template in rules]
+        self.maxsize = maxsize
+        self._paths = {}
+        self._segments = {}
+
+    def _segment(self, segment):
+        template = self._segments.get(segment)
+        if template is not None:
+            return template
+        template = segment
+        for pattern, replacement in self.rules:
+            match = pattern.fullmatch(segment)
+            if match:
+                template = match.expand(replacement)
+                break
+        if len(self._segments) >= self.maxsize:
+            self._segments.clear()
+        self._segments[segment] = template
+        return template
+
+    def normalize(self, path):
+        """
+        Route template of one request path.
+
+        Args:
+            path (str): A raw request path, with or without a query string.
+
+        Returns:
+            str: The template, e.g. '/product/{id}'.
+        """
+        template = self._paths.get(path)
+        if template is not None:
+            return template
+        stripped = path.split('?', 1)[0].split('#', 1)[0]
+        template = '/'.join([self._segment(segment) if segment else segment for segment in stripped.split('/')])
+        if len(self._paths) >= self.maxsize:
+            self._paths.clear()
+        self._paths[path] = template
+        return template
+
+    def normalize_series(self, paths):
+        """
+        Route templates of a column of request paths, normalizing each distinct path once.
+
+        Args:
+            paths (pd.Series): Raw request paths, categorical or not; nulls stay null.
+
+        Returns:
+            pd.Series: Categorical route templates aligned with paths.
+        """
+        if isinstance(paths.dtype, pd.CategoricalDtype):
+            codes = paths.cat.codes.to_numpy()
+            uniques = paths.cat.categories
+        else:
+            codes, uniques = pd.factorize(paths)
+
+        with metrics.timer('normalize_paths'):
+            templates = [self.normalize(str(path)) for path in uniques]
+        metrics.count('paths_normalized', len(uniques))
+        # Code -1 marks nulls; Categorical.from_codes maps it back to NaN
+        categories, template_codes = pd.factorize(pd.Index(templates, dtype=object))[::-1]
+        mapped = template_codes[codes] if len(template_codes) else codes.copy()
+        mapped[codes == -1] = -1
+        return pd.Series(pd.Categorical.from_codes(mapped, categories=categories), index=paths.index,
+                         name=paths.name)
+
+
+# Process-wide normalizer shared by the analyses and the dashboard
+default_normalizer = PathNormalizer()
+
+
+def route_templates(paths, normalizer=None):
+    """
+    Route templates of a column of request paths.
+
+    Args:
+        paths (pd.Series): Raw request paths.
+        normalizer (PathNormalizer, optional): Normalizer to use; defaults to default_normalizer.
+
+    Returns:
+        pd.Series: Categorical route templates aligned with paths.
+    """
+    return (normalizer if normalizer is not None else default_normalizer).normalize_series(paths)
@@ -0,0 +1,143 @@
+import os
+
+import pandas as pd
+
+from utils import log_loader, metrics
+
+# Default number of rows per chunk of the shared scan
+DEFAULT_CHUNK_SIZE = 100_000
+
+
+class Analysis:
+    """
+    Consumer of the shared log scan run by run_pipeline.
+
+    Subclasses declare the columns they need, fold every chunk into their
+    own accumulator in update, and turn it into a result in finish. write
+    saves the result to files so a report can run without a display.
+    """
+
+    # Name used to select the analysis and to name its output files
+    name = None
+
+    # Columns read from the dataset for this analysis
+    columns = []
+
+    # Columns used when the dataset has them, e.g. fields only some log formats carry
+    optional_columns = []
+
+    def update(self, chunk):
+        """
+        Fold a chunk of log records into the accumulator.
+
+        Args:
+            chunk (pd.DataFrame): Log records with at least the declared columns.
+        """
+        raise NotImplementedError
+
+    def finish(self):
+        """
+        Returns:
+            dict: Summary values of the analysis, printed by the report.
+        """
+        return {}
+
+    def write(self, output_dir):
+        """
+        Write the results of the analysis to files.
+
+        Args:
+            output_dir (str): Existing directory to write to.
+
+        Returns:
+            list[str]: Paths of the files written.
+        """
+        return []
+
+
+def add_counts(total, values):
+    """
+    Add the value counts of a chunk column to a running total.
+
+    Chunks carry their own categories, so counts are keyed by plain values.
+
+    Args:
+        total (pd.Series | None): Counts accumulated so far.
+        values (pd.Series): Column of the current chunk.
+
+    Returns:
+        pd.Series: The updated counts, without zero entries.
+    """
+    counts = values.value_counts(sort=False)
+    counts = counts[counts > 0]
+    if isinstance(counts.index, pd.CategoricalIndex):
+        counts.index = counts.index.astype(counts.index.categories.dtype)
+    if total is None:
+        return counts
+    return total.add(counts, fill_value=0).astype('int64')
+
+
+def analysis_columns(analysis, available):
+    """
+    Columns to read for an analysis: its required columns and the optional ones available.
+
+    Args:
+        analysis (Analysis | type[Analysis]): The analysis.
+        available (list[str]): Columns of the dataset.
+
+    Returns:
+        list[str]: The columns to read.
+    """
+    return analysis.columns + [column for column in analysis.optional_columns if column in available]
+
+
+def run_pipeline(file_dir, analyses, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Feed one scan of a log dataset to several analyses.
+
+    Only the union of the columns the analyses need is read, once, in chunks
+    of bounded size; each analysis receives every chunk.
+
+    Args:
+        file_dir (str): Dataset directory, Parquet file or CSV file.
+        analyses (list[Analysis]): The analyses to run.
+        chunk_size (int): Maximum number of rows per chunk.
+
+    Returns:
+        dict[str, dict]: The result of finish for every analysis, keyed by name.
+    """
+    available = log_loader.available_columns(file_dir)
+    selected = {analysis.name: analysis_columns(analysis, available) for analysis in analyses}
+    columns = []
+    for analysis in analyses:
+        columns.extend(column for column in selected[analysis.name] if column not in columns)
+
+    for chunk in log_loader.iter_logs(file_dir, columns=columns, chunk_size=chunk_size):
+        for analysis in analyses:
+            with metrics.timer('analysis_update', analysis=analysis.name):
+                analysis.update(chunk[selected[analysis.name]])
+
+    results = {}
+    for analysis in analyses:
+        with metrics.timer('analysis_finish', analysis=analysis.name):
+            results[analysis.name] = analysis.finish()
+    return results
+
+
+def write_results(analyses, output_dir):
+    """
+    Write the results of finished analyses to a directory.
+
+    Args:
+        analyses (list[Analysis]): Analyses already run by run_pipeline.
+        output_dir (str): Directory to write to; created if needed.
+
+    Returns:
+        list[str]: Paths of all files written.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for analysis in analyses:
+        with metrics.timer('analysis_write', analysis=analysis.name):
+            paths.extend(analysis.write(output_dir))
+    return paths
@@ -0,0 +1,40 @@
+from utils import path_templates, timeseries, ua_cache
+
+
+def compute_rollups(df, cache=None):
+    """
+    Aggregate a chunk of log records into the dashboard rollups.
+
+    Counts are additive, so rollups of successive chunks can be summed into
+    the stored tables. Time buckets use the local wall time of the logs.
+
+    Args:
+        df (pd.DataFrame): Log records with 'Timestamp', 'IP Address', 'Request Method',
+            'Request Path', 'Status Code' and 'User Agent' columns.
+        cache (ua_cache.UserAgentCache, optional): Cache used to classify user agents.
+
+    Returns:
+        dict[str, pd.DataFrame]: Count tables keyed by rollup name, with columns
+        named after the database columns:
+            'time_series': resolution, series, bucket, request_count (see timeseries.count_series)
+            'status': response_code, request_count
+            'ip': ip_address, request_count
+            'route': route, response_code, request_count (route templates of the request paths)
+            'user_agent': device, browser, request_count
+    """
+    def count(keys, names, frame=df):
+        counts = frame.groupby(keys, observed=True).size()
+        counts = counts[counts > 0].reset_index(name='request_count')
+        counts.columns = names + ['request_count']
+        return counts
+
+    classified = (cache if cache is not None else ua_cache.default_cache).classify(df['User Agent'])
+
+    return {
+        'time_series': timeseries.count_series(df),
+        'status': count('Status Code', ['response_code']),
+        'ip': count('IP Address', ['ip_address']),
+        'route': count(['Route', 'Status Code'], ['route', 'response_code'],
+                       df[['Status Code']].assign(Route=path_templates.route_templates(df['Request Path']))),
+        'user_agent': count(['Device', 'Browser'], ['device', 'browser'], classified),
+    }
@@ -0,0 +1,673 @@
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from utils import log_loader, log_store
+
+# Directory the per-partition sketches are persisted in, relative to the project root
+DEFAULT_SKETCH_DIR = 'data/cache/sketches'
+
+# Columns summarized by LogSketch
+SKETCH_COLUMNS = ['Timestamp', 'IP Address', 'Request Path']
+
+# Columns LogSketch summarizes when the log format carries them
+SKETCH_OPTIONAL_COLUMNS = ['Bytes', 'Request Time']
+
+
+def hash_values(values):
+    """
+    Hash a column to stable 64-bit integers, skipping nulls.
+
+    Hashes do not depend on the process or on the categories of a chunk, so
+    sketches built by different workers or runs can be merged.
+
+    Args:
+        values (pd.Series | np.ndarray): Values to hash; may be categorical.
+
+    Returns:
+        np.ndarray: uint64 hashes of the non-null values.
+    """
+    values = pd.Series(values)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()
+        # Hash each category once, then map the hashes to the rows
+        category_hashes = pd.util.hash_array(values.cat.categories.to_numpy(dtype=object), categorize=False)
+        return category_hashes[codes[codes >= 0]]
+    values = values.dropna()
+    return pd.util.hash_array(values.to_numpy(dtype=object), categorize=False)
+
+
+def _bit_length(values):
+    """
+    Number of significant bits of every uint64 value, computed without Python loops.
+    """
+    lengths = np.zeros(len(values), dtype=np.int64)
+    nonzero = values > 0
+    # The float estimate can be off by one near powers of two; correct it exactly
+    estimate = np.floor(np.log2(values[nonzero].astype(np.float64))).astype(np.int64) + 1
+    estimate = np.minimum(estimate, 64)
+    too_high = (estimate > 1) & ((values[nonzero] >> (estimate - 1).astype(np.uint64)) == 0)
+    estimate[too_high] -= 1
+    too_low = (estimate < 64) & ((values[nonzero] >> np.minimum(estimate, 63).astype(np.uint64)) > 0)
+    estimate[too_low] += 1
+    lengths[nonzero] = estimate
+    return lengths
+
+
+class HyperLogLog:
+    """
+    Distinct count estimate in 2**precision bytes, with a relative error of
+    about 1.04 / sqrt(2**precision) (0.8% at the default precision).
+    """
+
+    def __init__(self, precision=14):
+        """
+        Args:
+            precision (int): Number of hash bits used to pick a register, 4 to 18.
+        """
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, values):
+        """
+        Add a column of values.
+
+        Args:
+            values (pd.Series | np.ndarray): Values to count; nulls are ignored.
+        """
+        hashes = hash_values(values)
+        if not len(hashes):
+            return
+        suffix_bits = 64 - self.precision
+        registers = (hashes >> np.uint64(suffix_bits)).astype(np.int64)
+        suffixes = hashes & np.uint64((1 << suffix_bits) - 1)
+        # Position of the leftmost 1 bit within the suffix
+        ranks = (suffix_bits - _bit_length(suffixes) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, registers, ranks)
+
+    def merge(self, other):
+        """
+        Add the values counted by another sketch of the same precision.
+        """
+        if other.precision != self.precision:
+            raise ValueError("HyperLogLog sketches must have the same precision to be merged")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        """
+        Returns:
+            int: The estimated number of distinct values added.
+        """
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        empty = np.count_nonzero(self.registers == 0)
+        # Linear counting is more accurate while many registers are still empty
+        if estimate <= 2.5 * m and empty:
+            estimate = m * np.log(m / empty)
+        return int(round(estimate))
+
+
+def _row_indexes(hashes, depth, width):
+    """
+    Column of every hash in each row of a Count-Min table, by double hashing.
+    """
+    low = (hashes & np.uint64(0xFFFFFFFF)).astype(np.int64)
+    high = (hashes >> np.uint64(32)).astype(np.int64)
+    return [(low + row * high) % width for row in range(depth)]
+
+
+class BloomFilter:
+    """
+    Set membership with no false negatives and a bounded false positive rate.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        """
+        Args:
+            capacity (int): Expected number of distinct values.
+            error_rate (float): Target false positive rate at capacity.
+        """
+        bits = max(64, int(np.ceil(-max(capacity, 1) * np.log(error_rate) / np.log(2) ** 2)))
+        self.size = bits
+        self.hashes = max(1, int(round(bits / max(capacity, 1) * np.log(2))))
+        self.bits = np.zeros((bits + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, values):
+        return np.concatenate(_row_indexes(hash_values(values), self.hashes, self.size))
+
+    def add(self, values):
+        """
+        Add a column of values; nulls are ignored.
+        """
+        positions = self._positions(values)
+        np.bitwise_or.at(self.bits, positions >> 3, (1 << (positions & 7)).astype(np.uint8))
+
+    def might_contain(self, value):
+        """
+        Returns:
+            bool: False if value was certainly never added.
+        """
+        positions = self._positions([value])
+        return bool(np.all(self.bits[positions >> 3] & (1 << (positions & 7)).astype(np.uint8)))
+
+
+class CountMinSketch:
+    """
+    Frequency estimates in a fixed depth x width table.
+
+    Estimates never undercount; they overcount by at most 2 / width of the
+    total with probability 1 - 2**-depth.
+    """
+
+    def __init__(self, width=2048, depth=5):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+
+    def add(self, values, counts=None):
+        """
+        Add a column of values, or of distinct values with their counts.
+
+        Args:
+            values (pd.Series | np.ndarray): Values to count; nulls are ignored.
+            counts (np.ndarray, optional): Count of each value; one each if None.
+        """
+        values = pd.Series(values)
+        if counts is None:
+            counts = np.ones(len(values), dtype=np.int64)
+        counts = np.asarray(counts, dtype=np.int64)[values.notna().to_numpy()]
+        hashes = hash_values(values)
+        for row, columns in enumerate(_row_indexes(hashes, self.depth, self.width)):
+            np.add.at(self.table[row], columns, counts)
+        self.total += int(counts.sum())
+
+    def merge(self, other):
+        """
+        Add the counts of another sketch with the same dimensions.
+        """
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Count-Min sketches must have the same width and depth to be merged")
+        self.table += other.table
+        self.total += other.total
+        return self
+
+    def estimate(self, values):
+        """
+        Args:
+            values (pd.Series | np.ndarray): Non-null values to look up.
+
+        Returns:
+            np.ndarray: Estimated count of each value.
+        """
+        hashes = hash_values(values)
+        rows = _row_indexes(hashes, self.depth, self.width)
+        return np.min([self.table[row, columns] for row, columns in enumerate(rows)], axis=0)
+
+
+class SpaceSaving:
+    """
+    Heavy hitters with at most capacity counters.
+
+    Every value whose true count exceeds total / capacity is kept. A kept
+    value's count is an upper bound of its true count, and count - error
+    a lower bound. Summaries of chunks or partitions merge into a summary
+    with the same guarantees.
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+        self.errors = pd.Series(dtype=np.int64)
+
+    def _floor(self):
+        # Upper bound of the count of any value not kept
+        return int(self.counts.min()) if len(self.counts) >= self.capacity else 0
+
+    def add(self, values):
+        """
+        Add a column of values.
+
+        Args:
+            values (pd.Series): Values to count; nulls are ignored.
+        """
+        counts = values.value_counts(sort=False)
+        counts = counts[counts > 0]
+        if isinstance(counts.index, pd.CategoricalIndex):
+            counts.index = counts.index.astype(counts.index.categories.dtype)
+        chunk = SpaceSaving(self.capacity)
+        chunk.counts = counts.astype(np.int64)
+        chunk.errors = pd.Series(0, index=counts.index, dtype=np.int64)
+        chunk._trim()
+        self.merge(chunk)
+
+    def _trim(self):
+        if len(self.counts) <= self.capacity:
+            return
+        # Dropped values count at most as much as the smallest kept one, which _floor charges them on return
+        kept = self.counts.sort_index().sort_values(ascending=False, kind='mergesort').index[:self.capacity]
+        self.counts = self.counts[kept]
+        self.errors = self.errors[kept]
+
+    def merge(self, other):
+        """
+        Add the counts summarized by another SpaceSaving sketch.
+        """
+        floor, other_floor = self._floor(), other._floor()
+        keys = self.counts.index.union(other.counts.index)
+        self.errors = (self.errors.reindex(keys, fill_value=floor)
+                       + other.errors.reindex(keys, fill_value=other_floor))
+        self.counts = (self.counts.reindex(keys, fill_value=floor)
+                       + other.counts.reindex(keys, fill_value=other_floor))
+        self._trim()
+        return self
+
+    def top(self, n=10):
+        """
+        Args:
+            n (int): Number of values to return.
+
+        Returns:
+            pd.DataFrame: 'Value', 'Count' (upper bound) and 'Error' of the n most
+            frequent values, most frequent first.
+        """
+        counts = self.counts.sort_index().sort_values(ascending=False, kind='mergesort')[:n]
+        return pd.DataFrame({
+            'Value': counts.index,
+            'Count': counts.to_numpy(),
+            'Error': self.errors[counts.index].to_numpy(),
+        })
+
+
+class TDigest:
+    """
+    Quantile estimates from a bounded number of weighted centroids.
+
+    Centroids are small near the tails, so extreme quantiles (p99 and above)
+    stay accurate. Values are compressed a chunk at a time, and digests of
+    different chunks merge by compressing their centroids together.
+    """
+
+    def __init__(self, compression=200):
+        """
+        Args:
+            compression (float): Accuracy parameter; about compression centroids are kept.
+        """
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def add(self, values):
+        """
+        Add a column of numbers.
+
+        Args:
+            values (pd.Series | np.ndarray): Numbers to add; NaN values are ignored.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.minimum = min(self.minimum, values.min())
+        self.maximum = max(self.maximum, values.max())
+        self._compress(np.concatenate([self.means, values]), np.concatenate([self.weights, np.ones(len(values))]))
+
+    def merge(self, other):
+        """
+        Add the values summarized by another digest.
+        """
+        if other.count:
+            self.minimum = min(self.minimum, other.minimum)
+            self.maximum = max(self.maximum, other.maximum)
+            self._compress(np.concatenate([self.means, other.means]), np.concatenate([self.weights, other.weights]))
+        return self
+
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind='mergesort')
+        means, weights = means[order], weights[order]
+        cumulative = np.cumsum(weights)
+        quantiles = (cumulative - weights / 2) / cumulative[-1]
+        # Scale function k1: centroids span at most one unit of k, so they shrink towards the tails
+        scale = self.compression / (2 * np.pi) * np.arcsin(2 * quantiles - 1)
+        groups = np.floor(scale).astype(np.int64)
+        boundaries = np.flatnonzero(np.diff(groups)) + 1
+        starts = np.concatenate([[0], boundaries])
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def quantile(self, q):
+        """
+        Args:
+            q (float | list[float]): Quantile(s) between 0 and 1.
+
+        Returns:
+            float | np.ndarray: The estimated value(s); NaN if the digest is empty.
+        """
+        if not len(self.means):
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else float('nan')
+        cumulative = np.cumsum(self.weights)
+        centers = cumulative - self.weights / 2
+        positions = np.concatenate([[0], centers, [cumulative[-1]]])
+        values = np.concatenate([[self.minimum], self.means, [self.maximum]])
+        return np.interp(np.asarray(q) * cumulative[-1], positions, values)
+
+
+class GroupedTDigest:
+    """
+    One t-digest per group, e.g. per path and time window, updated without
+    looping over groups.
+
+    The centroids of all groups live in one table, each group's centroids
+    contiguous and sorted by value. A chunk is compressed for all the groups
+    it touches at once by sorting their centroids on (group, value) and
+    merging neighbours that fall into the same unit of the scale function;
+    the centroids of other groups are left as they are.
+    """
+
+    def __init__(self, keys, compression=200):
+        """
+        Args:
+            keys (list[str]): Names of the grouping columns.
+            compression (float): Accuracy parameter of every digest.
+        """
+        self.keys = list(keys)
+        self.compression = compression
+        self.centroids = pd.DataFrame(columns=self.keys + ['mean', 'weight'])
+        # Group of every centroid, as its position in self.extremes; new groups are appended there
+        self._group_ids = np.empty(0, dtype=np.int64)
+        self.extremes = None
+
+    def add(self, frame, value_column):
+        """
+        Add the values of a chunk to the digests of their groups.
+
+        Args:
+            frame (pd.DataFrame): Chunk with the grouping columns and value_column.
+            value_column (str): Column with the numbers to add; NaN values are ignored.
+        """
+        values = frame[self.keys + [value_column]].dropna(subset=[value_column])
+        if values.empty:
+            return
+        values = values.rename(columns={value_column: 'mean'})
+        values['mean'] = values['mean'].astype(np.float64)
+        for key in self.keys:
+            if isinstance(values[key].dtype, pd.CategoricalDtype):
+                # Chunks carry their own categories; group on the plain values
+                values[key] = values[key].astype(values[key].cat.categories.dtype)
+        values['weight'] = 1.0
+
+        grouped = values.groupby(self.keys, sort=False)
+        chunk_extremes = grouped['mean'].agg(['min', 'max'])
+        extremes = chunk_extremes
+        if self.extremes is not None:
+            extremes = pd.concat([self.extremes, extremes]).groupby(level=self.keys, sort=False).agg(
+                {'min': 'min', 'max': 'max'})
+        self.extremes = extremes
+        touched = extremes.index.get_indexer(chunk_extremes.index)
+        self._add_centroids(values, touched[grouped.ngroup().to_numpy()], touched)
+
+    def merge(self, other):
+        """
+        Add the values summarized by another GroupedTDigest with the same keys.
+        """
+        if other.extremes is None:
+            return self
+        if self.extremes is None:
+            self.extremes = other.extremes
+            self.centroids = other.centroids
+            self._group_ids = other._group_ids
+            return self
+        self.extremes = pd.concat([self.extremes, other.extremes]).groupby(level=self.keys, sort=False).agg(
+            {'min': 'min', 'max': 'max'})
+        touched = self.extremes.index.get_indexer(other.extremes.index)
+        self._add_centroids(other.centroids, touched[other._group_ids], touched)
+        return self
+
+    def _add_centroids(self, centroids, group_ids, touched):
+        """
+        Add centroids to the digests of their groups, compressing only the touched groups.
+
+        Args:
+            centroids (pd.DataFrame): Grouping columns, 'mean' and 'weight' of the new centroids.
+            group_ids (np.ndarray): Group of every new centroid.
+            touched (np.ndarray): Groups of the new centroids.
+        """
+        is_touched = np.zeros(len(self.extremes), dtype=bool)
+        is_touched[touched] = True
+        mask = is_touched[self._group_ids]
+        stored, stored_ids = self.centroids, self._group_ids
+        compressed, compressed_ids = self._compress(
+            pd.concat([stored[mask], centroids], ignore_index=True) if mask.any() else centroids,
+            np.concatenate([stored_ids[mask], group_ids]))
+        if mask.all():
+            self.centroids, self._group_ids = compressed, compressed_ids
+        else:
+            self.centroids = pd.concat([stored[~mask], compressed], ignore_index=True)
+            self._group_ids = np.concatenate([stored_ids[~mask], compressed_ids])
+
+    @staticmethod
+    def _positions(centroids, group_ids):
+        """
+        Group number, cumulative weight and group total of every centroid of a table
+        whose groups are contiguous; groups are numbered in order of appearance.
+        """
+        groups = pd.factorize(group_ids)[0]
+        weights = centroids['weight'].to_numpy(dtype=np.float64)
+        cumulative = pd.Series(weights).groupby(groups).cumsum().to_numpy()
+        totals = pd.Series(weights).groupby(groups).transform('sum').to_numpy()
+        return groups, weights, cumulative, totals
+
+    def _compress(self, centroids, group_ids):
+        """
+        Merge the centroids of every group; returns the merged table and the group of every row.
+        """
+        order = np.lexsort((centroids['mean'].to_numpy(), group_ids))
+        centroids = centroids.iloc[order].reset_index(drop=True)
+        group_ids = group_ids[order]
+        groups, weights, cumulative, totals = self._positions(centroids, group_ids)
+        quantiles = (cumulative - weights / 2) / totals
+        # Scale function k1, as in TDigest, evaluated for all groups at once
+        scale = np.floor(self.compression / (2 * np.pi) * np.arcsin(2 * quantiles - 1)).astype(np.int64)
+        new_centroid = np.ones(len(centroids), dtype=bool)
+        new_centroid[1:] = (groups[1:] != groups[:-1]) | (scale[1:] != scale[:-1])
+        starts = np.flatnonzero(new_centroid)
+        merged_weights = np.add.reduceat(weights, starts)
+        merged = centroids.iloc[starts][self.keys].reset_index(drop=True)
+        merged['mean'] = np.add.reduceat(centroids['mean'].to_numpy() * weights, starts) / merged_weights
+        merged['weight'] = merged_weights
+        return merged, group_ids[starts]
+
+    def quantiles(self, qs):
+        """
+        Estimate quantiles of every group in one vectorized pass.
+
+        Args:
+            qs (list[float]): Quantiles between 0 and 1.
+
+        Returns:
+            pd.DataFrame: The grouping columns, 'count', and one column per quantile
+            named 'p<percent>' (e.g. 'p95'); one row per group.
+        """
+        centroids = self.centroids
+        if not len(centroids):
+            return pd.DataFrame(columns=self.keys + ['count'] + [_quantile_name(q) for q in qs])
+        groups, weights, cumulative, totals = self._positions(centroids, self._group_ids)
+        first = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+        result = centroids.iloc[first][self.keys].reset_index(drop=True)
+        group_totals = totals[first]
+        result['count'] = group_totals.astype(np.int64)
+        extremes = self.extremes.reindex(pd.MultiIndex.from_frame(result[self.keys])
+                                         if len(self.keys) > 1 else result[self.keys[0]])
+        minimums, maximums = extremes['min'].to_numpy(), extremes['max'].to_numpy()
+
+        # Stack the groups on one axis so a single searchsorted serves all of them
+        offsets = np.r_[0, np.cumsum(group_totals)[:-1]]
+        centers = offsets[groups] + cumulative - weights / 2
+        means = centroids['mean'].to_numpy()
+        for q in qs:
+            targets = offsets + q * group_totals
+            right = np.searchsorted(centers, targets)
+            left = right - 1
+            group_ids = np.arange(len(first))
+            has_left = (left >= 0) & (groups[np.clip(left, 0, None)] == group_ids)
+            has_right = (right < len(centers)) & (groups[np.clip(right, None, len(centers) - 1)] == group_ids)
+            left_position = np.where(has_left, centers[np.clip(left, 0, None)], offsets)
+            left_value = np.where(has_left, means[np.clip(left, 0, None)], minimums)
+            right_position = np.where(has_right, centers[np.clip(right, None, len(centers) - 1)],
+                                      offsets + group_totals)
+            right_value = np.where(has_right, means[np.clip(right, None, len(centers) - 1)], maximums)
+            span = right_position - left_position
+            fraction = np.where(span > 0, (targets - left_position) / np.where(span > 0, span, 1), 0)
+            result[_quantile_name(q)] = left_value + fraction * (right_value - left_value)
+        # Groups are stored in the order they were last touched
+        return result.sort_values(self.keys, kind='mergesort', ignore_index=True)
+
+
+def _quantile_name(q):
+    return f'p{q * 100:g}'
+
+
+class LogSketch:
+    """
+    Bounded-memory summary of log records: distinct and top IPs and paths,
+    per-IP request counts, and quantiles of the time between requests, the
+    bytes sent and the response time.
+    """
+
+    def __init__(self, precision=14, capacity=1000):
+        self.requests = 0
+        self.unique_ips = HyperLogLog(precision)
+        self.unique_paths = HyperLogLog(precision)
+        self.top_ips = SpaceSaving(capacity)
+        self.top_paths = SpaceSaving(capacity)
+        self.ip_requests = CountMinSketch()
+        self.request_gaps = TDigest()
+        self.bytes_sent = TDigest()
+        self.response_times = TDigest()
+        self.first_timestamp = None
+        self.last_timestamp = None
+
+    def update(self, chunk):
+        """
+        Add a chunk of log records with 'Timestamp', 'IP Address' and 'Request Path'
+        columns, and optionally 'Bytes' and 'Request Time'.
+        """
+        if chunk.empty:
+            return
+        self.requests += len(chunk)
+        self.unique_ips.add(chunk['IP Address'])
+        self.unique_paths.add(chunk['Request Path'])
+        self.top_ips.add(chunk['IP Address'])
+        self.top_paths.add(chunk['Request Path'])
+        self.ip_requests.add(chunk['IP Address'])
+        timestamps = chunk['Timestamp'].sort_values()
+        if self.last_timestamp is not None and timestamps.iloc[0] >= self.last_timestamp:
+            self.request_gaps.add([(timestamps.iloc[0] - self.last_timestamp).total_seconds()])
+        self.request_gaps.add(timestamps.diff().dt.total_seconds())
+        if 'Bytes' in chunk:
+            self.bytes_sent.add(chunk['Bytes'])
+        if 'Request Time' in chunk:
+            self.response_times.add(chunk['Request Time'])
+        self.first_timestamp = _earliest(self.first_timestamp, timestamps.iloc[0])
+        self.last_timestamp = _latest(self.last_timestamp, timestamps.iloc[-1])
+
+    def merge(self, other):
+        """
+        Add the records summarized by another LogSketch with the same parameters.
+        """
+        self.requests += other.requests
+        self.unique_ips.merge(other.unique_ips)
+        self.unique_paths.merge(other.unique_paths)
+        self.top_ips.merge(other.top_ips)
+        self.top_paths.merge(other.top_paths)
+        self.ip_requests.merge(other.ip_requests)
+        self.request_gaps.merge(other.request_gaps)
+        self.bytes_sent.merge(other.bytes_sent)
+        self.response_times.merge(other.response_times)
+        if other.first_timestamp is not None:
+            self.first_timestamp = _earliest(self.first_timestamp, other.first_timestamp)
+            self.last_timestamp = _latest(self.last_timestamp, other.last_timestamp)
+        return self
+
+
+def _earliest(current, candidate):
+    return candidate if current is None else min(current, candidate)
+
+
+def _latest(current, candidate):
+    return candidate if current is None else max(current, candidate)
+
+
+def save(sketch, path):
+    """
+    Atomically write a sketch to disk.
+
+    Args:
+        sketch (object): Any of the sketches of this module.
+        path (str): Path of the sketch file.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temporary_path = f'{path}.tmp'
+    with open(temporary_path, 'wb') as file:
+        pickle.dump(sketch, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, path)
+
+
+def load(path):
+    """
+    Read a sketch written by save.
+    """
+    with open(path, 'rb') as file:
+        return pickle.load(file)
+
+
+def partition_sketches(dataset_dir=log_store.DEFAULT_DATASET, start=None, end=None, sketch_dir=DEFAULT_SKETCH_DIR):
+    """
+    Summarize the day partitions of a dataset, merged into one LogSketch.
+
+    Each partition is sketched once and persisted in sketch_dir; later calls
+    only merge the stored sketches, so a week of traffic is answered from
+    seven small files. A sketch is rebuilt when its partition changes.
+
+    Args:
+        dataset_dir (str): Partitioned dataset written by log_store.write_dataset.
+        start (str, optional): First day to include, as YYYY-MM-DD.
+        end (str, optional): Last day to include, as YYYY-MM-DD.
+        sketch_dir (str): Directory of the persisted sketches.
+
+    Returns:
+        LogSketch: The merged sketch of the selected days.
+    """
+    dataset_dir = log_loader.resolve_path(dataset_dir)
+    sketch_dir = log_loader.resolve_path(sketch_dir)
+    prefix = f'{log_store.PARTITION_COLUMN}='
+    merged = LogSketch()
+    for name in sorted(os.listdir(dataset_dir)):
+        day = name[len(prefix):]
+        if not name.startswith(prefix) or (start and day < start) or (end and day > end):
+            continue
+        partition_dir = os.path.join(dataset_dir, name)
+        digest = log_loader.dataset_digest(partition_dir)
+        available = log_loader.available_columns(partition_dir)
+        columns = SKETCH_COLUMNS + [column for column in SKETCH_OPTIONAL_COLUMNS if column in available]
+        sketch_path = os.path.join(sketch_dir, f'{day}.pkl')
+
+        stored = load(sketch_path) if os.path.exists(sketch_path) else None
+        if stored is None or stored[0] != digest:
+            sketch = LogSketch()
+            for chunk in log_loader.iter_logs(partition_dir, columns=columns):
+                sketch.update(chunk)
+            stored = (digest, sketch)
+            save(stored, sketch_path)
+        merged.merge(stored[1])
+    return merged
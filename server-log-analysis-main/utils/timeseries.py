@@ -0,0 +1,221 @@
+import numpy as np
+import pandas as pd
+
+# Bucket width of every resolution of the request counts, in seconds, finest first
+RESOLUTIONS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+# Name of the series of all requests; the others are 'status:<class>' and 'method:<method>'
+ALL_REQUESTS = 'all'
+
+# Resolutions of the status class and method series; per second, only all requests are counted,
+# which keeps the stored tables small
+BREAKDOWN_RESOLUTIONS = ['minute', 'hour', 'day']
+
+# Most points of a plotted time series
+DEFAULT_MAX_POINTS = 2000
+
+# Buckets per plotted point up to which a finer resolution is downsampled with LTTB rather than
+# replaced by a coarser one; short spikes stay visible in long windows
+OVERSAMPLING = 8
+
+# Columns of the count tables
+SERIES_COLUMNS = ['resolution', 'series', 'bucket', 'request_count']
+
+
+def _wall_seconds(timestamps):
+    # Seconds since the epoch of the local wall time of the logs, as the other rollups bucket them
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_localize(None)
+    return timestamps.to_numpy(dtype='datetime64[s]').astype(np.int64)
+
+
+def empty_series():
+    """
+    Count table without requests, with the columns and dtypes of count_series.
+    """
+    return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in
+                         zip(SERIES_COLUMNS, [object, object, np.int64, np.int64])})
+
+
+def count_series(df):
+    """
+    Count requests per time bucket at every resolution, in one pass.
+
+    The records are grouped once per second, status class and method; the
+    coarser resolutions and the single series are sums of these groups, so
+    the cost beyond the first group-by does not depend on the number of
+    records. Counts are additive across chunks. Buckets are in the local
+    wall time of the logs. The status class and method series are counted
+    at BREAKDOWN_RESOLUTIONS only.
+
+    Args:
+        df (pd.DataFrame): Log records with a 'Timestamp' column, and optionally
+            'Status Code' and 'Request Method' columns.
+
+    Returns:
+        pd.DataFrame: SERIES_COLUMNS, with buckets as the epoch seconds of the start of the
+        bucket and one row per non-empty bucket of every series: ALL_REQUESTS,
+        'status:2xx'... and 'method:GET'...
+    """
+    keys = {'bucket': _wall_seconds(df['Timestamp'])}
+    if 'Status Code' in df:
+        keys['status'] = pd.Categorical.from_codes(
+            np.clip(df['Status Code'].to_numpy() // 100, 0, 9), categories=[f'status:{digit}xx' for digit in range(10)])
+    if 'Request Method' in df:
+        methods = df['Request Method'].astype('category').cat
+        keys['method'] = methods.rename_categories(['method:' + str(method) for method in methods.categories]).array
+    # Null methods still count towards the other series
+    seconds = pd.DataFrame(keys).groupby(list(keys), observed=True, dropna=False, sort=False).size()
+    seconds = seconds[seconds > 0].reset_index(name='request_count')
+    if seconds.empty:
+        return empty_series()
+
+    tables = []
+    for resolution, width in RESOLUTIONS.items():
+        buckets = seconds.assign(bucket=seconds['bucket'] // width * width)
+        breakdowns = [key for key in keys if key != 'bucket'] if resolution in BREAKDOWN_RESOLUTIONS else []
+        for series_key in [None] + breakdowns:
+            by = ['bucket'] if series_key is None else [series_key, 'bucket']
+            counts = buckets.groupby(by, observed=True, sort=False)['request_count'].sum().reset_index()
+            counts['series'] = ALL_REQUESTS if series_key is None else counts.pop(series_key).astype(str)
+            counts['resolution'] = resolution
+            tables.append(counts)
+    return pd.concat(tables, ignore_index=True)[SERIES_COLUMNS]
+
+
+def sum_series(tables):
+    """
+    Sum count tables of successive chunks into one, sorted by resolution, series and bucket.
+    """
+    if not tables:
+        return empty_series()
+    counts = pd.concat(tables, ignore_index=True).groupby(['resolution', 'series', 'bucket'], sort=False)
+    counts = counts['request_count'].sum().reset_index()
+    order = counts['resolution'].map({resolution: rank for rank, resolution in enumerate(RESOLUTIONS)})
+    return counts.assign(rank=order).sort_values(['rank', 'series', 'bucket'], ignore_index=True).drop(columns='rank')
+
+
+def resolutions_of(series):
+    """
+    Resolutions a series is counted at, finest first.
+    """
+    return list(RESOLUTIONS) if series == ALL_REQUESTS else BREAKDOWN_RESOLUTIONS
+
+
+def pick_resolution(first, last, series=ALL_REQUESTS, max_points=DEFAULT_MAX_POINTS):
+    """
+    Finest resolution of a series for a window, given as the epoch seconds of its first and last second.
+
+    Returns:
+        str: The finest resolution of the series with at most max_points * OVERSAMPLING
+        buckets in the window, or its coarsest one.
+    """
+    span = max(last - first, 0) + 1
+    resolutions = resolutions_of(series)
+    for resolution in resolutions:
+        if span / RESOLUTIONS[resolution] <= max_points * OVERSAMPLING:
+            return resolution
+    return resolutions[-1]
+
+
+def lttb(x, y, threshold):
+    """
+    Downsample a series with Largest-Triangle-Three-Buckets.
+
+    The first and last points are kept; from every bucket in between, the
+    point forming the largest triangle with the point kept before it and the
+    mean of the next bucket. Peaks and dips survive, unlike with averaging.
+
+    Args:
+        x (np.ndarray): Increasing x values.
+        y (np.ndarray): Values.
+        threshold (int): Number of points kept.
+
+    Returns:
+        np.ndarray: Positions of the kept points, increasing.
+    """
+    size = len(x)
+    if threshold >= size or threshold < 3:
+        return np.arange(size)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Bucket i spans bounds[i]:bounds[i + 1]; the last point is a bucket of its own
+    bounds = np.floor(np.arange(threshold - 1) * (size - 2) / (threshold - 2)).astype(np.int64) + 1
+    bounds = np.append(bounds, size)
+    # Mean point of every bucket, from cumulative sums
+    x_sums, y_sums = np.concatenate([[0], np.cumsum(x)]), np.concatenate([[0], np.cumsum(y)])
+    widths = np.diff(bounds)
+    x_means = (x_sums[bounds[1:]] - x_sums[bounds[:-1]]) / widths
+    y_means = (y_sums[bounds[1:]] - y_sums[bounds[:-1]]) / widths
+
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, size - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = bounds[bucket], bounds[bucket + 1]
+        # Twice the triangle areas; the constant factor does not change the largest
+        areas = np.abs((x[previous] - x_means[bucket + 1]) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (y_means[bucket + 1] - y[previous]))
+        previous = kept[bucket + 1] = start + int(np.argmax(areas))
+    return kept
+
+
+def to_points(buckets, counts, first, last, resolution, max_points=DEFAULT_MAX_POINTS):
+    """
+    Plottable points of one series in a window.
+
+    Buckets without requests are filled with zeros, then the series is
+    downsampled with LTTB if it has more than max_points buckets.
+
+    Args:
+        buckets (array-like): Epoch seconds of the non-empty buckets, at the given resolution.
+        counts (array-like): Requests per bucket.
+        first (int): Epoch seconds of the start of the window.
+        last (int): Epoch seconds of the end of the window.
+        resolution (str): Key of RESOLUTIONS of the buckets.
+        max_points (int): Most points returned.
+
+    Returns:
+        pd.DataFrame: 'Timestamp' (local wall time) and 'Number of Requests' columns.
+    """
+    width = RESOLUTIONS[resolution]
+    first = first // width * width
+    size = max(last - first, 0) // width + 1
+    buckets = np.asarray(buckets, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+    inside = (buckets >= first) & (buckets <= last)
+    values = np.zeros(size, dtype=np.int64)
+    np.add.at(values, (buckets[inside] - first) // width, counts[inside])
+    seconds = first + np.arange(size, dtype=np.int64) * width
+
+    kept = lttb(seconds, values, max_points)
+    return pd.DataFrame({'Timestamp': pd.to_datetime(seconds[kept], unit='s'), 'Number of Requests': values[kept]})
+
+
+def empty_points():
+    """
+    Points of a series without requests, with the columns of to_points.
+    """
+    return pd.DataFrame({'Timestamp': pd.Series(dtype='datetime64[ns]'), 'Number of Requests': pd.Series(dtype=np.int64)})
+
+
+def series_points(table, series=ALL_REQUESTS, max_points=DEFAULT_MAX_POINTS):
+    """
+    Plottable points of one series of a count table, over the whole time it covers.
+
+    Args:
+        table (pd.DataFrame): Count table of count_series or sum_series.
+        series (str): Series to plot.
+        max_points (int): Most points returned.
+
+    Returns:
+        tuple[pd.DataFrame, str | None]: The points of to_points, and the resolution they were read at.
+    """
+    # The window is the time covered by all requests, counted per second
+    finest = table[(table['resolution'] == list(RESOLUTIONS)[0]) & (table['series'] == ALL_REQUESTS)]
+    if finest.empty:
+        return empty_points(), None
+    first, last = int(finest['bucket'].min()), int(finest['bucket'].max())
+    resolution = pick_resolution(first, last, series, max_points)
+    counts = table[(table['resolution'] == resolution) & (table['series'] == series)]
+    return to_points(counts['bucket'], counts['request_count'], first, last, resolution, max_points), resolution
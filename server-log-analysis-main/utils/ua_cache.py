@@ -0,0 +1,211 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from ua_parser import user_agent_parser
+
+from utils import metrics
+
+# Fields extracted from every user agent, in output column order
+UA_FIELDS = ['Device', 'Browser', 'OS']
+
+# Default number of distinct user agents kept in memory
+DEFAULT_MAXSIZE = 100_000
+
+# Persistent cache file used by the command line analyses, relative to the project root
+DEFAULT_CACHE_FILE = 'data/cache/user_agents.json'
+
+
+def classify_user_agent(ua_string):
+    """
+    Parse a user agent string into its device, browser and OS families.
+
+    Args:
+        ua_string (str): A raw user agent string.
+
+    Returns:
+        tuple[str, str, str]: The device, browser and OS families.
+    """
+    parsed = user_agent_parser.Parse(ua_string)
+    return (
+        parsed.get('device', {}).get('family'),
+        parsed.get('user_agent', {}).get('family'),
+        parsed.get('os', {}).get('family'),
+    )
+
+
+class UserAgentCache:
+    """
+    Bounded LRU cache of parsed user agents with optional persistence.
+
+    Real traffic only has a few thousand distinct user agents per million
+    requests, so classify parses each distinct string once and maps the
+    result back to every row. The cache is shared by the dashboard's chart
+    threads, so entries and counters are guarded by a lock; parsing runs
+    outside it.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, cache_file=None):
+        """
+        Args:
+            maxsize (int): Maximum number of user agents kept; least recently used are evicted.
+            cache_file (str, optional): JSON file used to persist the cache across runs.
+        """
+        self.maxsize = maxsize
+        self.cache_file = cache_file
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_file and os.path.exists(cache_file):
+            self.load(cache_file)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, ua_string):
+        """
+        Classify one user agent, parsing it only on a cache miss.
+
+        Args:
+            ua_string (str): A raw user agent string.
+
+        Returns:
+            tuple[str, str, str]: The device, browser and OS families.
+        """
+        return self._get(ua_string)[0]
+
+    def _get(self, ua_string):
+        """
+        Classify one user agent.
+
+        Returns:
+            tuple[tuple[str, str, str], bool]: The families, and whether they were cached.
+        """
+        with self._lock:
+            entries = self._entries
+            if ua_string in entries:
+                entries.move_to_end(ua_string)
+                self.hits += 1
+                return entries[ua_string], True
+            self.misses += 1
+        # Another thread may parse the same string concurrently; both store the same result
+        result = classify_user_agent(ua_string)
+        with self._lock:
+            entries[ua_string] = result
+            entries.move_to_end(ua_string)
+            if len(entries) > self.maxsize:
+                entries.popitem(last=False)
+                self.evictions += 1
+        return result, False
+
+    def classify(self, user_agents):
+        """
+        Classify a column of user agents, parsing each distinct value once.
+
+        Args:
+            user_agents (pd.Series): Raw user agent strings; may be categorical and contain nulls.
+
+        Returns:
+            pd.DataFrame: 'Device', 'Browser' and 'OS' columns aligned with user_agents;
+            null user agents give null fields.
+        """
+        if isinstance(user_agents.dtype, pd.CategoricalDtype):
+            codes = user_agents.cat.codes.to_numpy()
+            uniques = user_agents.cat.categories
+        else:
+            codes, uniques = pd.factorize(user_agents)
+
+        with metrics.timer('classify_user_agents'):
+            lookups = [self._get(ua) for ua in uniques]
+            parsed = pd.DataFrame([fields for fields, _ in lookups], columns=UA_FIELDS)
+        # Counted per call; the shared counters also move with other threads' lookups
+        hits = sum(cached for _, cached in lookups)
+        metrics.count('cache_hits', hits, cache='user_agents')
+        metrics.count('cache_misses', len(lookups) - hits, cache='user_agents')
+        result = {}
+        for field in UA_FIELDS:
+            # Code -1 marks nulls; Categorical.from_codes maps it back to NaN
+            categories, field_codes = pd.factorize(parsed[field])[::-1]
+            mapped = field_codes[codes] if len(field_codes) else codes.copy()
+            mapped[codes == -1] = -1
+            result[field] = pd.Categorical.from_codes(mapped, categories=categories)
+        return pd.DataFrame(result, index=user_agents.index)
+
+    def stats(self):
+        """
+        Returns:
+            dict: 'hits', 'misses', 'evictions', 'size' and 'hit_rate' of the cache.
+        """
+        with self._lock:
+            hits, misses, evictions, size = self.hits, self.misses, self.evictions, len(self._entries)
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'evictions': evictions,
+            'size': size,
+            'hit_rate': hits / lookups if lookups else 0.0,
+        }
+
+    def load(self, cache_file):
+        """
+        Add the entries of a JSON cache file written by save.
+        """
+        with open(cache_file, 'r', encoding='utf-8') as file:
+            loaded = json.load(file)
+        with self._lock:
+            for ua_string, fields in loaded.items():
+                self._entries[ua_string] = tuple(fields)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def save(self, cache_file=None):
+        """
+        Atomically write the cache to a JSON file.
+
+        Args:
+            cache_file (str, optional): Target file; defaults to the file given at construction.
+        """
+        cache_file = cache_file or self.cache_file
+        os.makedirs(os.path.dirname(os.path.abspath(cache_file)), exist_ok=True)
+        with self._lock:
+            entries = dict(self._entries)
+        temporary_path = f'{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump(entries, file)
+        os.replace(temporary_path, cache_file)
+
+
+# Process-wide cache shared by the analyses and the dashboard
+default_cache = UserAgentCache()
+
+
+def count_families(user_agents, cache=None, weights=None):
+    """
+    Count requests per device and per browser family.
+
+    Args:
+        user_agents (pd.Series): Raw user agent strings; nulls are ignored.
+        cache (UserAgentCache, optional): Cache to use; defaults to default_cache.
+        weights (pd.Series, optional): Number of requests of each user agent, aligned
+            with user_agents; every row counts once if None.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: ('Device', 'Count') and ('Browser', 'Count')
+        tables, most frequent first.
+    """
+    user_agents = user_agents.dropna()
+    classified = (cache if cache is not None else default_cache).classify(user_agents)
+    if weights is None:
+        weights = pd.Series(1, index=user_agents.index)
+
+    tables = []
+    for field in ['Device', 'Browser']:
+        counts = weights.loc[user_agents.index].groupby(classified[field], observed=True).sum()
+        counts = counts[counts > 0].sort_values(ascending=False, kind='mergesort')
+        tables.append(pd.DataFrame({field: counts.index.astype(object), 'Count': counts.to_numpy()}))
+    return tuple(tables)
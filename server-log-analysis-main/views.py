@@ -1,19 +1,14 @@
 from django.shortcuts import render
-from .models import LogEntry
-from django.utils.dateparse import parse_datetime
+from utils import log_index, log_store
 
 def log_dashboard(request):
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
     ip_filter = request.GET.get('ip')
-    
-    logs = LogEntry.objects.all()
-    
-    if start_date and end_date:
-        logs = logs.filter(datetime__range=[parse_datetime(start_date), parse_datetime(end_date)])
-    
-    if ip_filter:
-        logs = logs.filter(ip=ip_filter)
 
-    context = {'logs': logs}
+    # Read only the row groups of the dataset that can hold the selected time range and IP
+    logs = log_index.query_logs(log_store.DEFAULT_DATASET, start=start_date or None, end=end_date or None,
+                                ip=ip_filter or None)
+
+    context = {'logs': logs.to_dict(orient='records')}
     return render(request, 'dashboard.html', context)